@@ -0,0 +1,218 @@
+# answer_cache.py
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from config import Config
+from db import get_async_engine, get_engine
+
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS semantic_answer_cache (
+        id BIGSERIAL PRIMARY KEY,
+        collection_name TEXT NOT NULL,
+        corpus_version BIGINT NOT NULL,
+        k INTEGER NOT NULL,
+        question TEXT NOT NULL,
+        embedding vector NOT NULL,
+        answer TEXT NOT NULL,
+        "references" JSONB NOT NULL,
+        metadata JSONB NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    -- 검색 프로필/임계값이 다르면 다른 답변 (이 열이 없던 이전 항목은 어떤 요청과도 맞지 않음)
+    ALTER TABLE semantic_answer_cache
+        ADD COLUMN IF NOT EXISTS search_scope TEXT NOT NULL DEFAULT '';
+    DROP INDEX IF EXISTS semantic_answer_cache_scope_idx;
+    CREATE INDEX IF NOT EXISTS semantic_answer_cache_lookup_idx
+        ON semantic_answer_cache (collection_name, corpus_version, k, search_scope);
+    CREATE INDEX IF NOT EXISTS semantic_answer_cache_age_idx
+        ON semantic_answer_cache (collection_name, id);
+"""
+
+# 현재 코퍼스 버전의 캐시 항목 중 가장 가까운 질문 1개 (버전 조회까지 한 번의 왕복).
+# 벡터 인덱스 없이 정확 거리로 훑지만, 항목 수가 컬렉션당 max_entries로 제한되어 비용이 커지지 않는다.
+_LOOKUP_SQL = text("""
+    SELECT question, answer, "references", metadata,
+           embedding <=> CAST(:embedding AS vector) AS distance
+    FROM semantic_answer_cache
+    WHERE collection_name = :collection
+      AND k = :k
+      AND search_scope = :scope
+      AND corpus_version = (
+          SELECT COALESCE(MAX(version), 0) FROM corpus_versions
+          WHERE collection_name = :collection
+      )
+      AND (CAST(:ttl AS double precision) IS NULL
+           OR created_at > now() - make_interval(secs => CAST(:ttl AS double precision)))
+    ORDER BY distance
+    LIMIT 1
+""")
+
+_STORE_SQL = text("""
+    INSERT INTO semantic_answer_cache
+        (collection_name, corpus_version, k, search_scope, question, embedding, answer,
+         "references", metadata)
+    SELECT :collection, COALESCE(MAX(version), 0), :k, :scope, :question,
+           CAST(:embedding AS vector), :answer,
+           CAST(:references AS JSONB), CAST(:metadata AS JSONB)
+    FROM corpus_versions WHERE collection_name = :collection
+""")
+
+# 저장 직후 컬렉션의 항목 수를 max_entries 이하로 (오래된 것부터), TTL이 지난 항목도 함께 삭제
+_EVICT_SQL = text("""
+    DELETE FROM semantic_answer_cache
+    WHERE collection_name = :collection
+      AND (
+          id <= (
+              SELECT id FROM semantic_answer_cache
+              WHERE collection_name = :collection
+              ORDER BY id DESC
+              OFFSET :max_entries LIMIT 1
+          )
+          OR created_at <= now() - make_interval(secs => CAST(:ttl AS double precision))
+      )
+""")
+
+
+def _vector_literal(embedding: List[float]) -> str:
+    return "[" + ",".join(repr(float(v)) for v in embedding) + "]"
+
+
+def cache_scope(
+    search_profile: str, threshold: Optional[float], fallback_threshold: Optional[float]
+) -> str:
+    """답변에 영향을 주는 검색 설정 → 캐시 키 문자열 (설정이 바뀌면 이전 답변과 맞지 않음)"""
+    return f"{search_profile}|{threshold}|{fallback_threshold}"
+
+
+class SemanticAnswerCache:
+    """질문 임베딩 유사도 기반 답변 캐시 (pgvector 테이블, 코퍼스 버전별 격리)
+
+    (컬렉션, 코퍼스 버전, k, 검색 설정 scope)가 같은 항목 중에서만 찾는다. 컬렉션당 항목 수는
+    max_entries, 수명은 ttl(초, None이면 만료 없음)로 제한한다.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = Config.COLLECTION_NAME,
+        max_distance: float = Config.ANSWER_CACHE_MAX_DISTANCE,
+        connection_string: str = Config.POSTGRES_CONNECTION,
+        async_connection_string: str = Config.ASYNC_POSTGRES_CONNECTION,
+        max_entries: int = Config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl: Optional[float] = Config.ANSWER_CACHE_TTL,
+    ):
+        self.collection_name = collection_name
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._engine = get_engine(connection_string)
+        self._async_engine = get_async_engine(async_connection_string)
+        with self._engine.begin() as conn:
+            conn.exec_driver_sql(_CREATE_TABLE_SQL)
+
+    def lookup(self, embedding: List[float], k: int, scope: str) -> Optional[Dict[str, Any]]:
+        """임계 거리 이내의 캐시된 답변 반환 (없으면 None, scope는 cache_scope 결과)"""
+        try:
+            with self._engine.connect() as conn:
+                row = conn.execute(_LOOKUP_SQL, self._lookup_params(embedding, k, scope)).first()
+        except Exception as e:
+            print(f"⚠️ 답변 캐시 조회 실패: {e}")
+            return None
+        return self._to_hit(row)
+
+    async def alookup(
+        self, embedding: List[float], k: int, scope: str
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            async with self._async_engine.connect() as conn:
+                row = (
+                    await conn.execute(_LOOKUP_SQL, self._lookup_params(embedding, k, scope))
+                ).first()
+        except Exception as e:
+            print(f"⚠️ 답변 캐시 조회 실패: {e}")
+            return None
+        return self._to_hit(row)
+
+    def store(
+        self, embedding: List[float], k: int, scope: str, result: Dict[str, Any]
+    ) -> None:
+        """생성된 답변을 현재 코퍼스 버전으로 저장하고 한도를 넘는 오래된 항목 삭제"""
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(_STORE_SQL, self._store_params(embedding, k, scope, result))
+                conn.execute(_EVICT_SQL, self._evict_params())
+        except Exception as e:
+            print(f"⚠️ 답변 캐시 저장 실패: {e}")
+
+    async def astore(
+        self, embedding: List[float], k: int, scope: str, result: Dict[str, Any]
+    ) -> None:
+        try:
+            async with self._async_engine.begin() as conn:
+                await conn.execute(_STORE_SQL, self._store_params(embedding, k, scope, result))
+                await conn.execute(_EVICT_SQL, self._evict_params())
+        except Exception as e:
+            print(f"⚠️ 답변 캐시 저장 실패: {e}")
+
+    def purge_stale(self) -> int:
+        """현재 코퍼스 버전이 아닌 캐시 항목 삭제 (재임베딩 후 호출)"""
+        with self._engine.begin() as conn:
+            deleted = conn.execute(
+                text("""
+                    DELETE FROM semantic_answer_cache
+                    WHERE collection_name = :collection
+                      AND corpus_version <> (
+                          SELECT COALESCE(MAX(version), 0) FROM corpus_versions
+                          WHERE collection_name = :collection
+                      )
+                """),
+                {"collection": self.collection_name},
+            ).rowcount
+        print(f"🧹 답변 캐시 무효화: {deleted}개 항목 삭제")
+        return deleted
+
+    def _lookup_params(self, embedding: List[float], k: int, scope: str) -> Dict[str, Any]:
+        return {
+            "embedding": _vector_literal(embedding),
+            "collection": self.collection_name,
+            "k": k,
+            "scope": scope,
+            "ttl": self.ttl,
+        }
+
+    def _store_params(
+        self, embedding: List[float], k: int, scope: str, result: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return {
+            "collection": self.collection_name,
+            "k": k,
+            "scope": scope,
+            "question": result["question"],
+            "embedding": _vector_literal(embedding),
+            "answer": result["answer"],
+            "references": json.dumps(result["references"], ensure_ascii=False),
+            "metadata": json.dumps(result["metadata"], ensure_ascii=False),
+        }
+
+    def _evict_params(self) -> Dict[str, Any]:
+        return {
+            "collection": self.collection_name,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+    def _to_hit(self, row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        row = row._mapping
+        if row["distance"] > self.max_distance:
+            return None
+        return {
+            "question": row["question"],
+            "answer": row["answer"],
+            "references": row["references"],
+            "metadata": row["metadata"],
+            "distance": float(row["distance"]),
+        }
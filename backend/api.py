@@ -1,13 +1,28 @@
 """
 FastAPI 서버 - Frontend와 Backend 연동
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Literal
+import asyncio
+import json
+import os
+import secrets
+import sys
+import time
+import uuid
 import uvicorn
+from pathlib import Path
 
-from main import StudyAssistant
+from config import Config
+from db import adispose_engines, pool_stats
+
+if TYPE_CHECKING:
+    # main은 LangChain/OpenAI/PGVector를 불러오므로 warm-up 스레드에서 import
+    from ingest_jobs import IngestJobs
+    from main import StudyAssistant
 
 app = FastAPI(title="Akashic Records API")
 
@@ -20,14 +35,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 전역 assistant 인스턴스 (앱 시작 시 초기화)
-assistant: Optional[StudyAssistant] = None
+# 전역 assistant 인스턴스 (백그라운드 warm-up이 끝나면 설정)
+assistant: Optional["StudyAssistant"] = None
+
+# warm-up 진행 상태 (/api/health/ready): starting → ready, 실패 시 failed (재시도 중이면 계속 갱신)
+readiness: Dict[str, Any] = {
+    "status": "starting",
+    "attempts": 0,
+    "error": None,
+    "import_seconds": None,
+    "ready_seconds": None,
+}
+_warm_up_task: Optional[asyncio.Task] = None
+
+# 서비스 중 교재 추가 작업 큐 (첫 관리자 요청 때 생성)
+ingest_jobs: Optional["IngestJobs"] = None
 
 
 class QueryRequest(BaseModel):
     """질문 요청 모델"""
     query: str
-    k: int = 5  # 검색할 문서 개수
+    k: int = Field(5, ge=1, le=Config.SEARCH_MAX_K)  # 검색할 문서 개수
+    # 검색 정확도/지연 프로필 (미지정 시 서버 기본값 Config.SEARCH_PROFILE)
+    search_profile: Optional[Literal["fast", "balanced", "high_recall"]] = None
+
+
+class IngestRequest(BaseModel):
+    """서버 디스크에 있는 교재 PDF 추가 요청 모델"""
+    path: str
+    name: Optional[str] = None  # 미지정 시 파일 이름(확장자 제외)
 
 
 class AnalysisResponse(BaseModel):
@@ -40,18 +76,71 @@ class AnalysisResponse(BaseModel):
     metadata: Dict[str, Any]
 
 
-@app.on_event("startup")
-async def startup_event():
-    """앱 시작 시 StudyAssistant 초기화"""
+def _load_assistant() -> "StudyAssistant":
+    """무거운 의존성 import 후 assistant 준비 (이벤트 루프를 막지 않도록 스레드에서 실행)"""
+    started = time.perf_counter()
+    from main import assistants
+
+    readiness["import_seconds"] = round(time.perf_counter() - started, 3)
+    # 같은 프로세스의 main.get_answer 호출과 준비된 assistant를 공유 (rebuild=False로 기존 벡터 스토어 사용)
+    return assistants.warm_up(batch_size=100)
+
+
+async def _warm_up(started: float) -> None:
+    """assistant가 준비될 때까지 (실패 시 재시도하며) 초기화하고 readiness 갱신"""
     global assistant
-    print("🚀 FastAPI 서버 시작 중...")
-    print("📚 StudyAssistant 초기화 중...")
+    while True:
+        readiness["attempts"] += 1
+        try:
+            prepared = await asyncio.to_thread(_load_assistant)
+            # 비동기 검색/LLM 경로 준비 (요청 처리 중 이벤트 루프를 막지 않도록)
+            await prepared.aprepare()
+            break
+        except Exception as e:
+            readiness.update(status="failed", error=str(e))
+            print(f"❌ StudyAssistant 초기화 실패: {e}")
+            if Config.API_WARMUP_RETRY_INTERVAL <= 0:
+                return
+            await asyncio.sleep(Config.API_WARMUP_RETRY_INTERVAL)
+
+    assistant = prepared
+    readiness.update(
+        status="ready", error=None, ready_seconds=round(time.perf_counter() - started, 3)
+    )
+    print(f"✅ FastAPI 서버 준비 완료! ({readiness['ready_seconds']}s)")
 
-    assistant = StudyAssistant(batch_size=100)
-    # rebuild=False로 기존 벡터 스토어 사용
-    assistant.prepare(rebuild=False, ingest=False)
 
-    print("✅ FastAPI 서버 준비 완료!")
+@app.on_event("startup")
+async def startup_event():
+    """요청을 바로 받을 수 있도록 StudyAssistant 초기화는 백그라운드로 시작"""
+    global _warm_up_task
+    print("🚀 FastAPI 서버 시작 중...")
+    print("📚 StudyAssistant 초기화 중... (준비 상태: /api/health/ready)")
+    _warm_up_task = asyncio.create_task(_warm_up(time.perf_counter()))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """warm-up 중단, 준비된 assistant와 공유 커넥션 풀 정리"""
+    if _warm_up_task is not None and not _warm_up_task.done():
+        _warm_up_task.cancel()
+    if ingest_jobs is not None:
+        await asyncio.to_thread(ingest_jobs.shutdown)
+    # warm-up이 main을 불러오기 전에 종료되면 정리할 assistant도 없다
+    if "main" in sys.modules:
+        sys.modules["main"].assistants.close_all()
+    await adispose_engines()
+
+
+def _require_assistant() -> "StudyAssistant":
+    """준비 전 요청은 503 + Retry-After로 응답 (로드 밸런서/클라이언트가 재시도)"""
+    if assistant is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Assistant not ready ({readiness['status']})",
+            headers={"Retry-After": str(int(Config.API_WARMUP_RETRY_INTERVAL) or 5)},
+        )
+    return assistant
 
 
 @app.get("/")
@@ -67,12 +156,13 @@ async def analyze_query(request: QueryRequest):
 
     Frontend의 analyzeLearningQuery()가 호출하는 API
     """
-    if not assistant:
-        raise HTTPException(status_code=503, detail="Assistant not initialized")
+    assistant = _require_assistant()
 
     try:
-        # Backend의 answer() 함수 호출
-        result = assistant.answer(request.query, k=request.k)
+        # Backend의 비동기 answer 경로 호출 (임베딩/검색/LLM 모두 await)
+        result = await assistant.aanswer(
+            request.query, k=request.k, search_profile=request.search_profile
+        )
 
         # Frontend가 기대하는 형식으로 변환
         response = {
@@ -91,6 +181,52 @@ async def analyze_query(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/analyze/stream")
+async def analyze_query_stream(request: QueryRequest):
+    """
+    질문 분석 스트리밍 엔드포인트 (Server-Sent Events)
+
+    이벤트 순서:
+    - references: 검색 직후 references / recommendedBooks / keywords
+    - token: 답변 토큰 조각 (여러 번)
+    - done: 전체 답변과 metadata
+    - error: 처리 중 오류
+    """
+    assistant = _require_assistant()
+
+    async def event_stream():
+        try:
+            async for event, data in assistant.astream_answer(
+                request.query, k=request.k, search_profile=request.search_profile
+            ):
+                if event == "references":
+                    data = {
+                        "query": request.query,
+                        "keywords": _extract_keywords_from_query(request.query),
+                        "recommendedBooks": _format_books_from_references(data["references"]),
+                        "references": data["references"],
+                    }
+                yield _format_sse(event, data)
+        except Exception as e:
+            print(f"❌ 스트리밍 중 오류 발생: {e}")
+            yield _format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Nginx 리버스 프록시가 응답을 버퍼링하지 않도록
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """SSE 프레임 직렬화"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 def _extract_keywords_from_query(query: str) -> List[str]:
     """질문에서 키워드 추출 (간단한 버전)"""
     # 나중에 더 정교한 키워드 추출 알고리즘으로 대체 가능
@@ -149,6 +285,15 @@ def _format_books_from_references(references: List[Dict[str, Any]]) -> List[Dict
         if page and books[source]["initialPage"] == 1:
             books[source]["initialPage"] = page
 
+        # 줄 단위 사각형이 있으면 줄마다 하이라이트 (CHUNK_LINE_RECTS로 수집한 청크)
+        line_rects = ref.get("line_rects")
+        if page and line_rects:
+            for x1, y1, x2, y2 in line_rects:
+                books[source]["highlights"].append(
+                    {"page": page, "x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1}
+                )
+            continue
+
         # bbox 데이터를 Highlight 형식으로 변환
         x1 = ref.get("x1")
         y1 = ref.get("y1")
@@ -174,13 +319,154 @@ def _format_books_from_references(references: List[Dict[str, Any]]) -> List[Dict
 
 @app.get("/api/health")
 async def health_check():
-    """서버 상태 확인"""
+    """서버 상태 확인 (assistant_ready는 warm-up 완료 여부)"""
     return {
         "status": "healthy",
-        "assistant_ready": assistant is not None
+        "assistant_ready": assistant is not None,
+        "warm_up": readiness,
+    }
+
+
+@app.get("/api/health/live")
+async def liveness():
+    """liveness: 프로세스와 이벤트 루프가 응답하는지만 확인 (warm-up 중에도 200)"""
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """readiness: assistant가 준비되어 질의를 처리할 수 있을 때만 200, 그 전/실패 시 503"""
+    return JSONResponse(
+        status_code=200 if assistant is not None else 503,
+        content={"ready": assistant is not None, **readiness},
+    )
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """임베딩 캐시 적중/미스, 동시 요청 병합 통계 및 메모리 인덱스 사용량"""
+    assistant = _require_assistant()
+
+    return {
+        "query_embedding": assistant.vector_manager.query_cache.stats(),
+        "document_embedding": (
+            assistant.vector_manager.document_cache.stats()
+            if assistant.vector_manager.document_cache is not None
+            else None
+        ),
+        "singleflight": assistant.inflight.stats(),
+        "memory_index": (
+            assistant.memory_index.memory_report()
+            if assistant.memory_index is not None
+            else None
+        ),
     }
 
 
+@app.get("/api/db/stats")
+async def db_stats():
+    """공유 커넥션 풀 상태 (사용 중/유휴 연결, overflow, 누적 연결/체크아웃 수)"""
+    return pool_stats()
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """X-Admin-Token 헤더 검증 (Config.ADMIN_TOKEN 미설정 시 관리자 API 비활성화)"""
+    if not Config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, Config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _ingest_jobs() -> "IngestJobs":
+    global ingest_jobs
+    _require_assistant()
+    if ingest_jobs is None:
+        from ingest_jobs import IngestJobs
+
+        ingest_jobs = IngestJobs(_require_assistant)
+    return ingest_jobs
+
+
+def _submit_ingest(path: Path, name: Optional[str]) -> Dict[str, Any]:
+    job = _ingest_jobs().submit([{"path": str(path), "name": name or path.stem}])
+    print(f"📥 교재 추가 작업 등록 ({job.id}): {path.name}")
+    return job.to_dict()
+
+
+@app.post("/api/admin/ingest", status_code=202, dependencies=[Depends(_require_admin)])
+async def ingest_book(request: IngestRequest):
+    """서버 디스크의 교재 PDF를 백그라운드로 수집 (서비스 중단 없음, 완료 시 검색에 한꺼번에 반영)"""
+    path = Path(request.path).expanduser().resolve()
+    if not path.is_file() or path.suffix.lower() != ".pdf":
+        raise HTTPException(status_code=400, detail=f"PDF file not found: {path}")
+    return _submit_ingest(path, request.name)
+
+
+def _reject_if_in_use(jobs: "IngestJobs", path: Path) -> None:
+    if jobs.is_using(str(path)):
+        raise HTTPException(
+            status_code=409,
+            detail=f"An ingest job is still using {path.name}; retry after it finishes",
+        )
+
+
+@app.post("/api/admin/ingest/upload", status_code=202, dependencies=[Depends(_require_admin)])
+async def upload_book(request: Request, filename: str, name: Optional[str] = None):
+    """요청 본문(application/pdf)의 교재를 UPLOAD_DIR에 저장한 뒤 백그라운드로 수집
+
+    예: curl -X POST -H "X-Admin-Token: ..." -H "Content-Type: application/pdf" \
+        --data-binary @book.pdf "/api/admin/ingest/upload?filename=book.pdf"
+    """
+    target = Path(Config.UPLOAD_DIR) / Path(filename).name
+    if target.suffix.lower() != ".pdf":
+        raise HTTPException(status_code=400, detail="filename must end with .pdf")
+    jobs = _ingest_jobs()  # 준비 전이면 업로드를 받기 전에 503
+    _reject_if_in_use(jobs, target)
+
+    # 같은 이름의 파일은 업로드가 끝난 뒤에만 교체한다. 대기/실행 중인 작업이 그 파일을 읽는 동안
+    # 교체하면 파싱 프로세스가 구간마다 다시 여는 파일의 내용이 섞이므로 409로 거절한다.
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+    limit = int(Config.UPLOAD_MAX_MB * 1024 * 1024)
+    size = 0
+    try:
+        with open(partial, "wb") as f:
+            async for block in request.stream():
+                size += len(block)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+                if block and size == len(block) and not block.startswith(b"%PDF-"):
+                    raise HTTPException(status_code=400, detail="Body is not a PDF")
+                # 디스크 쓰기가 이벤트 루프를 막지 않도록 스레드에서
+                await asyncio.to_thread(f.write, block)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        # 업로드 중에 같은 파일의 작업이 등록됐을 수 있으므로 교체 직전에 다시 확인
+        # (확인 → 교체 → 작업 등록 사이에 await가 없어 다른 요청이 끼어들지 않는다)
+        _reject_if_in_use(jobs, target)
+        os.replace(partial, target)
+    finally:
+        if partial.exists():
+            partial.unlink()
+
+    return _submit_ingest(target, name)
+
+
+@app.get("/api/admin/ingest", dependencies=[Depends(_require_admin)])
+async def list_ingest_jobs():
+    """교재 추가 작업 목록 (최근 순)"""
+    return [job.to_dict() for job in _ingest_jobs().list()]
+
+
+@app.get("/api/admin/ingest/{job_id}", dependencies=[Depends(_require_admin)])
+async def get_ingest_job(job_id: str):
+    """교재 추가 작업 진행 상황 (파싱한 페이지, 임베딩한 청크, 저장한 행 수)"""
+    job = _ingest_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🚀 Akashic Records API Server")
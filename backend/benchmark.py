@@ -0,0 +1,1801 @@
+"""백엔드 성능 측정용 CLI (스텁 OpenAI 서버 기반, 실제 PostgreSQL 사용)"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+BENCH_COLLECTION = "bench_chunks"
+
+
+def _stub_vector(text: str, dimensions: int) -> List[float]:
+    """입력 문자열로부터 결정적인 단위 벡터 생성"""
+    values: List[float] = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend((byte - 127.5) / 127.5 for byte in digest)
+        counter += 1
+    values = values[:dimensions]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def _stub_openai_app(embed_latency: float, llm_latency: float, dimensions: int):
+    """OpenAI 호환 /v1/embeddings, /v1/chat/completions 스텁 서버"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        await asyncio.sleep(embed_latency)
+        return {
+            "object": "list",
+            "model": body.get("model"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _stub_vector(str(item), dimensions)}
+                for i, item in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if body.get("stream"):
+            return StreamingResponse(
+                _stub_chat_stream(body.get("model"), llm_latency),
+                media_type="text/event-stream",
+            )
+        await asyncio.sleep(llm_latency)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "stub answer"},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+async def _stub_chat_stream(model: str, llm_latency: float, num_tokens: int = 20):
+    """llm_latency 동안 num_tokens개의 토큰을 고르게 흘려보내는 스트리밍 응답"""
+    for i in range(num_tokens):
+        await asyncio.sleep(llm_latency / num_tokens)
+        chunk = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "delta": {"content": f"tok{i} "}, "finish_reason": None}
+            ],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def _serve_in_thread(app, port: int):
+    """uvicorn 서버를 데몬 스레드에서 실행하고 기동 완료까지 대기"""
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"서버 기동 실패 (port={port})")
+        time.sleep(0.05)
+    return server
+
+
+def _use_stub_openai(port: int) -> None:
+    """이후 생성되는 OpenAI 클라이언트가 스텁 서버를 보도록 환경 변수 설정"""
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # 스텁 벡터는 서로 유사하지 않으므로 임계값을 끄고 항상 LLM 경로를 타게 한다.
+    os.environ["SIMILARITY_THRESHOLD"] = "off"
+    # 답변 캐시 적중이 처리량을 왜곡하지 않도록 전체 경로만 측정
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    # 스텁 벡터가 실제 청크 임베딩 캐시에 섞이지 않도록 별도 파일 사용
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(
+        tempfile.gettempdir(), "akashic_bench_embeddings.sqlite3"
+    )
+
+
+def _seed_collection(num_chunks: int) -> None:
+    """벤치마크 전용 컬렉션이 비어 있으면 합성 청크를 채운다."""
+    from langchain_core.documents import Document
+
+    from vector_store_manager import VectorStoreManager
+
+    manager = VectorStoreManager()
+    store = manager.load_existing_store()
+    if store.similarity_search_with_score("seed-probe", k=1):
+        return
+
+    documents = [
+        Document(
+            page_content=f"synthetic chunk {i} about topic {i % 37}",
+            metadata={
+                "book_name": "bench",
+                "page": i // 4 + 1,
+                "chunk_index": i % 4,
+                "source": "bench.pdf",
+            },
+        )
+        for i in range(num_chunks)
+    ]
+    manager.add_documents(documents)
+
+
+async def _drive(
+    url: str, concurrency: int, total: int
+) -> Tuple[float, List[float], List[float], int]:
+    """concurrency개의 클라이언트로 total개 요청을 보내고
+    (경과 시간, 전체 지연 목록, 첫 바이트 지연 목록, 오류 수) 반환"""
+    import httpx
+
+    latencies: List[float] = []
+    first_byte: List[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def client_loop(client: "httpx.AsyncClient") -> None:
+        nonlocal errors
+        for i in remaining:
+            payload = {"query": f"question {i % 50}", "k": 5}
+            start = time.perf_counter()
+            ttfb = None
+            async with client.stream("POST", url, json=payload) as response:
+                async for _ in response.aiter_bytes():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - start
+            latencies.append(time.perf_counter() - start)
+            first_byte.append(ttfb if ttfb is not None else latencies[-1])
+            if response.status_code != 200:
+                errors += 1
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return elapsed, latencies, first_byte, errors
+
+
+def bench_analyze(args: argparse.Namespace) -> None:
+    """/api/analyze 동시성별 처리량 측정 (단일 uvicorn 워커)"""
+    _use_stub_openai(args.stub_port)
+    _serve_in_thread(
+        _stub_openai_app(args.embed_latency, args.llm_latency, args.dimensions),
+        args.stub_port,
+    )
+
+    from config import Config
+
+    Config.COLLECTION_NAME = args.collection
+    _seed_collection(args.seed)
+
+    import api
+
+    _serve_in_thread(api.app, args.port)
+    path = "/api/analyze/stream" if args.stream else "/api/analyze"
+    url = f"http://127.0.0.1:{args.port}{path}"
+
+    print(
+        f"\n📈 {path} 부하 테스트 (embed={args.embed_latency}s, "
+        f"llm={args.llm_latency}s, 요청/클라이언트={args.requests})"
+    )
+    print(
+        f"{'동시성':>6} | {'req/s':>8} | {'p50(ms)':>8} | {'p95(ms)':>8} | "
+        f"{'TTFB p50(ms)':>12} | 오류"
+    )
+    for concurrency in args.concurrency:
+        total = concurrency * args.requests
+        elapsed, latencies, first_byte, errors = asyncio.run(
+            _drive(url, concurrency, total)
+        )
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        ttfb = statistics.median(first_byte) * 1000
+        print(
+            f"{concurrency:>6} | {total / elapsed:>8.1f} | {p50:>8.1f} | {p95:>8.1f} | "
+            f"{ttfb:>12.1f} | {errors}"
+        )
+
+
+class _FakeEmbeddings:
+    """네트워크 없이 배치당 지연만 흉내 내는 결정적 임베딩 (수집 처리량 측정용)"""
+
+    def __init__(self, dimensions: int, latency: float):
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [_stub_vector(text, self.dimensions) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def bench_ingest(args: argparse.Namespace) -> None:
+    """폴더 수집 파이프라인 처리량 측정 (가짜 임베딩, 기본은 DB 쓰기 생략)"""
+    from config import Config
+    from folder_vectorize import _list_pdfs
+    from ingest_pipeline import IngestPipeline
+
+    pdf_files = _list_pdfs(args.folder)
+    writer = None
+    if args.write:
+        from vector_store_manager import VectorStoreManager
+
+        # 임베딩은 가짜를 쓰므로 OpenAI 키는 클라이언트 생성용 자리표시자면 충분
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        Config.COLLECTION_NAME = args.collection
+        manager = VectorStoreManager()
+        manager.load_existing_store()
+        writer = manager.bulk_loader() if Config.INGEST_BULK_LOAD else manager.add_embeddings
+
+    pipeline = IngestPipeline(
+        embeddings=_FakeEmbeddings(args.dimensions, args.embed_latency),
+        writer=writer,
+        batch_size=args.batch_size,
+        parse_workers=args.parse_workers,
+        embed_workers=args.embed_workers,
+        pages_per_task=args.pages_per_task,
+    )
+    summary = pipeline.run(pdf_files).summary()
+    print(f"\n📈 수집 처리량: {json.dumps(summary, ensure_ascii=False)}")
+
+
+def _clear_collection(collection_name: str) -> None:
+    from sqlalchemy import create_engine, text
+
+    from config import Config
+
+    engine = create_engine(Config.POSTGRES_CONNECTION)
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                DELETE FROM langchain_pg_embedding
+                WHERE collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = :name)
+            """),
+            {"name": collection_name},
+        )
+    engine.dispose()
+
+
+def bench_copy(args: argparse.Namespace) -> None:
+    """합성 임베딩 행 적재 속도 비교: PGVector 배치 INSERT vs binary COPY"""
+    import uuid
+
+    from langchain_core.documents import Document
+
+    from bulk_loader import BulkLoader
+    from config import Config
+    from vector_store_manager import VectorStoreManager
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    Config.COLLECTION_NAME = args.collection
+    manager = VectorStoreManager()
+    manager.load_existing_store()
+
+    documents = [
+        Document(
+            id=str(uuid.uuid4()),
+            page_content=f"synthetic chunk {i} about topic {i % 37} " * 8,
+            metadata={
+                "book_name": "bench",
+                "page": i // 4 + 1,
+                "chunk_index": i % 4,
+                "source": "bench.pdf",
+                "bbox": {"x1": 10.0, "y1": 20.0, "x2": 300.0, "y2": 400.0},
+            },
+        )
+        for i in range(args.rows)
+    ]
+    vectors = [_stub_vector(doc.page_content + str(i), args.dimensions) for i, doc in enumerate(documents)]
+
+    def insert_path() -> None:
+        for i in range(0, len(documents), args.batch_size):
+            manager.add_embeddings(
+                documents[i : i + args.batch_size], vectors[i : i + args.batch_size]
+            )
+
+    def copy_path(upsert: bool):
+        def run() -> None:
+            loader = BulkLoader(args.collection, flush_rows=args.flush_rows, upsert=upsert)
+            for i in range(0, len(documents), args.batch_size):
+                loader(documents[i : i + args.batch_size], vectors[i : i + args.batch_size])
+            loader.flush()
+
+        return run
+
+    modes = [
+        ("insert", insert_path),
+        ("copy", copy_path(upsert=False)),
+        ("copy+upsert", copy_path(upsert=True)),
+    ]
+    print(f"\n📦 적재 벤치마크: {args.rows}행 × {args.dimensions}차원, 컬렉션 {args.collection}")
+    print(f"{'mode':>12} | {'elapsed_s':>9} | {'rows/s':>9}")
+    try:
+        for name, run in modes:
+            _clear_collection(args.collection)
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            print(f"{name:>12} | {elapsed:9.2f} | {args.rows / elapsed:9.0f}")
+    finally:
+        _clear_collection(args.collection)
+
+
+def bench_index(args: argparse.Namespace) -> None:
+    """HNSW 인덱스를 둔 채 적재 vs 인덱스 없이 적재 후 한 번에 빌드 비교 (총 시간/빌드 시간/크기)"""
+    import uuid
+
+    from langchain_core.documents import Document
+
+    from bulk_loader import BulkLoader
+    from config import Config
+    from database_setup import create_hnsw_index, drop_hnsw_index
+    from vector_store_manager import VectorStoreManager
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    Config.COLLECTION_NAME = args.collection
+    VectorStoreManager().load_existing_store()
+
+    documents = [
+        Document(id=str(uuid.uuid4()), page_content=f"synthetic chunk {i}", metadata={"page": i})
+        for i in range(args.rows)
+    ]
+    vectors = [_stub_vector(doc.page_content, args.dimensions) for doc in documents]
+    build = dict(
+        m=args.m,
+        ef_construction=args.ef_construction,
+        maintenance_work_mem=args.maintenance_work_mem,
+        parallel_workers=args.parallel_workers,
+    )
+
+    def load() -> None:
+        loader = BulkLoader(args.collection, upsert=False)
+        for i in range(0, len(documents), 1000):
+            loader(documents[i : i + 1000], vectors[i : i + 1000])
+        loader.flush()
+
+    results = []
+    try:
+        for mode in ("incremental", "deferred"):
+            _clear_collection(args.collection)
+            drop_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+            started = time.perf_counter()
+            if mode == "incremental":
+                create_hnsw_index(Config.POSTGRES_CONNECTION, args.collection, **build)
+                load()
+                index = None
+            else:
+                load()
+                index = create_hnsw_index(Config.POSTGRES_CONNECTION, args.collection, **build)
+            elapsed = time.perf_counter() - started
+            results.append((mode, elapsed, index))
+    finally:
+        _clear_collection(args.collection)
+        drop_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+
+    print(f"\n🏗️ HNSW 빌드 벤치마크: {args.rows}행 × {args.dimensions}차원, {build}")
+    print(f"{'mode':>12} | {'total_s':>8} | {'build_s':>8} | {'index_mb':>8}")
+    for mode, elapsed, index in results:
+        build_s = f"{index['build_seconds']:8.2f}" if index else f"{'-':>8}"
+        size_mb = f"{index['size_bytes'] / 2**20:8.1f}" if index else f"{'-':>8}"
+        print(f"{mode:>12} | {elapsed:8.2f} | {build_s} | {size_mb}")
+
+
+def _clustered_vectors(count: int, dimensions: int, seed: int, decay: float = 0.0):
+    """군집 구조가 있는 단위 벡터 (실제 임베딩처럼 주제별로 모인 분포 흉내)
+
+    decay > 0 이면 i번째 성분을 (i + 1) ** -decay 배로 줄여, Matryoshka 임베딩처럼
+    앞쪽 성분에 정보가 몰린 분포를 만든다 (차원 절단 실험용).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 50, 1), dimensions))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal(
+        (count, dimensions)
+    )
+    if decay:
+        vectors *= np.arange(1, dimensions + 1) ** -decay
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _recall(found: List[str], exact: List[str]) -> float:
+    return len(set(found) & set(exact)) / max(len(exact), 1)
+
+
+def bench_collections(args: argparse.Namespace) -> None:
+    """컬렉션 수 증가에 따른 검색 지연/recall: 테이블 전체 인덱스 vs 컬렉션 전용 partial 인덱스"""
+    import uuid
+
+    import numpy as np
+    from langchain_core.documents import Document
+    from sqlalchemy import create_engine
+
+    from bulk_loader import BulkLoader
+    from config import Config
+    from database_setup import create_hnsw_index, drop_hnsw_index
+    from vector_search import CollectionSearch
+    from vector_store_manager import VectorStoreManager
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    names = [f"{args.collection}_t{i}" for i in range(args.tenants)]
+    shared_index = f"{args.collection}_shared_hnsw_idx"
+    engine = create_engine(Config.POSTGRES_CONNECTION)
+
+    stores = {}
+    target_ids: List[str] = []
+    target_vectors = None
+    for i, name in enumerate(names):
+        Config.COLLECTION_NAME = name
+        stores[name] = VectorStoreManager().load_existing_store()
+        vectors = _clustered_vectors(args.rows, args.dimensions, seed=i)
+        documents = [
+            Document(id=str(uuid.uuid4()), page_content=f"{name} chunk {j}", metadata={"page": j})
+            for j in range(args.rows)
+        ]
+        loader = BulkLoader(name, upsert=False)
+        loader(documents, vectors.tolist())
+        loader.flush()
+        if i == 0:
+            target_ids = [doc.id for doc in documents]
+            target_vectors = vectors
+
+    rng = np.random.default_rng(1234)
+    picks = rng.integers(0, args.rows, args.queries)
+    queries = target_vectors[picks] + 0.3 * rng.standard_normal((args.queries, args.dimensions))
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [
+        [target_ids[j] for j in np.argsort(-(target_vectors @ q))[: args.k]] for q in queries
+    ]
+
+    def measure(search) -> Tuple[float, float]:
+        latencies, recalls = [], []
+        for q, truth in zip(queries, exact):
+            started = time.perf_counter()
+            results = search(q.tolist())
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(_recall([doc.id for doc, _ in results], truth))
+        return statistics.median(latencies), statistics.mean(recalls)
+
+    results = []
+    try:
+        # 같은 검색 쿼리로 인덱스만 바꿔 비교
+        searcher = CollectionSearch(names[0])
+
+        # 1) 이전 방식: 테이블 전체 HNSW 인덱스 (다른 컬렉션 벡터를 거친 뒤 collection_id로 사후 필터)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"""
+                CREATE INDEX {shared_index} ON langchain_pg_embedding
+                USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+            """)
+        results.append(("shared", *measure(lambda v: searcher.search(v, k=args.k))))
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP INDEX {shared_index}")
+
+        # 2) 컬렉션별 partial 인덱스
+        for name in names:
+            create_hnsw_index(Config.POSTGRES_CONNECTION, name)
+        results.append(("partial", *measure(lambda v: searcher.search(v, k=args.k))))
+    finally:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {shared_index}")
+        for name in names:
+            drop_hnsw_index(Config.POSTGRES_CONNECTION, name)
+            stores[name].delete_collection()
+        engine.dispose()
+
+    print(
+        f"\n🗂️ 컬렉션 격리 벤치마크: 컬렉션 {args.tenants}개 × {args.rows}행, "
+        f"질의 {args.queries}개, k={args.k}"
+    )
+    print(f"{'index':>8} | {'p50_ms':>7} | {'recall@k':>8}")
+    for name, p50, recall in results:
+        print(f"{name:>8} | {p50:7.2f} | {recall:8.3f}")
+
+
+def bench_recall(args: argparse.Namespace) -> None:
+    """검색 프로필별 recall@k / 지연 vs 정확 검색(인덱스 미사용), 고정된 질의 집합"""
+    import uuid
+
+    import numpy as np
+    from langchain_core.documents import Document
+    from sqlalchemy import text
+
+    from bulk_loader import BulkLoader
+    from config import Config
+    from database_setup import create_hnsw_index, drop_hnsw_index
+    from vector_search import SEARCH_PROFILES, CollectionSearch
+    from vector_store_manager import VectorStoreManager
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    Config.COLLECTION_NAME = args.collection
+    store = VectorStoreManager().load_existing_store()
+    _clear_collection(args.collection)
+
+    vectors = _clustered_vectors(args.rows, args.dimensions, seed=42)
+    documents = [
+        Document(id=str(uuid.uuid4()), page_content=f"chunk {j}", metadata={"page": j})
+        for j in range(args.rows)
+    ]
+    loader = BulkLoader(args.collection, upsert=False)
+    for i in range(0, args.rows, 5000):
+        loader(documents[i : i + 5000], vectors[i : i + 5000].tolist())
+    loader.flush()
+    drop_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+    create_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+
+    rng = np.random.default_rng(7)
+    picks = rng.integers(0, args.rows, args.queries)
+    queries = vectors[picks] + args.noise * rng.standard_normal((args.queries, args.dimensions))
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    ids = [doc.id for doc in documents]
+    exact = [[ids[j] for j in np.argsort(-(vectors @ q))[: args.k]] for q in queries]
+
+    searcher = CollectionSearch(args.collection)
+
+    def exact_search(vector: List[float]):
+        # 인덱스를 끄고 같은 쿼리 실행 = 정확 검색 기준선
+        with searcher._engine.begin() as conn:
+            conn.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+            rows = conn.execute(searcher._get_query(), searcher._params(vector, args.k))
+            return searcher._to_results(rows.mappings().all())
+
+    modes = [(name, lambda v, name=name: searcher.search(v, args.k, name)) for name in SEARCH_PROFILES]
+    modes.append(("exact", exact_search))
+
+    print(
+        f"\n🎯 검색 프로필 벤치마크: {args.rows}행 × {args.dimensions}차원, 질의 {args.queries}개, "
+        f"k={args.k}"
+    )
+    print(f"{'profile':>12} | {'p50_ms':>7} | {'p95_ms':>7} | {'recall@k':>8}")
+    try:
+        for name, search in modes:
+            search(queries[0].tolist())  # 워밍업
+            latencies, recalls = [], []
+            for q, truth in zip(queries, exact):
+                started = time.perf_counter()
+                results = search(q.tolist())
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(_recall([doc.id for doc, _ in results], truth))
+            latencies.sort()
+            p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+            print(
+                f"{name:>12} | {statistics.median(latencies):7.2f} | {p95:7.2f} | "
+                f"{statistics.mean(recalls):8.3f}"
+            )
+    finally:
+        drop_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+        store.delete_collection()
+
+
+def bench_dims(args: argparse.Namespace) -> None:
+    """차원 축소 / halfvec 저장 형식별 인덱스 크기, 검색 지연, recall@k (1536차원 float32 정확 검색 대비)"""
+    import uuid
+
+    import numpy as np
+    from langchain_core.documents import Document
+
+    from bulk_loader import BulkLoader
+    from config import Config
+    from database_setup import (
+        create_hnsw_index,
+        drop_hnsw_index,
+        get_pgvector_version,
+        relax_embedding_column,
+    )
+    from vector_search import CollectionSearch
+    from vector_store_manager import VectorStoreManager
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # 컬렉션마다 다른 차원을 저장하므로 컬럼의 차원 고정 해제
+    relax_embedding_column(Config.POSTGRES_CONNECTION)
+    halfvec_supported = get_pgvector_version(Config.POSTGRES_CONNECTION) >= (0, 7)
+
+    if args.source_collection:
+        # 실제 임베딩 분포로 측정 (저장된 컬렉션의 벡터를 원본으로 사용)
+        from sqlalchemy import create_engine, text
+
+        engine = create_engine(Config.POSTGRES_CONNECTION)
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT embedding::text FROM langchain_pg_embedding
+                    WHERE collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = :name)
+                    LIMIT :rows
+                """),
+                {"name": args.source_collection, "rows": args.rows},
+            ).scalars().all()
+        engine.dispose()
+        vectors = np.array([np.array(row.strip("[]").split(","), dtype=float) for row in rows])
+        args.rows, args.dimensions = vectors.shape
+    else:
+        vectors = _clustered_vectors(args.rows, args.dimensions, seed=42, decay=args.decay)
+    rng = np.random.default_rng(7)
+    picks = rng.integers(0, args.rows, args.queries)
+    noise = rng.standard_normal((args.queries, args.dimensions))
+    noise *= np.linalg.norm(vectors[picks], axis=1, keepdims=True) / np.linalg.norm(
+        noise, axis=1, keepdims=True
+    )
+    queries = vectors[picks] + args.noise * noise
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [list(np.argsort(-(vectors @ q))[: args.k]) for q in queries]
+
+    def shorten(matrix, dims):
+        cut = matrix[:, :dims]
+        return cut / np.linalg.norm(cut, axis=1, keepdims=True)
+
+    results = []
+    for config in args.configs:
+        dims_text, storage = config.split(":")
+        dims = int(dims_text)
+        if storage == "halfvec" and not halfvec_supported:
+            print(f"⚠️ {config}: pgvector 0.7 미만이라 halfvec을 건너뜁니다.")
+            continue
+
+        name = f"{args.collection}_{dims}_{storage}"
+        Config.COLLECTION_NAME = name
+        store = VectorStoreManager().load_existing_store()
+        documents = [
+            Document(id=str(uuid.uuid4()), page_content=f"chunk {j}", metadata={"row": j})
+            for j in range(args.rows)
+        ]
+        try:
+            loader = BulkLoader(name, upsert=False)
+            stored = shorten(vectors, dims)
+            for i in range(0, args.rows, 5000):
+                loader(documents[i : i + 5000], stored[i : i + 5000].tolist())
+            loader.flush()
+            index = create_hnsw_index(Config.POSTGRES_CONNECTION, name, storage=storage)
+
+            searcher = CollectionSearch(name, storage=storage)
+            query_vectors = shorten(queries, dims)
+            searcher.search(query_vectors[0].tolist(), args.k, args.profile)  # 워밍업
+            latencies, recalls = [], []
+            for q, truth in zip(query_vectors, exact):
+                started = time.perf_counter()
+                found = searcher.search(q.tolist(), args.k, args.profile)
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(_recall([doc.metadata["row"] for doc, _ in found], truth))
+            results.append(
+                (config, index["size_bytes"] if index else 0, statistics.median(latencies),
+                 statistics.mean(recalls))
+            )
+        finally:
+            drop_hnsw_index(Config.POSTGRES_CONNECTION, name)
+            store.delete_collection()
+
+    print(
+        f"\n📐 차원/저장 형식 벤치마크: {args.rows}행, 질의 {args.queries}개, k={args.k}, "
+        f"프로필 {args.profile} (기준: {args.dimensions}차원 float32 정확 검색)"
+    )
+    print(f"{'config':>14} | {'index_mb':>8} | {'p50_ms':>7} | {'recall@k':>8}")
+    for config, size, p50, recall in results:
+        print(f"{config:>14} | {size / 2**20:8.1f} | {p50:7.2f} | {recall:8.3f}")
+
+
+def bench_binary(args: argparse.Namespace) -> None:
+    """이진 양자화 2단계 검색(Hamming 후보 → cosine 재정렬) vs 단일 단계 검색: 메모리, 지연, recall@k"""
+    import uuid
+
+    import numpy as np
+    from langchain_core.documents import Document
+
+    from bulk_loader import BulkLoader
+    from config import Config
+    from database_setup import create_hnsw_index, drop_hnsw_index, get_pgvector_version
+    from vector_search import CollectionSearch
+    from vector_store_manager import VectorStoreManager
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    binary_supported = get_pgvector_version(Config.POSTGRES_CONNECTION) >= (0, 7)
+
+    vectors = _clustered_vectors(args.rows, args.dimensions, seed=42)
+    rng = np.random.default_rng(7)
+    picks = rng.integers(0, args.rows, args.queries)
+    noise = rng.standard_normal((args.queries, args.dimensions))
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    queries = vectors[picks] + args.noise * noise
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [list(np.argsort(-(vectors @ q))[: args.k]) for q in queries]
+
+    # 양자화 자체의 recall은 DB와 무관하므로 NumPy로 정확한 Hamming 상위 후보 → cosine 재정렬을 재현
+    bits = np.packbits(vectors > 0, axis=1)
+    offline = {}
+    for candidates in args.candidates:
+        recalls = []
+        for q, truth in zip(queries, exact):
+            hamming = np.unpackbits(bits ^ np.packbits(q > 0), axis=1).sum(axis=1)
+            shortlist = np.argpartition(hamming, candidates)[:candidates]
+            reranked = shortlist[np.argsort(-(vectors[shortlist] @ q))][: args.k]
+            recalls.append(_recall(list(reranked), truth))
+        offline[candidates] = statistics.mean(recalls)
+
+    Config.COLLECTION_NAME = args.collection
+    store = VectorStoreManager().load_existing_store()
+    documents = [
+        Document(id=str(uuid.uuid4()), page_content=f"chunk {j}", metadata={"row": j})
+        for j in range(args.rows)
+    ]
+
+    def measure(searcher: CollectionSearch):
+        searcher.search(queries[0].tolist(), args.k, args.profile)  # 워밍업
+        latencies, recalls = [], []
+        for q, truth in zip(queries, exact):
+            started = time.perf_counter()
+            found = searcher.search(q.tolist(), args.k, args.profile)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(_recall([doc.metadata["row"] for doc, _ in found], truth))
+        return statistics.median(latencies), statistics.mean(recalls)
+
+    rows = []
+    try:
+        loader = BulkLoader(args.collection, upsert=False)
+        for i in range(0, args.rows, 5000):
+            loader(documents[i : i + 5000], vectors[i : i + 5000].tolist())
+        loader.flush()
+
+        index = create_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+        p50, recall = measure(CollectionSearch(args.collection, binary_rerank=False))
+        rows.append(("single", "-", index["size_bytes"] if index else 0, p50, recall))
+
+        if binary_supported:
+            bit_index = create_hnsw_index(Config.POSTGRES_CONNECTION, args.collection, storage="bit")
+            for candidates in args.candidates:
+                searcher = CollectionSearch(
+                    args.collection, binary_rerank=True, candidates=candidates
+                )
+                p50, recall = measure(searcher)
+                rows.append(
+                    ("binary", candidates, bit_index["size_bytes"] if bit_index else 0, p50, recall)
+                )
+        else:
+            print("⚠️ pgvector 0.7 미만이라 bit 인덱스 검색 측정을 건너뜁니다 (NumPy 재현 recall만 출력).")
+    finally:
+        drop_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+        store.delete_collection()
+
+    print(
+        f"\n🧮 이진 양자화 2단계 검색 벤치마크: {args.rows}행 × {args.dimensions}차원, "
+        f"질의 {args.queries}개, k={args.k}, 프로필 {args.profile}"
+    )
+    print(
+        f"   벡터당 원본 {args.dimensions * 4} bytes (float32) vs 이진 {args.dimensions // 8} bytes "
+        f"→ 전체 {args.rows * args.dimensions * 4 / 2**20:.1f} MB vs {args.rows * args.dimensions / 8 / 2**20:.2f} MB"
+    )
+    print(f"{'mode':>7} | {'candidates':>10} | {'index_mb':>8} | {'p50_ms':>7} | {'recall@k':>8}")
+    for mode, candidates, size, p50, recall in rows:
+        print(f"{mode:>7} | {candidates:>10} | {size / 2**20:8.1f} | {p50:7.2f} | {recall:8.3f}")
+    print("\n   NumPy 재현 (정확한 Hamming 후보 → cosine 재정렬) recall@k")
+    for candidates, recall in offline.items():
+        print(f"{'':>7} | {candidates:>10} | {'':>8} | {'':>7} | {recall:8.3f}")
+
+
+def bench_memory(args: argparse.Namespace) -> None:
+    """프로세스 내 메모리 인덱스(정확 / IVF) vs PostgreSQL HNSW 검색: 지연, recall@k, 메모리 사용량"""
+    import uuid
+
+    import numpy as np
+    from langchain_core.documents import Document
+
+    from bulk_loader import BulkLoader
+    from config import Config
+    from database_setup import create_hnsw_index, drop_hnsw_index
+    from memory_index import InMemoryIndex
+    from vector_search import CollectionSearch
+    from vector_store_manager import VectorStoreManager
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    vectors = _clustered_vectors(args.rows, args.dimensions, seed=42)
+    rng = np.random.default_rng(7)
+    picks = rng.integers(0, args.rows, args.queries)
+    noise = rng.standard_normal((args.queries, args.dimensions))
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    queries = vectors[picks] + args.noise * noise
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [list(np.argsort(-(vectors @ q))[: args.k]) for q in queries]
+    query_lists = [q.tolist() for q in queries]
+
+    Config.COLLECTION_NAME = args.collection
+    store = VectorStoreManager().load_existing_store()
+    documents = [
+        Document(id=str(uuid.uuid4()), page_content=f"chunk {j} " + "x" * 800, metadata={"row": j})
+        for j in range(args.rows)
+    ]
+
+    def measure(search, profile):
+        search(query_lists[0], args.k, profile)  # 워밍업
+        latencies, recalls = [], []
+        for q, truth in zip(query_lists, exact):
+            started = time.perf_counter()
+            found = search(q, args.k, profile)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(_recall([doc.metadata["row"] for doc, _ in found], truth))
+        latencies.sort()
+        return (
+            statistics.median(latencies),
+            latencies[int(len(latencies) * 0.95) - 1],
+            statistics.mean(recalls),
+        )
+
+    results, reports = [], []
+    try:
+        loader = BulkLoader(args.collection, upsert=False)
+        for i in range(0, args.rows, 5000):
+            loader(documents[i : i + 5000], vectors[i : i + 5000].tolist())
+        loader.flush()
+        create_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+
+        searcher = CollectionSearch(args.collection)
+        for profile in ("fast", "balanced", "high_recall"):
+            results.append(("postgres", profile, *measure(searcher.search, profile)))
+
+        for mode, exact_max_rows in (("exact", args.rows), ("ivf", 0)):
+            index = InMemoryIndex(args.collection, exact_max_rows=exact_max_rows)
+            reports.append((mode, index.start()))
+            profiles = ("balanced",) if mode == "exact" else ("fast", "balanced", "high_recall")
+            for profile in profiles:
+                results.append((f"memory-{mode}", profile, *measure(index.search, profile)))
+            index.close()
+    finally:
+        drop_hnsw_index(Config.POSTGRES_CONNECTION, args.collection)
+        store.delete_collection()
+
+    print(
+        f"\n🧠 메모리 인덱스 벤치마크: {args.rows}행 × {args.dimensions}차원, 질의 {args.queries}개, k={args.k}"
+    )
+    print(f"{'backend':>14} | {'profile':>11} | {'p50_ms':>7} | {'p95_ms':>7} | {'recall@k':>8}")
+    for backend, profile, p50, p95, recall in results:
+        print(f"{backend:>14} | {profile:>11} | {p50:7.3f} | {p95:7.3f} | {recall:8.3f}")
+    for mode, report in reports:
+        print(
+            f"   {mode}: 벡터 {report['vectors_mb']} MB + 본문/메타데이터 {report['documents_mb']} MB "
+            f"= {report['total_mb']} MB, 적재 {report['load_seconds']}s"
+            + (f", IVF 파티션 {report['ivf_lists']}개" if report["ivf_lists"] else "")
+        )
+
+
+def bench_pool(args: argparse.Namespace) -> None:
+    """요청마다 새 엔진을 만드는 방식 vs 공유 커넥션 풀: 호출당 지연과 동시 요청 시 연결 수"""
+    import asyncio
+
+    import numpy as np
+    from sqlalchemy import create_engine, text
+
+    from config import Config
+    from database_setup import get_collection_dimensions
+    from db import get_engine, pool_stats
+    from vector_search import CollectionSearch
+
+    query = text("SELECT uuid FROM langchain_pg_collection WHERE name = :name")
+
+    def per_call_engine() -> None:
+        # 기존 get_collection_uuid 방식: 호출마다 엔진(=풀)과 물리 연결을 새로 만든다
+        engine = create_engine(Config.POSTGRES_CONNECTION)
+        with engine.connect() as conn:
+            conn.execute(query, {"name": args.collection}).scalar()
+        engine.dispose()
+
+    def shared_engine() -> None:
+        with get_engine(Config.POSTGRES_CONNECTION).connect() as conn:
+            conn.execute(query, {"name": args.collection}).scalar()
+
+    rows = []
+    for label, call in (("per-call engine", per_call_engine), ("shared pool", shared_engine)):
+        call()  # 워밍업
+        latencies = []
+        for _ in range(args.calls):
+            started = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - started) * 1000)
+        rows.append((label, statistics.median(latencies), sorted(latencies)[int(len(latencies) * 0.95) - 1]))
+
+    print(f"\n🔌 커넥션 재사용 벤치마크: 메타데이터 조회 {args.calls}회")
+    print(f"{'mode':>16} | {'p50_ms':>7} | {'p95_ms':>7}")
+    for label, p50, p95 in rows:
+        print(f"{label:>16} | {p50:7.3f} | {p95:7.3f}")
+
+    # 동시 검색: 연결 수가 풀 크기(+overflow)로 제한되는지 확인
+    searcher = CollectionSearch(args.collection)
+    rng = np.random.default_rng(3)
+    dims = get_collection_dimensions(Config.POSTGRES_CONNECTION, args.collection)
+    if dims is None:
+        print(f"⚠️ 컬렉션이 비어 있어 동시 검색 측정을 건너뜁니다: {args.collection}")
+        return
+    vectors = rng.standard_normal((args.concurrency * args.requests, dims)).tolist()
+
+    async def client(offset: int) -> List[float]:
+        latencies = []
+        for vector in vectors[offset :: args.concurrency]:
+            started = time.perf_counter()
+            await searcher.aretrieve(vector, 5)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    async def run() -> Tuple[List[float], float]:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+        return [lat for group in results for lat in group], time.perf_counter() - started
+
+    latencies, elapsed = asyncio.run(run())
+    latencies.sort()
+    print(
+        f"\n⚡ 동시 검색 {args.concurrency}개 클라이언트 × {args.requests}회: "
+        f"p50 {statistics.median(latencies):.2f} ms, p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, "
+        f"{len(latencies) / elapsed:.1f} req/s"
+    )
+    for name, stats in pool_stats().items():
+        print(
+            f"   {name}: 물리 연결 {stats['connects']}개 (최대 동시 사용 {stats['peak_checked_out']}, "
+            f"풀 {stats['size']} + overflow {stats['max_overflow']}), 체크아웃 {stats['checkouts']}회"
+        )
+
+
+def bench_get_answer(args: argparse.Namespace) -> None:
+    """get_answer 호출당 오버헤드: 매번 새 StudyAssistant + prepare vs 레지스트리의 준비된 assistant 재사용"""
+    _use_stub_openai(args.stub_port)
+    _serve_in_thread(
+        _stub_openai_app(args.embed_latency, args.llm_latency, args.dimensions),
+        args.stub_port,
+    )
+
+    import contextlib
+    import io
+
+    from config import Config
+
+    Config.COLLECTION_NAME = args.collection
+    _seed_collection(args.seed)
+
+    import main as study
+
+    def per_call() -> None:
+        # 기존 get_answer 방식: 호출마다 클라이언트 생성, 스키마 확인, 스토어 로드, 인덱스 확인
+        assistant = study.StudyAssistant()
+        assistant.prepare(rebuild=False, ingest=False)
+        assistant.answer("question 1", k=args.k)
+
+    def registry() -> None:
+        study.get_answer("question 1", k=args.k)
+
+    rows = []
+    for label, call in (("per-call prepare", per_call), ("warm registry", registry)):
+        latencies = []
+        # prepare 로그가 측정 출력에 섞이지 않도록 숨긴다
+        with contextlib.redirect_stdout(io.StringIO()):
+            call()  # 워밍업 (레지스트리는 여기서 한 번 준비)
+            for _ in range(args.calls):
+                started = time.perf_counter()
+                call()
+                latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        rows.append((label, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]))
+    study.assistants.close_all()
+
+    print(
+        f"\n♻️ get_answer 호출당 지연: {args.calls}회 "
+        f"(embed={args.embed_latency}s, llm={args.llm_latency}s 스텁 포함)"
+    )
+    print(f"{'mode':>16} | {'p50_ms':>8} | {'p95_ms':>8}")
+    for label, p50, p95 in rows:
+        print(f"{label:>16} | {p50:8.2f} | {p95:8.2f}")
+    print(f"   호출당 절감: {rows[0][1] - rows[1][1]:.2f} ms (p50)")
+
+
+def bench_startup(args: argparse.Namespace) -> None:
+    """새 프로세스 기준 모듈 import 시간과 API 기동 후 liveness/readiness 응답까지의 시간"""
+    import subprocess
+    import sys
+    import urllib.error
+    import urllib.request
+
+    _use_stub_openai(args.stub_port)
+    _serve_in_thread(_stub_openai_app(0.0, 0.0, args.dimensions), args.stub_port)
+
+    from config import Config
+
+    Config.COLLECTION_NAME = args.collection
+    _seed_collection(args.seed)
+
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def import_seconds(module: str) -> float:
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=backend_dir, capture_output=True, text=True, check=True
+        ).stdout
+        return float(output.strip().splitlines()[-1])
+
+    def status(path: str) -> int:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}{path}", timeout=1) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return 0
+
+    print(f"\n🚀 기동 시간 ({args.runs}회 중앙값)")
+    for module in ("api", "main", "document_processor"):
+        seconds = statistics.median(import_seconds(module) for _ in range(args.runs))
+        print(f"   import {module:<20} {seconds * 1000:8.1f} ms")
+
+    server_code = (
+        f"from config import Config; Config.COLLECTION_NAME = {args.collection!r}; "
+        f"import uvicorn; uvicorn.run('api:app', port={args.port}, log_level='warning')"
+    )
+    live_times, ready_times = [], []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-c", server_code],
+            cwd=backend_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        live = ready = None
+        try:
+            while ready is None and time.perf_counter() - started < args.timeout:
+                if server.poll() is not None:
+                    raise RuntimeError("API 프로세스가 기동 중 종료되었습니다.")
+                if live is None and status("/api/health/live") == 200:
+                    live = time.perf_counter() - started
+                if live is not None and status("/api/health/ready") == 200:
+                    ready = time.perf_counter() - started
+                time.sleep(0.01)
+        finally:
+            server.terminate()
+            server.wait()
+        if ready is None:
+            raise RuntimeError(f"{args.timeout}s 안에 준비되지 않았습니다.")
+        live_times.append(live)
+        ready_times.append(ready)
+
+    print(f"   프로세스 시작 → liveness 200   {statistics.median(live_times) * 1000:8.1f} ms")
+    print(f"   프로세스 시작 → readiness 200  {statistics.median(ready_times) * 1000:8.1f} ms")
+
+
+def _legacy_chunk_bbox(chunk_text: str, words: List) -> Tuple[float, ...]:
+    """이전 DocumentProcessor._find_chunk_bbox (청크 앞/뒤 단어를 페이지 전체 단어와 부분 문자열 비교)"""
+    chunk_words = chunk_text.split()[:5] + chunk_text.split()[-5:]
+    coords = [w[:4] for w in words if any(cw in w[4] for cw in chunk_words)]
+    if not coords:
+        return ()
+    return (
+        min(c[0] for c in coords),
+        min(c[1] for c in coords),
+        max(c[2] for c in coords),
+        max(c[3] for c in coords),
+    )
+
+
+def bench_bbox(args: argparse.Namespace) -> None:
+    """페이지별 청크 bbox 계산 시간: 단어 부분 문자열 비교(이전) vs 문자 오프셋 색인"""
+    import fitz
+
+    from document_processor import DocumentProcessor, PageWordIndex, _word_columns
+
+    processor = DocumentProcessor(parse_cache_dir=None)
+    pdf = fitz.open(args.pdf)
+    pages = min(len(pdf), args.pages) if args.pages else len(pdf)
+    legacy_ms: List[float] = []
+    offset_ms: List[float] = []
+    legacy_area: List[float] = []
+    offset_area: List[float] = []
+    chunks_total = 0
+
+    for page_num in range(pages):
+        page = pdf[page_num]
+        page_text = page.get_text()
+        words = page.get_text("words")
+        chunks = processor.text_splitter.create_documents([page_text])
+        chunks_total += len(chunks)
+        page_area = page.rect.width * page.rect.height or 1.0
+
+        started = time.perf_counter()
+        boxes = [_legacy_chunk_bbox(chunk.page_content, words) for chunk in chunks]
+        legacy_ms.append((time.perf_counter() - started) * 1000)
+        legacy_area.extend((b[2] - b[0]) * (b[3] - b[1]) / page_area for b in boxes if b)
+
+        started = time.perf_counter()
+        index = PageWordIndex(*_word_columns(page_text, words))
+        boxes = []
+        for chunk in chunks:
+            start = chunk.metadata["start_index"]
+            first, last = index.span(start, start + len(chunk.page_content))
+            boxes.append(index.bbox(first, last))
+            if args.line_rects:
+                index.line_rects(first, last)
+        offset_ms.append((time.perf_counter() - started) * 1000)
+        offset_area.extend(b["width"] * b["height"] / page_area for b in boxes if b)
+    pdf.close()
+
+    print(f"\n📐 청크 bbox 계산: {args.pdf} ({pages}페이지, 청크 {chunks_total}개)")
+    print(f"{'method':>14} | {'page p50_ms':>11} | {'page p95_ms':>11} | {'max_ms':>8} | {'total_s':>8} | 평균 bbox 면적")
+    for label, timings, areas in (
+        ("substring", legacy_ms, legacy_area),
+        ("offset index", offset_ms, offset_area),
+    ):
+        timings = sorted(timings)
+        print(
+            f"{label:>14} | {statistics.median(timings):11.3f} | "
+            f"{timings[int(len(timings) * 0.95) - 1]:11.3f} | {timings[-1]:8.3f} | "
+            f"{sum(timings) / 1000:8.3f} | 페이지의 {statistics.mean(areas) * 100:.1f}%"
+        )
+
+
+def bench_parse(args: argparse.Namespace) -> None:
+    """큰 교재 1권 파싱 wall time: 책 단위 작업 vs 페이지 구간 작업 (파싱 워커 수별)"""
+    import fitz
+
+    from document_processor import pdf_page_count
+    from ingest_pipeline import IngestPipeline
+
+    page_count = pdf_page_count(args.pdf)
+    sample = min(page_count, args.extract_pages)
+    pdf = fitz.open(args.pdf)
+    started = time.perf_counter()
+    for page_num in range(sample):
+        page = pdf[page_num]
+        page.get_text()
+        page.get_text("words")
+    two_pass = time.perf_counter() - started
+    started = time.perf_counter()
+    for page_num in range(sample):
+        page = pdf[page_num]
+        textpage = page.get_textpage()
+        page.get_text(textpage=textpage)
+        page.get_text("words", textpage=textpage)
+    one_pass = time.perf_counter() - started
+    pdf.close()
+
+    print(f"\n📖 {args.pdf}: {page_count}페이지 (CPU {os.cpu_count()}개)")
+    print(
+        f"   페이지당 추출: get_text() + get_text('words') {two_pass / sample * 1000:.2f} ms → "
+        f"TextPage 1회 {one_pass / sample * 1000:.2f} ms ({sample}페이지 기준)"
+    )
+
+    pdf_files = [{"path": args.pdf, "name": Path(args.pdf).stem}]
+    print(f"{'workers':>7} | {'pages/task':>10} | {'wall_s':>7} | {'pages/s':>8} | 페이지 순서")
+    for workers in args.workers:
+        for pages_per_task in (page_count, args.pages_per_task):
+            pages_seen: List[int] = []
+
+            def writer(documents, vectors, pages_seen=pages_seen):
+                pages_seen.extend(doc.metadata["page"] for doc in documents)
+
+            pipeline = IngestPipeline(
+                # 파싱만 측정하도록 임베딩은 즉시 반환, 순서 확인을 위해 임베딩 워커 1개
+                embeddings=_FakeEmbeddings(1, 0.0),
+                writer=writer,
+                batch_size=100,
+                parse_workers=workers,
+                embed_workers=1,
+                pages_per_task=pages_per_task,
+                # 반복 측정이 파싱 캐시에 적중하지 않도록 매번 PDF에서 추출
+                parse_cache_dir=None,
+            )
+            summary = pipeline.run(pdf_files).summary()
+            ordered = pages_seen == sorted(pages_seen)
+            label = "book" if pages_per_task >= page_count else str(pages_per_task)
+            print(
+                f"{workers:>7} | {label:>10} | {summary['elapsed_s']:7.2f} | "
+                f"{summary['pages_per_s']:8.1f} | {'OK' if ordered else 'out of order'}"
+            )
+
+
+def bench_rechunk(args: argparse.Namespace) -> None:
+    """청크 크기를 바꿔 재분할할 때: PDF 재추출 vs 파싱 캐시(추출 결과 파일)에서 재분할"""
+    import shutil
+
+    from document_processor import DocumentProcessor
+    from ingest_manifest import file_sha256
+    from parse_cache import ParseCache
+
+    pdfs = sorted(Path(args.folder).glob("*.pdf"))
+    if not pdfs:
+        print(f"❌ PDF가 없습니다: {args.folder}")
+        return
+    # 운영 캐시(PARSE_CACHE_DIR)와 섞이지 않도록 임시 디렉터리 사용, 측정 후 삭제
+    cache_dir = tempfile.mkdtemp(prefix="bench-parse-cache-")
+    hashes = {str(path): file_sha256(str(path)) for path in pdfs}
+
+    def run(chunk_size: int, parse_cache_dir) -> Tuple[float, float, int, list]:
+        processor = DocumentProcessor(
+            chunk_size=chunk_size,
+            chunk_overlap=min(args.chunk_overlap, chunk_size // 2),
+            parse_cache_dir=parse_cache_dir,
+        )
+        load_s = 0.0
+        split_s = 0.0
+        pages = 0
+        chunks = []
+        for path in pdfs:
+            started = time.perf_counter()
+            parsed = processor.load_pages(str(path), 0, 1 << 30, hashes[str(path)])
+            load_s += time.perf_counter() - started
+            started = time.perf_counter()
+            documents = processor.chunk_pages(parsed, path.stem, path.name)
+            split_s += time.perf_counter() - started
+            pages += len(parsed)
+            chunks.extend((doc.page_content, doc.metadata) for doc in documents)
+        return load_s, split_s, pages, chunks
+
+    try:
+        print(f"\n✂️  재분할: {args.folder} (PDF {len(pdfs)}권, 캐시 {cache_dir})")
+        print(
+            f"{'mode':>14} | {'chunk_size':>10} | {'wall_s':>7} | {'load_s':>7} | "
+            f"{'split_s':>7} | {'pages/s':>8} | {'chunks':>7} | 결과"
+        )
+        for chunk_size in args.chunk_sizes:
+            results = [("pdf extract", run(chunk_size, None))]
+            if chunk_size == args.chunk_sizes[0]:
+                # 첫 실행은 PDF에서 추출하며 캐시 생성
+                results.append(("cache (cold)", run(chunk_size, cache_dir)))
+            results.append(("cache (warm)", run(chunk_size, cache_dir)))
+            reference = results[0][1][3]
+            for label, (load_s, split_s, pages, chunks) in results:
+                wall = load_s + split_s
+                print(
+                    f"{label:>14} | {chunk_size:>10} | {wall:7.2f} | {load_s:7.2f} | "
+                    f"{split_s:7.2f} | {pages / wall:8.1f} | {len(chunks):>7} | "
+                    f"{'identical' if chunks == reference else 'DIFFERENT'}"
+                )
+
+        cache = ParseCache(cache_dir)
+        pdf_mb = sum(path.stat().st_size for path in pdfs) / 1e6
+        cache_mb = sum(cache.book_bytes(file_hash) for file_hash in hashes.values()) / 1e6
+        print(f"   PDF {pdf_mb:.1f} MB → 추출 결과 파일 {cache_mb:.1f} MB")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _rate_limited_stub_app(
+    latency: float, dimensions: int, rpm: float, tpm: float, counters: dict
+):
+    """분당 요청/토큰 한도를 넘으면 429 + Retry-After를 돌려주는 /v1/embeddings 스텁 서버
+
+    한도는 토큰 버킷(1초 분량 버스트)으로 적용하고, 토큰 수는 클라이언트 추정과 다르게
+    UTF-8 4바이트당 1토큰으로 센다.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI()
+    # 0인 한도는 적용하지 않음
+    limits = {name: limit / 60 for name, limit in (("requests", rpm), ("tokens", tpm)) if limit}
+    available = dict(limits)
+    updated = [time.monotonic()]
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        need = {
+            "requests": 1,
+            "tokens": sum(
+                len(item) if isinstance(item, list) else len(str(item).encode("utf-8")) // 4 + 1
+                for item in inputs
+            ),
+        }
+        counters["requests"] += 1
+
+        now = time.monotonic()
+        for name, rate in limits.items():
+            available[name] = min(rate, available[name] + (now - updated[0]) * rate)
+        updated[0] = now
+        # 한 요청이 버킷 용량보다 크면 버킷이 가득 찼을 때만 통과 (잔량은 음수가 됨)
+        short = {name: min(need[name], limits[name]) - available[name] for name in limits}
+        if any(value > 0 for value in short.values()):
+            counters["rate_limited"] += 1
+            wait = max(value / limits[name] for name, value in short.items())
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after-ms": str(int(wait * 1000) + 1)},
+                content={
+                    "error": {
+                        "message": "Rate limit reached",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+            )
+        for name in limits:
+            available[name] -= need[name]
+
+        await asyncio.sleep(latency)
+        return {
+            "object": "list",
+            "model": body.get("model"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _stub_vector(str(item), dimensions)}
+                for i, item in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": need["tokens"], "total_tokens": need["tokens"]},
+        }
+
+    return app
+
+
+def bench_embed(args: argparse.Namespace) -> None:
+    """임베딩 단계 처리량: 문서 100개 배치 + 클라이언트 자체 재시도 vs 토큰 배치 + 공유 속도 제한"""
+    from langchain_openai import OpenAIEmbeddings
+
+    from config import Config
+    from embedding_scheduler import RateLimitedEmbeddings, RateLimiter
+    from folder_vectorize import _list_pdfs
+    from ingest_pipeline import IngestPipeline
+
+    counters = {"requests": 0, "rate_limited": 0}
+    server = _serve_in_thread(
+        _rate_limited_stub_app(args.latency, args.dimensions, args.rpm, args.tpm, counters),
+        args.stub_port,
+    )
+    pdf_files = _list_pdfs(args.folder)
+    base_url = f"http://127.0.0.1:{args.stub_port}/v1"
+
+    print(
+        f"\n🧮 임베딩 스케줄링: {args.folder} (PDF {len(pdf_files)}권), 스텁 지연 {args.latency}s, "
+        f"한도 {args.rpm:.0f} RPM / {args.tpm:.0f} TPM"
+    )
+    print(
+        f"{'mode':>10} | {'concurrency':>11} | {'wall_s':>7} | {'chunks/s':>8} | "
+        f"{'requests':>8} | {'429':>5} | 저장 순서"
+    )
+    try:
+        for mode in ("batch100", "scheduler"):
+            for concurrency in args.concurrency:
+                # 토큰 추정에 tiktoken 인코딩 다운로드가 필요 없도록 문자열 그대로 전송
+                client = OpenAIEmbeddings(
+                    model="text-embedding-3-small",
+                    openai_api_key="stub",
+                    base_url=base_url,
+                    check_embedding_ctx_length=False,
+                    max_retries=2 if mode == "batch100" else 0,
+                )
+                embeddings = (
+                    client
+                    if mode == "batch100"
+                    else RateLimitedEmbeddings(
+                        client,
+                        RateLimiter(
+                            requests_per_minute=args.client_rpm,
+                            tokens_per_minute=args.client_tpm,
+                        ),
+                    )
+                )
+                positions: List[Tuple[str, int, int]] = []
+
+                def writer(documents, vectors, positions=positions):
+                    positions.extend(
+                        (doc.metadata["book_name"], doc.metadata["page"], doc.metadata["chunk_index"])
+                        for doc in documents
+                    )
+
+                pipeline = IngestPipeline(
+                    embeddings=embeddings,
+                    writer=writer,
+                    batch_size=100,
+                    # batch100은 이전처럼 문서 수로만 배치 구성
+                    batch_tokens=(
+                        1 << 30 if mode == "batch100" else args.batch_tokens or Config.EMBED_BATCH_TOKENS
+                    ),
+                    parse_workers=1,
+                    embed_workers=concurrency,
+                )
+                counters.update(requests=0, rate_limited=0)
+                started = time.perf_counter()
+                try:
+                    summary = pipeline.run(pdf_files).summary()
+                except Exception as e:
+                    print(
+                        f"{mode:>10} | {concurrency:>11} | {time.perf_counter() - started:7.2f} | "
+                        f"{'-':>8} | {counters['requests']:>8} | {counters['rate_limited']:>5} | "
+                        f"실패: {type(e).__name__}"
+                    )
+                    continue
+                expected = [
+                    (info["name"], page, index)
+                    for info in pdf_files
+                    for page, index in sorted(
+                        (p, i) for name, p, i in positions if name == info["name"]
+                    )
+                ]
+                print(
+                    f"{mode:>10} | {concurrency:>11} | {summary['elapsed_s']:7.2f} | "
+                    f"{summary['chunks_per_s']:8.1f} | {counters['requests']:>8} | "
+                    f"{counters['rate_limited']:>5} | {'OK' if positions == expected else 'mixed'}"
+                )
+    finally:
+        server.should_exit = True
+
+
+def bench_backends(args: argparse.Namespace) -> None:
+    """임베딩 백엔드별 수집(파싱 캐시 적중 + 임베딩) chunks/s, 질문 임베딩 지연, 자기 검색 top-1 정확도"""
+    import random
+
+    import numpy as np
+
+    # openai 백엔드는 스텁 서버로 보내 네트워크 없이 측정 (모든 백엔드 같은 차원)
+    os.environ["EMBEDDING_DIMENSIONS"] = str(args.dimensions)
+    _use_stub_openai(args.stub_port)
+
+    from embedding_backends import create_embeddings, resolve_embedding_backend
+    from folder_vectorize import _list_pdfs
+    from ingest_pipeline import IngestPipeline
+
+    backends = [resolve_embedding_backend(name) for name in args.backends]
+    pdf_files = _list_pdfs(args.folder)
+    server = (
+        _serve_in_thread(_stub_openai_app(args.latency, 0.0, args.dimensions), args.stub_port)
+        if "openai" in backends
+        else None
+    )
+
+    print(
+        f"\n🧪 임베딩 백엔드: {args.folder} (PDF {len(pdf_files)}권), {args.dimensions}차원, "
+        f"질문 {args.queries}개, openai 스텁 지연 {args.latency}s"
+    )
+    print(
+        f"{'backend':>8} | {'ingest_s':>8} | {'chunks/s':>8} | {'query_p50_ms':>12} | "
+        f"{'queries/s':>9} | {'top1':>5}"
+    )
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # 파싱 캐시를 먼저 채워 백엔드별 측정에서 PDF 추출 시간을 빼고 비교
+            IngestPipeline(
+                embeddings=_FakeEmbeddings(8, 0.0), writer=None, parse_workers=1,
+                parse_cache_dir=cache_dir,
+            ).run(pdf_files)
+
+            for name in backends:
+                texts: List[str] = []
+                vectors: List[List[float]] = []
+
+                def writer(documents, batch_vectors, texts=texts, vectors=vectors):
+                    texts.extend(doc.page_content for doc in documents)
+                    vectors.extend(batch_vectors)
+
+                try:
+                    embeddings = create_embeddings(name)
+                    summary = IngestPipeline(
+                        embeddings=embeddings,
+                        writer=writer,
+                        parse_workers=1,
+                        embed_workers=args.embed_workers,
+                        parse_cache_dir=cache_dir,
+                    ).run(pdf_files).summary()
+
+                    # 청크 중간 일부를 질문으로 삼아 원래 청크가 가장 가까운지 확인
+                    rng = random.Random(0)
+                    sources = [rng.randrange(len(texts)) for _ in range(args.queries)]
+                    queries = [
+                        texts[i][len(texts[i]) // 4 : len(texts[i]) // 4 + args.query_chars]
+                        for i in sources
+                    ]
+                    latencies = []
+                    query_vectors = []
+                    for query in queries:
+                        started = time.perf_counter()
+                        query_vectors.append(embeddings.embed_query(query))
+                        latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    print(f"{name:>8} | 실패: {type(e).__name__}: {e}")
+                    continue
+
+                top = np.argmax(
+                    np.asarray(query_vectors, dtype=np.float32)
+                    @ np.asarray(vectors, dtype=np.float32).T,
+                    axis=1,
+                )
+                hits = sum(texts[t] == texts[s] for t, s in zip(top, sources))
+                print(
+                    f"{name:>8} | {summary['elapsed_s']:8.2f} | {summary['chunks_per_s']:8.1f} | "
+                    f"{statistics.median(latencies) * 1000:12.2f} | "
+                    f"{len(latencies) / sum(latencies):9.1f} | {hits / len(sources):5.2f}"
+                )
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="백엔드 성능 벤치마크")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze = subparsers.add_parser("analyze", help="/api/analyze 동시성 부하 테스트")
+    analyze.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    analyze.add_argument("--requests", type=int, default=5, help="클라이언트당 요청 수")
+    analyze.add_argument("--embed-latency", type=float, default=0.05)
+    analyze.add_argument("--llm-latency", type=float, default=0.5)
+    analyze.add_argument("--dimensions", type=int, default=1536)
+    analyze.add_argument("--seed", type=int, default=500, help="합성 청크 개수")
+    analyze.add_argument("--collection", default=BENCH_COLLECTION)
+    analyze.add_argument(
+        "--stream", action="store_true", help="/api/analyze/stream (SSE) 경로 측정"
+    )
+    analyze.add_argument("--port", type=int, default=8100)
+    analyze.add_argument("--stub-port", type=int, default=8101)
+    analyze.set_defaults(func=bench_analyze)
+
+    ingest = subparsers.add_parser("ingest", help="PDF 폴더 수집 파이프라인 처리량 측정")
+    ingest.add_argument("folder", help="PDF가 위치한 폴더 경로")
+    ingest.add_argument("--batch-size", type=int, default=100)
+    ingest.add_argument("--parse-workers", type=int, default=None)
+    ingest.add_argument("--embed-workers", type=int, default=4)
+    ingest.add_argument("--pages-per-task", type=int, default=32, help="파싱 작업당 페이지 수")
+    ingest.add_argument("--embed-latency", type=float, default=0.2, help="배치당 가짜 임베딩 지연(초)")
+    ingest.add_argument("--dimensions", type=int, default=1536)
+    ingest.add_argument(
+        "--write", action="store_true", help="벤치마크 컬렉션에 실제로 저장 (기본은 쓰기 생략)"
+    )
+    ingest.add_argument("--collection", default=BENCH_COLLECTION)
+    ingest.set_defaults(func=bench_ingest)
+
+    copy = subparsers.add_parser("copy", help="임베딩 행 적재 속도 비교 (INSERT vs COPY)")
+    copy.add_argument("--rows", type=int, default=20000)
+    copy.add_argument("--dimensions", type=int, default=1536)
+    copy.add_argument("--batch-size", type=int, default=100, help="writer 호출당 행 수")
+    copy.add_argument("--flush-rows", type=int, default=5000, help="COPY 트랜잭션당 행 수")
+    copy.add_argument("--collection", default=BENCH_COLLECTION)
+    copy.set_defaults(func=bench_copy)
+
+    index = subparsers.add_parser("index", help="HNSW 인덱스 적재 중 유지 vs 적재 후 빌드 비교")
+    index.add_argument("--rows", type=int, default=20000)
+    index.add_argument("--dimensions", type=int, default=1536)
+    index.add_argument("--m", type=int, default=16)
+    index.add_argument("--ef-construction", type=int, default=64)
+    index.add_argument("--maintenance-work-mem", default="512MB")
+    index.add_argument("--parallel-workers", type=int, default=None)
+    index.add_argument("--collection", default=BENCH_COLLECTION)
+    index.set_defaults(func=bench_index)
+
+    collections = subparsers.add_parser(
+        "collections", help="컬렉션 수에 따른 검색 지연/recall (전체 인덱스 vs partial 인덱스)"
+    )
+    collections.add_argument("--tenants", type=int, default=4, help="컬렉션 수")
+    collections.add_argument("--rows", type=int, default=2000, help="컬렉션당 행 수")
+    collections.add_argument("--dimensions", type=int, default=1536)
+    collections.add_argument("--queries", type=int, default=50)
+    collections.add_argument("--k", type=int, default=5)
+    collections.add_argument("--collection", default=BENCH_COLLECTION)
+    collections.set_defaults(func=bench_collections)
+
+    recall = subparsers.add_parser("recall", help="검색 프로필별 recall/지연 (정확 검색 대비)")
+    recall.add_argument("--rows", type=int, default=20000)
+    recall.add_argument("--dimensions", type=int, default=1536)
+    recall.add_argument("--queries", type=int, default=100)
+    recall.add_argument("--k", type=int, default=5)
+    recall.add_argument("--noise", type=float, default=0.3, help="질의 벡터에 더할 잡음 크기")
+    recall.add_argument("--collection", default=BENCH_COLLECTION)
+    recall.set_defaults(func=bench_recall)
+
+    dims = subparsers.add_parser("dims", help="차원 축소/halfvec 인덱스 크기, 지연, recall 비교")
+    dims.add_argument(
+        "--configs",
+        nargs="+",
+        default=["1536:vector", "1024:vector", "768:vector", "512:vector", "1536:halfvec", "768:halfvec"],
+        help="<차원>:<vector|halfvec> 목록",
+    )
+    dims.add_argument("--rows", type=int, default=20000)
+    dims.add_argument("--dimensions", type=int, default=1536, help="원본(기준) 차원")
+    dims.add_argument("--queries", type=int, default=100)
+    dims.add_argument("--k", type=int, default=5)
+    dims.add_argument("--noise", type=float, default=0.3, help="질의 잡음 (원본 벡터 노름 대비 비율)")
+    dims.add_argument(
+        "--decay", type=float, default=0.5, help="합성 벡터 성분 감쇠 지수 (Matryoshka 분포 흉내)"
+    )
+    dims.add_argument(
+        "--source-collection", default=None, help="합성 대신 이 컬렉션에 저장된 실제 임베딩 사용"
+    )
+    dims.add_argument("--profile", default="high_recall")
+    dims.add_argument("--collection", default=BENCH_COLLECTION)
+    dims.set_defaults(func=bench_dims)
+
+    binary = subparsers.add_parser(
+        "binary", help="이진 양자화 2단계 검색 vs 단일 단계 검색 메모리/지연/recall 비교"
+    )
+    binary.add_argument("--rows", type=int, default=20000)
+    binary.add_argument("--dimensions", type=int, default=1536)
+    binary.add_argument("--queries", type=int, default=100)
+    binary.add_argument("--k", type=int, default=5)
+    binary.add_argument("--noise", type=float, default=0.3, help="질의 잡음 (단위 벡터 대비 비율)")
+    binary.add_argument(
+        "--candidates", type=int, nargs="+", default=[50, 100, 200, 400], help="1단계 후보 수"
+    )
+    binary.add_argument("--profile", default="balanced")
+    binary.add_argument("--collection", default=BENCH_COLLECTION)
+    binary.set_defaults(func=bench_binary)
+
+    memory = subparsers.add_parser(
+        "memory", help="메모리 인덱스(정확 / IVF) vs PostgreSQL 검색 지연/recall/메모리 비교"
+    )
+    memory.add_argument("--rows", type=int, default=100000)
+    memory.add_argument("--dimensions", type=int, default=1536)
+    memory.add_argument("--queries", type=int, default=200)
+    memory.add_argument("--k", type=int, default=5)
+    memory.add_argument("--noise", type=float, default=0.3, help="질의 잡음 (단위 벡터 대비 비율)")
+    memory.add_argument("--collection", default=BENCH_COLLECTION)
+    memory.set_defaults(func=bench_memory)
+
+    pool = subparsers.add_parser("pool", help="호출마다 새 엔진 vs 공유 커넥션 풀, 동시 검색 시 연결 수")
+    pool.add_argument("--calls", type=int, default=200)
+    pool.add_argument("--concurrency", type=int, default=64)
+    pool.add_argument("--requests", type=int, default=10, help="클라이언트당 검색 수")
+    pool.add_argument("--collection", default="e2e_chunks")
+    pool.set_defaults(func=bench_pool)
+
+    get_answer = subparsers.add_parser(
+        "get-answer", help="get_answer 호출당 오버헤드 (매번 prepare vs 준비된 assistant 재사용)"
+    )
+    get_answer.add_argument("--calls", type=int, default=30)
+    get_answer.add_argument("--k", type=int, default=5)
+    get_answer.add_argument("--embed-latency", type=float, default=0.0)
+    get_answer.add_argument("--llm-latency", type=float, default=0.0)
+    get_answer.add_argument("--dimensions", type=int, default=1536)
+    get_answer.add_argument("--seed", type=int, default=500, help="합성 청크 개수")
+    get_answer.add_argument("--collection", default=BENCH_COLLECTION)
+    get_answer.add_argument("--stub-port", type=int, default=8101)
+    get_answer.set_defaults(func=bench_get_answer)
+
+    startup = subparsers.add_parser("startup", help="모듈 import 시간과 API liveness/readiness 도달 시간")
+    startup.add_argument("--runs", type=int, default=3)
+    startup.add_argument("--timeout", type=float, default=120)
+    startup.add_argument("--dimensions", type=int, default=1536)
+    startup.add_argument("--seed", type=int, default=500, help="합성 청크 개수")
+    startup.add_argument("--collection", default=BENCH_COLLECTION)
+    startup.add_argument("--port", type=int, default=8100)
+    startup.add_argument("--stub-port", type=int, default=8101)
+    startup.set_defaults(func=bench_startup)
+
+    bbox = subparsers.add_parser("bbox", help="페이지별 청크 bbox 계산 시간 (부분 문자열 비교 vs 문자 오프셋 색인)")
+    bbox.add_argument("pdf", help="측정할 PDF 경로 (큰 교재 권장)")
+    bbox.add_argument("--pages", type=int, default=0, help="앞에서부터 측정할 페이지 수 (0이면 전체)")
+    bbox.add_argument("--line-rects", action="store_true", help="줄 단위 사각형 계산 포함")
+    bbox.set_defaults(func=bench_bbox)
+
+    parse = subparsers.add_parser("parse", help="큰 교재 1권 파싱 wall time (책 단위 vs 페이지 구간 작업)")
+    parse.add_argument("pdf", help="측정할 PDF 경로 (큰 교재 권장)")
+    parse.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="파싱 프로세스 수")
+    parse.add_argument("--pages-per-task", type=int, default=32)
+    parse.add_argument("--extract-pages", type=int, default=200, help="추출 방식 비교에 쓸 페이지 수")
+    parse.set_defaults(func=bench_parse)
+
+    rechunk = subparsers.add_parser(
+        "rechunk", help="청크 크기 변경 후 재분할 시간 (PDF 재추출 vs 파싱 캐시)"
+    )
+    rechunk.add_argument("folder", help="PDF가 위치한 폴더 경로")
+    rechunk.add_argument("--chunk-sizes", type=int, nargs="+", default=[1000, 500, 1500])
+    rechunk.add_argument("--chunk-overlap", type=int, default=200)
+    rechunk.set_defaults(func=bench_rechunk)
+
+    embed = subparsers.add_parser(
+        "embed", help="임베딩 단계 chunks/s (동시 요청 수별, rate limit 스텁 서버)"
+    )
+    embed.add_argument("folder", help="PDF가 위치한 폴더 경로")
+    embed.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    embed.add_argument("--latency", type=float, default=0.5, help="요청당 스텁 지연(초)")
+    embed.add_argument("--rpm", type=float, default=600, help="스텁 서버의 분당 요청 한도 (0이면 없음)")
+    embed.add_argument("--tpm", type=float, default=6_000_000, help="스텁 서버의 분당 토큰 한도 (0이면 없음)")
+    embed.add_argument("--client-rpm", type=float, default=0, help="클라이언트에 설정할 한도 (0이면 429로 추정)")
+    embed.add_argument("--client-tpm", type=float, default=0)
+    embed.add_argument("--batch-tokens", type=int, default=None, help="기본값은 EMBED_BATCH_TOKENS")
+    # 벡터 직렬화 비용이 측정을 가리지 않도록 작게
+    embed.add_argument("--dimensions", type=int, default=16)
+    embed.add_argument("--stub-port", type=int, default=8102)
+    embed.set_defaults(func=bench_embed)
+
+    backends = subparsers.add_parser(
+        "backends", help="임베딩 백엔드별 수집/질문 임베딩 처리량과 검색 정확도 (오프라인)"
+    )
+    backends.add_argument("folder", help="PDF가 위치한 폴더 경로")
+    backends.add_argument("--backends", nargs="+", default=["hash", "openai"], help="openai는 스텁 서버 사용")
+    backends.add_argument("--dimensions", type=int, default=1536)
+    backends.add_argument("--embed-workers", type=int, default=4)
+    backends.add_argument("--queries", type=int, default=200)
+    backends.add_argument("--query-chars", type=int, default=200, help="청크에서 잘라 질문으로 쓸 길이")
+    backends.add_argument("--latency", type=float, default=0.0, help="openai 스텁의 요청당 지연(초)")
+    backends.add_argument("--stub-port", type=int, default=8103)
+    backends.set_defaults(func=bench_backends)
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
+
+
+'''
+Usage
+
+python backend/benchmark.py analyze: 스텁 OpenAI 서버 + 실제 PostgreSQL로 /api/analyze 처리량을 동시성별로 측정합니다.
+  (벤치마크 전용 컬렉션 bench_chunks 를 사용하므로 운영 컬렉션에는 영향이 없습니다.)
+  --stream 을 주면 SSE 엔드포인트를 측정하며, TTFB(첫 이벤트까지의 시간)로 체감 지연을 비교할 수 있습니다.
+python backend/benchmark.py ingest <폴더경로>: 가짜 임베딩으로 수집 파이프라인의 pages/s, chunks/s 를 측정합니다.
+  --parse-workers 1 --embed-workers 1 로 순차 처리와 비교할 수 있고, --write 로 DB 쓰기까지 포함합니다.
+python backend/benchmark.py copy: 합성 행으로 PGVector INSERT 경로와 binary COPY 적재의 rows/s 를 비교합니다.
+  (INGEST_BULK_LOAD=false 로 수집 시 기존 INSERT 경로를 사용할 수 있습니다.)
+python backend/benchmark.py index: HNSW 인덱스를 둔 채 적재하는 경우와 적재 후 한 번에 빌드하는 경우의
+  총 소요 시간, 빌드 시간, 인덱스 크기를 비교합니다. (--m, --ef-construction, --maintenance-work-mem, --parallel-workers)
+python backend/benchmark.py collections --tenants 8: 여러 컬렉션이 한 테이블에 있을 때 테이블 전체 인덱스와
+  컬렉션별 partial 인덱스의 검색 p50 지연과 recall@k 를 비교합니다. (--tenants 를 바꿔 가며 증가 추세 확인)
+python backend/benchmark.py recall: 고정된 질의 집합으로 검색 프로필(fast / balanced / high_recall)의
+  p50/p95 지연과 recall@k 를 정확 검색(인덱스 미사용)과 비교합니다.
+python backend/benchmark.py dims: 임베딩 차원 축소(Matryoshka 방식 절단)와 halfvec 인덱스의 인덱스 크기, 검색 지연,
+  recall@k 를 1536차원 float32 정확 검색 기준으로 비교합니다. (halfvec은 pgvector 0.7 이상에서만 측정)
+  합성 벡터는 앞쪽 성분에 정보가 몰리도록 감쇠(--decay)시키며, --source-collection 으로 실제 임베딩을 쓸 수 있습니다.
+python backend/benchmark.py binary: 이진 양자화(bit) 인덱스로 후보를 추리고 원본 벡터로 재정렬하는 2단계 검색을
+  단일 단계 검색과 인덱스 크기, p50 지연, recall@k 로 비교합니다. (--candidates 로 1단계 후보 수 조절)
+  bit 인덱스 검색은 pgvector 0.7 이상에서만 측정하며, 양자화 recall은 NumPy로 항상 재현해 출력합니다.
+python backend/benchmark.py memory --rows 100000: 컬렉션을 프로세스 메모리에 올린 검색(정확 / IVF)과
+  PostgreSQL HNSW 검색의 p50/p95 지연, recall@k, 메모리 사용량과 적재 시간을 비교합니다.
+  (API에서는 MEMORY_INDEX_ENABLED=true 로 켜며, 사용량은 /api/cache/stats 의 memory_index 에서 확인)
+python backend/benchmark.py pool --collection <컬렉션>: 호출마다 엔진을 새로 만드는 방식과 공유 커넥션 풀의 호출당 지연,
+  동시 검색 시 실제로 열린 물리 연결 수를 비교합니다. (DB_POOL_SIZE / DB_MAX_OVERFLOW 로 풀 크기 조절, /api/db/stats 로 확인)
+python backend/benchmark.py get-answer: main.get_answer 를 매번 새 StudyAssistant 로 준비하던 방식과
+  프로세스 전역 레지스트리(main.assistants)의 준비된 assistant 를 재사용하는 방식의 호출당 p50/p95 지연을 비교합니다.
+  (스텁 지연은 기본 0초라 순수 준비 오버헤드만 측정되며, --embed-latency / --llm-latency 로 실제 호출 비중을 더할 수 있습니다.)
+python backend/benchmark.py startup: 새 프로세스에서 api / main / document_processor 모듈의 import 시간과
+  API 프로세스 시작부터 /api/health/live, /api/health/ready 가 200을 반환할 때까지의 시간을 측정합니다.
+  (assistant 준비는 백그라운드에서 진행되며, 준비 전 질의 요청은 503 + Retry-After 로 응답합니다.)
+python backend/benchmark.py bbox <PDF경로>: 페이지마다 청크 bbox 를 계산하는 시간(p50/p95/최대, 합계)과 평균 bbox 면적을
+  이전 방식(청크 앞/뒤 단어를 페이지 전체 단어와 부분 문자열 비교)과 문자 오프셋 → 단어 색인 방식으로 비교합니다.
+  (--line-rects 로 줄 단위 사각형 계산 포함, 수집 시에는 CHUNK_LINE_RECTS=true 로 저장)
+python backend/benchmark.py parse <PDF경로> --workers 1 4 16: 큰 교재 1권을 책 단위 작업 1개로 파싱할 때와
+  페이지 구간(--pages-per-task, 기본 32페이지) 작업으로 나눠 여러 프로세스에 분배할 때의 wall time 을 비교합니다.
+  페이지당 추출(get_text 두 번 vs TextPage 1회) 시간과, 결과가 페이지 순서대로 나오는지도 함께 확인합니다.
+python backend/benchmark.py rechunk <폴더경로> --chunk-sizes 1000 500 1500: 청크 크기를 바꿔 재분할할 때 PDF에서 다시
+  추출하는 경우와 파싱 캐시(PDF 해시별 페이지 텍스트 + 단어 좌표 파일)에서 읽는 경우의 wall time 을 추출(load_s)과
+  청크 분할(split_s)로 나눠 비교하고, 결과 청크가 같은지와 PDF 대비 캐시 파일 크기를 확인합니다.
+  (수집 시 캐시는 PARSE_CACHE_DIR 에 쌓이며 PARSE_CACHE_ENABLED=false 로 끌 수 있습니다.)
+python backend/benchmark.py embed <폴더경로> --concurrency 1 2 4 8 16: 분당 요청/토큰 한도를 넘으면 429 + Retry-After 를
+  돌려주는 스텁 임베딩 서버(--rpm, --tpm, --latency)를 두고, 이전 방식(문서 100개 배치 + 클라이언트 자체 재시도)과
+  토큰 수 기준 배치 + 공유 RateLimiter(토큰 버킷, 429 시 전체 대기 후 속도 조절) 방식의 chunks/s, 요청 수, 429 수,
+  저장 순서 유지 여부를 동시 요청 수별로 비교합니다. (수집 시 INGEST_EMBED_WORKERS, EMBED_BATCH_TOKENS,
+  EMBED_RPM_LIMIT / EMBED_TPM_LIMIT, EMBED_MAX_RETRIES 로 조절)
+python backend/benchmark.py backends <폴더경로>: 임베딩 백엔드(EMBEDDING_BACKEND: openai / ollama / hash)별로 수집
+  파이프라인의 chunks/s(파싱 캐시 적중, DB 쓰기 제외), 질문 임베딩 p50 지연과 queries/s, 청크 일부를 질문으로 삼았을 때
+  원래 청크가 top-1 로 나오는 비율을 비교합니다. openai 는 스텁 서버(벡터가 내용과 무관)로, hash 는 프로세스 안에서
+  계산하므로 네트워크 없이 우리 코드의 처리량만 측정됩니다. (ollama 는 OLLAMA_BASE_URL 의 서버가 있을 때 --backends 에 추가)
+'''
@@ -0,0 +1,145 @@
+# bulk_loader.py
+import io
+import json
+import struct
+import threading
+import uuid
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from config import Config
+from database_setup import get_collection_uuid
+from db import raw_connection
+
+
+# PostgreSQL binary COPY 포맷: 시그니처 + flags(int32) + 헤더 확장 길이(int32)
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+_COLUMNS = "id, collection_id, embedding, document, cmetadata"
+
+
+def _field(payload: bytes) -> bytes:
+    return struct.pack(">i", len(payload)) + payload
+
+
+def _encode_vector(vector: List[float]) -> bytes:
+    # pgvector 바이너리 표현: dim(int16) + unused(int16) + float4[dim] (big-endian)
+    dim = len(vector)
+    return struct.pack(f">hh{dim}f", dim, 0, *vector)
+
+
+def _encode_row(
+    row_id: str, collection_id: bytes, vector: List[float], document: str, metadata: dict
+) -> bytes:
+    return b"".join(
+        (
+            struct.pack(">h", 5),
+            _field(row_id.encode("utf-8")),
+            _field(collection_id),
+            _field(_encode_vector(vector)),
+            _field(document.encode("utf-8")),
+            # jsonb 바이너리 표현: 버전(1) + JSON 텍스트
+            _field(b"\x01" + json.dumps(metadata, ensure_ascii=False).encode("utf-8")),
+        )
+    )
+
+
+class BulkLoader:
+    """langchain_pg_embedding 대량 적재기 (binary COPY, 큰 배치당 한 트랜잭션)
+
+    langchain-postgres와 같은 스키마/컬럼에 그대로 쓰므로 load_existing_store로 읽을 수 있다.
+    수집 파이프라인의 writer로 쓰면 flush_rows개가 모일 때마다 한 번에 COPY 한다.
+
+    - upsert=True: 임시 테이블로 COPY 후 INSERT ... ON CONFLICT (id) DO UPDATE
+      (결정적 id로 같은 청크를 다시 쓰는 재구축용)
+    - upsert=False: 대상 테이블로 바로 COPY (id가 새 것임이 보장된 증분 수집용)
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        connection_string: str = Config.POSTGRES_CONNECTION,
+        flush_rows: int = Config.BULK_LOAD_ROWS,
+        upsert: bool = True,
+    ):
+        self.collection_name = collection_name
+        self.connection_string = connection_string
+        self.flush_rows = flush_rows
+        self.upsert = upsert
+        self.rows_written = 0
+        self._buffer = io.BytesIO()
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._collection_id: Optional[bytes] = None
+
+    def __call__(self, documents: List[Document], embeddings: List[List[float]]) -> None:
+        self.add(documents, embeddings)
+
+    def add(self, documents: List[Document], embeddings: List[List[float]]) -> None:
+        """버퍼에 추가하고, flush_rows 이상 모이면 COPY 실행"""
+        collection_id = self._get_collection_id()
+        with self._lock:
+            for doc, vector in zip(documents, embeddings):
+                self._buffer.write(
+                    _encode_row(
+                        doc.id or str(uuid.uuid4()),
+                        collection_id,
+                        vector,
+                        doc.page_content,
+                        doc.metadata or {},
+                    )
+                )
+            self._buffered += len(documents)
+            should_flush = self._buffered >= self.flush_rows
+
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """버퍼에 쌓인 행을 한 트랜잭션으로 적재하고 적재한 행 수 반환"""
+        with self._lock:
+            if not self._buffered:
+                return 0
+            payload = io.BytesIO(_COPY_HEADER + self._buffer.getvalue() + _COPY_TRAILER)
+            count = self._buffered
+            self._buffer = io.BytesIO()
+            self._buffered = 0
+
+            with raw_connection(self.connection_string) as conn:
+                with conn, conn.cursor() as cursor:
+                    # 큰 배치 COPY는 공유 풀의 문장 타임아웃보다 오래 걸릴 수 있다
+                    cursor.execute("SET LOCAL statement_timeout = 0;")
+                    if self.upsert:
+                        cursor.execute(
+                            "CREATE TEMP TABLE _bulk_embedding "
+                            "(LIKE langchain_pg_embedding INCLUDING DEFAULTS) ON COMMIT DROP"
+                        )
+                        cursor.copy_expert(
+                            f"COPY _bulk_embedding ({_COLUMNS}) FROM STDIN WITH (FORMAT BINARY)",
+                            payload,
+                        )
+                        cursor.execute(f"""
+                            INSERT INTO langchain_pg_embedding ({_COLUMNS})
+                            SELECT {_COLUMNS} FROM _bulk_embedding
+                            ON CONFLICT (id) DO UPDATE
+                            SET embedding = EXCLUDED.embedding,
+                                document = EXCLUDED.document,
+                                cmetadata = EXCLUDED.cmetadata
+                        """)
+                    else:
+                        cursor.copy_expert(
+                            f"COPY langchain_pg_embedding ({_COLUMNS}) FROM STDIN WITH (FORMAT BINARY)",
+                            payload,
+                        )
+
+            self.rows_written += count
+            return count
+
+    def _get_collection_id(self) -> bytes:
+        if self._collection_id is None:
+            collection_uuid = get_collection_uuid(self.connection_string, self.collection_name)
+            if collection_uuid is None:
+                raise ValueError(f"컬렉션을 찾을 수 없습니다: {self.collection_name}")
+            self._collection_id = uuid.UUID(collection_uuid).bytes
+        return self._collection_id
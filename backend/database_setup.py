@@ -1,40 +1,380 @@
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from sqlalchemy import create_engine, text
+import json
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from config import Config
+from db import get_engine, raw_connection
+
 
 def setup_database(connection_string: str):
     """PostgreSQL 데이터베이스 및 pgvector 확장 설정"""
     try:
-        conn = psycopg2.connect(connection_string)
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cursor = conn.cursor()
-        
-        # pgvector 확장 활성화
-        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-        
+        with raw_connection(connection_string, autocommit=True) as conn:
+            cursor = conn.cursor()
+
+            # pgvector 확장 활성화
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+
+            # 컬렉션별 코퍼스 버전 (재임베딩 시 증가 → 답변 캐시 등 무효화 기준)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS corpus_versions (
+                    collection_name TEXT PRIMARY KEY,
+                    version BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+            """)
+
+            cursor.close()
+
+        # embedding 컬럼은 차원 없는 vector로 유지하고, 차원은 컬렉션별 HNSW 표현식 인덱스에서 정한다
+        relax_embedding_column(connection_string)
         print("✅ 데이터베이스 및 pgvector 설정 완료")
-        cursor.close()
-        conn.close()
     except Exception as e:
         print(f"❌ 데이터베이스 설정 오류: {e}")
 
-def create_hnsw_index(connection_string: str, collection_name: str):
-    """HNSW 인덱스 생성으로 검색 성능 최적화"""
-    engine = create_engine(connection_string)
-    
+def hnsw_index_name(collection_name: str) -> str:
+    return f"{collection_name}_hnsw_idx"
+
+
+def binary_index_name(collection_name: str) -> str:
+    return f"{collection_name}_bit_idx"
+
+
+# 저장 형식별 HNSW 연산자 클래스 (bit는 이진 양자화 후보 검색용 Hamming 거리)
+_OPCLASSES = {
+    "vector": "vector_cosine_ops",
+    "halfvec": "halfvec_cosine_ops",
+    "bit": "bit_hamming_ops",
+}
+
+
+def create_hnsw_index(
+    connection_string: str,
+    collection_name: str,
+    m: int = Config.HNSW_M,
+    ef_construction: int = Config.HNSW_EF_CONSTRUCTION,
+    maintenance_work_mem: Optional[str] = Config.HNSW_MAINTENANCE_WORK_MEM,
+    parallel_workers: Optional[int] = Config.HNSW_PARALLEL_WORKERS,
+    concurrently: bool = Config.HNSW_BUILD_CONCURRENTLY,
+    storage: str = Config.VECTOR_STORAGE,
+) -> Optional[Dict[str, Any]]:
+    """컬렉션 전용 HNSW 인덱스 생성으로 검색 성능 최적화 (빌드 시간/인덱스 크기 반환)
+
+    collection_id 조건의 partial 인덱스라 다른 컬렉션의 벡터는 그래프에 들어가지 않는다.
+    인덱스 대상은 embedding을 컬렉션 차원의 storage 타입(vector / halfvec)으로 캐스팅한
+    표현식이라, 컬렉션마다 차원과 저장 형식이 달라도 된다
+    (vector_search.CollectionSearch가 같은 조건/표현식으로 검색).
+    storage="bit"이면 본 인덱스 대신 2단계 검색용 이진 양자화 인덱스(binary_index_name)를 만든다.
+    대량 적재 후 한 번에 빌드하는 용도라 빌드 세션에만 maintenance_work_mem과
+    병렬 워커 수를 올린다. concurrently=True면 빌드 중에도 쓰기/검색이 막히지 않는다.
+    """
+    if storage == "bit":
+        index_name = binary_index_name(collection_name)
+    else:
+        index_name = hnsw_index_name(collection_name)
+    opclass = _OPCLASSES[storage]
+    collection_uuid = get_collection_uuid(connection_string, collection_name)
+    if collection_uuid is None:
+        print(f"ℹ️ 컬렉션이 없어 HNSW 인덱스 빌드를 건너뜁니다: {collection_name}")
+        return None
+
     try:
-        with engine.connect() as conn:
-            # HNSW 인덱스 생성 (cosine 거리 기준)
-            index_query = text(f"""
-                CREATE INDEX IF NOT EXISTS {collection_name}_hnsw_idx 
-                ON langchain_pg_embedding 
-                USING hnsw (embedding vector_cosine_ops)
-                WITH (m = 16, ef_construction = 64);
-            """)
-            
-            conn.execute(index_query)
-            conn.commit()
-            print(f"✅ HNSW 인덱스 생성 완료: {collection_name}_hnsw_idx")
-            
+        # CREATE INDEX CONCURRENTLY는 트랜잭션 블록 밖에서만 실행 가능
+        with raw_connection(connection_string, autocommit=True) as conn:
+            with conn.cursor() as cursor:
+                if storage != "vector" and _pgvector_version(cursor) < (0, 7):
+                    raise ValueError(f"{storage} 인덱스는 pgvector 0.7 이상이 필요합니다.")
+
+                # 중단된 CONCURRENTLY 빌드가 남긴 INVALID 인덱스, 이전 버전이 만든 테이블 전체
+                # 인덱스(partial 아님), 저장 형식이 다르거나 삭제 후 다시 만든 컬렉션(uuid가 다름)의
+                # 인덱스는 지우고 다시 만든다
+                cursor.execute(
+                    """
+                    SELECT i.indisvalid AND i.indpred IS NOT NULL
+                           AND pg_get_indexdef(i.indexrelid) LIKE %s
+                           AND pg_get_indexdef(i.indexrelid) LIKE %s
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = %s
+                    """,
+                    (f"%{opclass}%", f"%{collection_uuid}%", index_name),
+                )
+                row = cursor.fetchone()
+                if row is not None and row[0]:
+                    print(f"ℹ️ HNSW 인덱스가 이미 존재합니다: {index_name}")
+                    return None
+                if row is not None:
+                    cursor.execute(f"DROP INDEX IF EXISTS {index_name};")
+
+                dimensions = _collection_dimensions(cursor, collection_uuid)
+                if dimensions is None:
+                    print("ℹ️ 저장된 임베딩이 없어 HNSW 인덱스 빌드를 건너뜁니다.")
+                    return None
+
+                # 빌드는 공유 풀의 문장 타임아웃보다 오래 걸릴 수 있다 (RESET ALL로 반환 시 복원)
+                cursor.execute("SET statement_timeout = 0;")
+                if maintenance_work_mem:
+                    cursor.execute("SET maintenance_work_mem = %s;", (maintenance_work_mem,))
+                if parallel_workers is not None:
+                    cursor.execute(
+                        "SET max_parallel_maintenance_workers = %s;", (parallel_workers,)
+                    )
+
+                # HNSW 인덱스 생성 (cosine 거리 기준)
+                started = time.perf_counter()
+                cursor.execute(f"""
+                    CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name}
+                    ON langchain_pg_embedding
+                    USING hnsw (({embedding_expression(storage, dimensions)}) {opclass})
+                    WITH (m = {int(m)}, ef_construction = {int(ef_construction)})
+                    WHERE collection_id = '{collection_uuid}';
+                """)
+                elapsed = time.perf_counter() - started
+
+                cursor.execute(
+                    "SELECT pg_relation_size(%s::regclass), pg_size_pretty(pg_relation_size(%s::regclass));",
+                    (index_name, index_name),
+                )
+                size_bytes, size_pretty = cursor.fetchone()
+
+        print(
+            f"✅ HNSW 인덱스 생성 완료: {index_name} ({storage}({dimensions}), "
+            f"m={m}, ef_construction={ef_construction}, {elapsed:.2f}s, {size_pretty})"
+        )
+        return {
+            "index": index_name,
+            "storage": storage,
+            "dimensions": dimensions,
+            "m": m,
+            "ef_construction": ef_construction,
+            "build_seconds": round(elapsed, 3),
+            "size_bytes": size_bytes,
+        }
+
     except Exception as e:
-        print(f"⚠️ 인덱스 생성 중 오류 (이미 존재할 수 있음): {e}")
\ No newline at end of file
+        print(f"⚠️ 인덱스 생성 중 오류: {e}")
+        return None
+
+
+def get_collection_uuid(connection_string: str, collection_name: str) -> Optional[str]:
+    """langchain_pg_collection에서 컬렉션 uuid 조회 (없으면 None)"""
+    engine = get_engine(connection_string)
+
+    with engine.connect() as conn:
+        collection_uuid = conn.execute(
+            text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+            {"name": collection_name},
+        ).scalar()
+
+    return str(uuid.UUID(str(collection_uuid))) if collection_uuid is not None else None
+
+
+def create_search_indexes(connection_string: str, collection_name: str) -> None:
+    """컬렉션 검색에 필요한 인덱스 생성 (본 HNSW 인덱스 + 2단계 검색 컬렉션이면 bit 인덱스)"""
+    create_hnsw_index(connection_string, collection_name)
+    if collection_name in Config.BINARY_RERANK_COLLECTIONS:
+        create_hnsw_index(connection_string, collection_name, storage="bit")
+
+
+def embedding_expression(storage: str, dimensions: int) -> str:
+    """HNSW 인덱스/검색에 공통으로 쓰는 embedding 표현식 (둘이 같아야 인덱스가 사용된다)
+
+    bit는 부호 기준 이진 양자화(차원당 1비트) 표현식이다.
+    """
+    if storage not in _OPCLASSES:
+        raise ValueError(f"지원하지 않는 저장 형식입니다: {storage} (vector / halfvec / bit)")
+    dimensions = int(dimensions)
+    if storage == "bit":
+        return f"CAST(binary_quantize(CAST(embedding AS vector({dimensions}))) AS bit({dimensions}))"
+    return f"CAST(embedding AS {storage}({dimensions}))"
+
+
+def get_pgvector_version(connection_string: str) -> Tuple[int, int]:
+    """설치된 pgvector 확장의 (major, minor) 버전"""
+    with raw_connection(connection_string) as conn, conn.cursor() as cursor:
+        return _pgvector_version(cursor)
+
+
+def get_collection_dimensions(connection_string: str, collection_name: str) -> Optional[int]:
+    """컬렉션에 저장된 임베딩 차원 (행이 없으면 None)"""
+    engine = get_engine(connection_string)
+
+    with engine.connect() as conn:
+        dimensions = conn.execute(
+            text("""
+                SELECT vector_dims(embedding) FROM langchain_pg_embedding
+                WHERE collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = :name)
+                LIMIT 1
+            """),
+            {"name": collection_name},
+        ).scalar()
+
+    return dimensions
+
+
+def relax_embedding_column(connection_string: str) -> None:
+    """embedding 컬럼의 차원 고정(vector(n))을 풀어 컬렉션마다 다른 차원을 저장할 수 있게 한다
+
+    컬럼은 항상 차원 없는 vector이고 차원은 컬렉션별 표현식 인덱스(embedding_expression)가
+    정한다. 이전 버전의 HNSW 빌드가 vector(n)으로 고정해 둔 DB만 여기서 되돌리며, 테이블이 아직
+    없거나 이미 차원이 없으면 아무것도 하지 않는다 (setup_database에서 매번 호출).
+    고정된 컬럼 위의 HNSW 인덱스는 캐스트가 생략된 채(embedding 그대로) 저장되어 있어
+    차원 없는 컬럼에서는 다시 만들 수 없으므로, 명시적인 vector(n) 캐스트 표현식으로 바꿔 재생성한다.
+    """
+    with raw_connection(connection_string) as conn:
+        with conn, conn.cursor() as cursor:
+            # 인덱스 재생성은 공유 풀의 문장 타임아웃보다 오래 걸릴 수 있다
+            cursor.execute("SET LOCAL statement_timeout = 0;")
+            cursor.execute("""
+                SELECT atttypmod FROM pg_attribute
+                WHERE attrelid = to_regclass('langchain_pg_embedding') AND attname = 'embedding'
+            """)
+            row = cursor.fetchone()
+            if row is None or row[0] <= 0:
+                return
+            dimensions = row[0]
+
+            cursor.execute("""
+                SELECT indexname, indexdef FROM pg_indexes
+                WHERE tablename = 'langchain_pg_embedding' AND indexdef LIKE '%USING hnsw (embedding %'
+            """)
+            indexes = cursor.fetchall()
+            for index_name, _ in indexes:
+                cursor.execute(f"DROP INDEX {index_name};")
+            cursor.execute("ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector;")
+            for _, index_def in indexes:
+                cursor.execute(
+                    index_def.replace(
+                        "USING hnsw (embedding ",
+                        f"USING hnsw ({embedding_expression('vector', dimensions)} ",
+                        1,
+                    )
+                )
+        print(f"🔧 embedding 컬럼의 차원 고정을 해제했습니다. (인덱스 {len(indexes)}개 재생성)")
+
+
+def _pgvector_version(cursor) -> Tuple[int, int]:
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+    row = cursor.fetchone()
+    major, minor = (row[0] if row else "0.0").split(".")[:2]
+    return int(major), int(minor)
+
+
+def _collection_dimensions(cursor, collection_uuid: str) -> Optional[int]:
+    """컬렉션 임베딩 차원 확인 (차원이 섞여 있으면 인덱스를 만들 수 없으므로 예외)"""
+    cursor.execute(
+        "SELECT DISTINCT vector_dims(embedding) FROM langchain_pg_embedding WHERE collection_id = %s;",
+        (collection_uuid,),
+    )
+    dims = [row[0] for row in cursor.fetchall()]
+    if not dims:
+        return None
+    if len(dims) > 1:
+        raise ValueError(f"임베딩 차원이 섞여 있어 HNSW 인덱스를 만들 수 없습니다: {sorted(dims)}")
+    return dims[0]
+
+
+def drop_hnsw_index(
+    connection_string: str, collection_name: str, concurrently: bool = False
+) -> None:
+    """대량 적재 전에 HNSW 인덱스 제거 (행마다 그래프에 삽입하는 비용을 피하고 적재 후 재빌드)
+
+    2단계 검색용 bit 인덱스가 있으면 함께 제거한다.
+    """
+    index_names = [hnsw_index_name(collection_name), binary_index_name(collection_name)]
+    with raw_connection(connection_string, autocommit=True) as conn, conn.cursor() as cursor:
+        for index_name in index_names:
+            cursor.execute(
+                f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {index_name};"
+            )
+    print(f"🧹 HNSW 인덱스 제거 (적재 후 재빌드): {', '.join(index_names)}")
+
+
+def bump_corpus_version(connection_string: str, collection_name: str, conn=None) -> int:
+    """컬렉션 내용이 바뀌었음을 기록하고 새 코퍼스 버전 반환
+
+    conn을 넘기면 호출 측 트랜잭션 안에서 갱신한다 (내용 변경과 같은 커밋에 반영).
+    """
+    if conn is None:
+        with get_engine(connection_string).begin() as conn:
+            return bump_corpus_version(connection_string, collection_name, conn)
+
+    version = conn.execute(
+        text("""
+            INSERT INTO corpus_versions (collection_name, version)
+            VALUES (:name, 1)
+            ON CONFLICT (collection_name) DO UPDATE
+            SET version = corpus_versions.version + 1, updated_at = now()
+            RETURNING version
+        """),
+        {"name": collection_name},
+    ).scalar()
+
+    print(f"🔄 코퍼스 버전 갱신: {collection_name} → v{version}")
+    return version
+
+
+def create_staging_collection(connection_string: str, collection_name: str) -> str:
+    """서비스 중 수집용 임시 컬렉션 생성 후 이름 반환
+
+    임시 컬렉션의 행은 본 컬렉션의 검색(collection_id 조건, partial HNSW 인덱스)에 잡히지 않으므로
+    적재가 끝날 때까지 질의 결과에 영향을 주지 않는다.
+    """
+    staging_name = f"{collection_name}__staging_{uuid.uuid4().hex[:12]}"
+    with get_engine(connection_string).begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO langchain_pg_collection (uuid, name, cmetadata)
+                VALUES (:uuid, :name, CAST(:metadata AS JSON))
+            """),
+            {
+                "uuid": str(uuid.uuid4()),
+                "name": staging_name,
+                "metadata": json.dumps({"staging_for": collection_name}),
+            },
+        )
+    return staging_name
+
+
+def promote_staging_collection(conn, staging_name: str, collection_name: str) -> int:
+    """임시 컬렉션의 행을 본 컬렉션으로 옮기고 임시 컬렉션 삭제 (호출 측 트랜잭션 안에서 실행)
+
+    커밋 시점에 새 행이 한꺼번에 검색 대상이 된다. 옮긴 행 수 반환.
+    """
+    moved = conn.execute(
+        text("""
+            UPDATE langchain_pg_embedding
+            SET collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = :target)
+            WHERE collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = :staging)
+        """),
+        {"target": collection_name, "staging": staging_name},
+    ).rowcount
+    conn.execute(
+        text("DELETE FROM langchain_pg_collection WHERE name = :staging"),
+        {"staging": staging_name},
+    )
+    return moved
+
+
+def drop_collection(connection_string: str, collection_name: str) -> None:
+    """컬렉션과 그 행 삭제 (langchain_pg_embedding은 ON DELETE CASCADE)"""
+    with get_engine(connection_string).begin() as conn:
+        conn.execute(
+            text("DELETE FROM langchain_pg_collection WHERE name = :name"),
+            {"name": collection_name},
+        )
+
+
+def drop_staging_collections(connection_string: str, collection_name: str) -> int:
+    """중단된 이전 수집이 남긴 임시 컬렉션 정리. 삭제한 컬렉션 수 반환"""
+    with get_engine(connection_string).begin() as conn:
+        return conn.execute(
+            text("""
+                DELETE FROM langchain_pg_collection
+                WHERE cmetadata::jsonb @> CAST(:metadata AS JSONB)
+            """),
+            {"metadata": json.dumps({"staging_for": collection_name})},
+        ).rowcount
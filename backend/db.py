@@ -0,0 +1,143 @@
+# db.py
+"""프로세스 전역 데이터베이스 엔진 (연결 문자열마다 하나의 커넥션 풀을 공유)"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from config import Config
+
+
+_engines: Dict[str, Engine] = {}
+_async_engines: Dict[str, AsyncEngine] = {}
+_counters: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def _engine_args() -> Dict[str, Any]:
+    args: Dict[str, Any] = {
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+    # 세션 기본값으로 지정하므로 RESET ALL 후에도 유지된다 (psycopg2 / psycopg3 공통 옵션)
+    if Config.DB_STATEMENT_TIMEOUT_MS:
+        args["connect_args"] = {
+            "options": f"-c statement_timeout={int(Config.DB_STATEMENT_TIMEOUT_MS)}"
+        }
+    return args
+
+
+def _instrument(name: str, engine: Engine) -> None:
+    """풀 이벤트로 새 물리 연결 수 / 체크아웃 수 / 동시 사용 최대치 집계"""
+    counters = _counters.setdefault(name, {"connects": 0, "checkouts": 0, "peak_checked_out": 0})
+
+    @event.listens_for(engine.pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        counters["connects"] += 1
+
+    @event.listens_for(engine.pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counters["checkouts"] += 1
+        counters["peak_checked_out"] = max(counters["peak_checked_out"], engine.pool.checkedout())
+
+
+def get_engine(connection_string: str = Config.POSTGRES_CONNECTION) -> Engine:
+    """동기 엔진 (psycopg2). 같은 연결 문자열이면 항상 같은 풀을 반환"""
+    engine = _engines.get(connection_string)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(connection_string)
+            if engine is None:
+                engine = create_engine(connection_string, **_engine_args())
+                _instrument(f"sync:{engine.url.render_as_string(hide_password=True)}", engine)
+                _engines[connection_string] = engine
+    return engine
+
+
+def get_async_engine(connection_string: str = Config.ASYNC_POSTGRES_CONNECTION) -> AsyncEngine:
+    """비동기 엔진 (psycopg3). 같은 연결 문자열이면 항상 같은 풀을 반환"""
+    engine = _async_engines.get(connection_string)
+    if engine is None:
+        with _lock:
+            engine = _async_engines.get(connection_string)
+            if engine is None:
+                engine = create_async_engine(connection_string, **_engine_args())
+                _instrument(
+                    f"async:{engine.url.render_as_string(hide_password=True)}", engine.sync_engine
+                )
+                _async_engines[connection_string] = engine
+    return engine
+
+
+@contextmanager
+def raw_connection(
+    connection_string: str = Config.POSTGRES_CONNECTION, autocommit: bool = False
+) -> Iterator[Any]:
+    """풀에서 psycopg2 연결을 빌려 COPY / DDL 등 드라이버 기능에 사용
+
+    반환 전에 롤백하고 RESET ALL로 세션 설정(SET maintenance_work_mem 등)을 되돌리므로
+    다른 요청이 같은 연결을 받아도 설정이 남지 않는다. 커밋은 호출 측에서 한다.
+    """
+    proxy = get_engine(connection_string).raw_connection()
+    conn = proxy.driver_connection
+    try:
+        conn.autocommit = autocommit
+        yield conn
+    finally:
+        try:
+            if not conn.closed:
+                conn.rollback()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("RESET ALL;")
+                conn.autocommit = False
+        finally:
+            proxy.close()
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """엔진별 풀 상태 (크기, 사용 중/유휴 연결, overflow)와 누적 연결/체크아웃 통계"""
+    stats: Dict[str, Dict[str, Any]] = {}
+    engines = [("sync", engine) for engine in _engines.values()] + [
+        ("async", engine.sync_engine) for engine in _async_engines.values()
+    ]
+    for kind, engine in engines:
+        name = f"{kind}:{engine.url.render_as_string(hide_password=True)}"
+        pool = engine.pool
+        counters = _counters.get(name, {})
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": Config.DB_MAX_OVERFLOW,
+            "connects": counters.get("connects", 0),
+            "checkouts": counters.get("checkouts", 0),
+            "peak_checked_out": counters.get("peak_checked_out", 0),
+        }
+    return stats
+
+
+def dispose_engines() -> None:
+    """동기 풀의 연결 종료 (CLI 종료 / 설정 변경 후 재생성 전)"""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+async def adispose_engines() -> None:
+    """비동기 풀까지 포함해 모든 연결 종료 (API 종료 시)"""
+    dispose_engines()
+    with _lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+    for engine in engines:
+        await engine.dispose()
@@ -45,90 +45,245 @@
 #         return all_chunks
 
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import fitz  # PyMuPDF
+import numpy as np
 from config import Config
+from parse_cache import ParseCache, ParsedPage
+
+
+class PageWordIndex:
+    """페이지 텍스트의 문자 오프셋 → 단어 좌표 색인 (페이지마다 한 번 생성)
+
+    단어별 [start, end) 오프셋, 좌표, (block, line)을 열 배열로 들고 있어 파싱 캐시에서 읽은
+    배열을 그대로 쓸 수 있다. 청크의 오프셋 구간에 걸친 단어는 이진 탐색 후 연속 구간으로 얻는다.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, boxes: np.ndarray, lines: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        self.boxes = boxes
+        self.lines = lines
+
+    @classmethod
+    def from_page(cls, page: ParsedPage) -> "PageWordIndex":
+        return cls(page.word_starts, page.word_ends, page.word_boxes, page.word_lines)
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        """[start, end) 구간과 겹치는 단어의 [first, last) 번호 (텍스트 순서)"""
+        first = int(np.searchsorted(self.ends, start, side="right"))
+        last = int(np.searchsorted(self.starts, end, side="left"))
+        return first, max(first, last)
+
+    def bbox(self, first: int, last: int) -> Optional[dict]:
+        """[first, last) 단어들을 감싸는 bounding box"""
+        if first >= last:
+            return None
+        boxes = self.boxes[first:last]
+        x1, y1 = boxes[:, :2].min(axis=0).tolist()
+        x2, y2 = boxes[:, 2:].max(axis=0).tolist()
+        return {
+            "x1": x1,
+            "y1": y1,
+            "x2": x2,
+            "y2": y2,
+            "width": x2 - x1,
+            "height": y2 - y1
+        }
+
+    def line_rects(self, first: int, last: int) -> List[List[float]]:
+        """[first, last) 단어를 연속된 (block, line)별로 묶어 줄마다 [x1, y1, x2, y2] 사각형 생성"""
+        if first >= last:
+            return []
+        boxes = self.boxes[first:last]
+        lines = self.lines[first:last]
+        line_starts = np.concatenate(
+            ([0], np.flatnonzero(np.any(lines[1:] != lines[:-1], axis=1)) + 1)
+        )
+        return np.hstack(
+            [
+                np.minimum.reduceat(boxes[:, :2], line_starts, axis=0),
+                np.maximum.reduceat(boxes[:, 2:], line_starts, axis=0),
+            ]
+        ).tolist()
+
+
+def _word_columns(
+    page_text: str, words: List
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """get_text("words") 결과 → (starts, ends, boxes, lines) 열 배열
+
+    get_text("words")의 단어는 get_text()와 같은 순서로 나오므로 페이지 텍스트를 한 번 훑으며
+    각 단어의 [start, end) 오프셋을 기록한다.
+    """
+    starts: List[int] = []
+    ends: List[int] = []
+    kept = []
+    position = 0
+    for word_info in words:
+        start = page_text.find(word_info[4], position)
+        if start < 0:
+            # 텍스트에서 찾지 못한 단어(추출 방식 차이)는 좌표 계산에서 제외
+            continue
+        position = start + len(word_info[4])
+        starts.append(start)
+        ends.append(position)
+        kept.append(word_info)
+
+    return (
+        np.array(starts, dtype=np.int32),
+        np.array(ends, dtype=np.int32),
+        np.array([w[:4] for w in kept], dtype=np.float64).reshape(-1, 4),
+        np.array([w[5:7] for w in kept], dtype=np.int32).reshape(-1, 2),
+    )
+
+
+def _extract_page(page: "fitz.Page", page_num: int) -> ParsedPage:
+    """PyMuPDF 페이지 1장 → 페이지 텍스트 + 단어 열 배열"""
+    # 텍스트와 단어 좌표를 한 번의 추출(TextPage)에서 얻는다
+    textpage = page.get_textpage()
+    page_text = page.get_text(textpage=textpage)
+    # (x0, y0, x1, y1, "word", block_no, line_no, word_no)
+    words = page.get_text("words", textpage=textpage)
+    starts, ends, boxes, lines = _word_columns(page_text, words)
+    return ParsedPage(
+        number=page_num,
+        text=page_text,
+        width=page.rect.width,
+        height=page.rect.height,
+        word_starts=starts,
+        word_ends=ends,
+        word_boxes=boxes,
+        word_lines=lines,
+    )
+
+
+def extract_pages(pdf_path: str, start: int, end: int) -> Tuple[List[ParsedPage], int]:
+    """PDF의 [start, end) 페이지(0부터) 추출 → (페이지 목록, PDF 전체 페이지 수)
+
+    페이지 수를 넘는 구간은 잘라낸다.
+    """
+    with fitz.open(pdf_path) as pdf_document:
+        pages = [
+            _extract_page(pdf_document[page_num], page_num)
+            for page_num in range(start, min(end, len(pdf_document)))
+        ]
+        return pages, len(pdf_document)
+
+
+def pdf_page_count(pdf_path: str) -> int:
+    """PDF 페이지 수 (본문을 추출하지 않으므로 빠름)"""
+    with fitz.open(pdf_path) as pdf_document:
+        return len(pdf_document)
+
+
+def page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    """[0, page_count)를 pages_per_task 페이지씩 [start, end) 구간으로 분할"""
+    step = max(pages_per_task, 1)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
 
 class DocumentProcessor:
     """PDF 문서를 로드하고 좌표와 함께 청크로 분할"""
     def __init__(self, chunk_size: int = Config.CHUNK_SIZE,
-                chunk_overlap: int = Config.CHUNK_OVERLAP):
+                chunk_overlap: int = Config.CHUNK_OVERLAP,
+                line_rects: bool = Config.CHUNK_LINE_RECTS,
+                parse_cache_dir: Optional[str] = (
+                    Config.PARSE_CACHE_DIR if Config.PARSE_CACHE_ENABLED else None
+                )):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # True면 청크가 걸친 줄마다 사각형을 metadata["line_rects"]에 저장 (줄 단위 하이라이트용)
+        self.line_rects = line_rects
+        # None이면 파싱 캐시를 쓰지 않고 매번 PDF에서 추출
+        self.parse_cache = ParseCache(parse_cache_dir) if parse_cache_dir else None
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
-            separators=["\\n\\n", "\\n", " ", ""]
+            separators=["\\n\\n", "\\n", " ", ""],
+            # 청크의 페이지 텍스트 내 시작 오프셋을 metadata["start_index"]로 받는다
+            add_start_index=True,
         )
 
     def load_and_split_pdf(self, pdf_path: str, book_name: str) -> List[Document]:
         """PDF 로드 + 좌표 추출 + 청크 분할"""
+        all_chunks, _ = self.split_pdf(pdf_path, book_name)
+        return all_chunks
+
+    def split_pdf(self, pdf_path: str, book_name: str) -> Tuple[List[Document], int]:
+        """load_and_split_pdf와 같되 (청크 목록, 페이지 수)를 반환"""
         print(f"📖 PDF 로딩 중: {pdf_path}")
 
-        pdf_document = fitz.open(pdf_path)
-        source_name = Path(pdf_path).name
-        all_chunks = []
+        page_count = pdf_page_count(pdf_path)
+        all_chunks = self.split_pages(pdf_path, book_name, 0, page_count)
 
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
+        print(f"✅ 총 {len(all_chunks)}개 청크 생성 (좌표 포함)")
+        return all_chunks, page_count
 
-            # 페이지 텍스트 추출
-            page_text = page.get_text()
+    def load_pages(
+        self, pdf_path: str, start: int, end: int, file_hash: Optional[str] = None
+    ) -> List[ParsedPage]:
+        """[start, end) 페이지 추출 결과 (파싱 캐시에 있으면 PDF를 열지 않고 캐시에서 읽음)"""
+        if self.parse_cache is None:
+            return extract_pages(pdf_path, start, end)[0]
 
-            # 단어별 좌표 추출 (나중에 매칭용)
-            words = page.get_text("words")  # (x0, y0, x1, y1, "word", ...)
+        if file_hash is None:
+            from ingest_manifest import file_sha256
 
-            # 청크로 분할
-            chunks = self.text_splitter.split_text(page_text)
+            file_hash = file_sha256(pdf_path)
+        pages = self.parse_cache.load(file_hash, start, end)
+        if pages is None:
+            pages, page_count = extract_pages(pdf_path, start, end)
+            self.parse_cache.store(file_hash, start, pages, page_count)
+        return pages
+
+    def split_pages(
+        self, pdf_path: str, book_name: str, start: int, end: int, file_hash: Optional[str] = None
+    ) -> List[Document]:
+        """[start, end) 페이지(0부터)만 청크로 분할 (한 권을 페이지 구간으로 나눠 병렬 처리할 때의 작업 단위)
+
+        청크 분할과 chunk_index는 페이지 단위이므로 구간을 나눠도 결과는 한 번에 처리한 것과 같다.
+        file_hash는 파싱 캐시 키 (없으면 파일을 읽어 계산).
+        """
+        return self.chunk_pages(
+            self.load_pages(pdf_path, start, end, file_hash), book_name, Path(pdf_path).name
+        )
+
+    def chunk_pages(self, pages: List[ParsedPage], book_name: str, source_name: str) -> List[Document]:
+        """추출된 페이지들을 청크로 분할하고 청크마다 좌표 계산 (PDF를 열지 않음)"""
+        all_chunks = []
+
+        for page in pages:
+            word_index = PageWordIndex.from_page(page)
+
+            # 청크로 분할 (청크마다 페이지 텍스트 내 시작 오프셋 포함)
+            chunks = self.text_splitter.create_documents([page.text])
 
             for chunk_idx, chunk in enumerate(chunks):
-                # 🔑 청크의 bounding box 계산
-                bbox = self._find_chunk_bbox(chunk, words)
-
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        "book_name": book_name,
-                        "page": page_num + 1,
-                        "chunk_index": chunk_idx,
-                        "source": source_name,
-                        # 🆕 좌표 정보 저장
-                        "bbox": bbox,
-                        "page_width": page.rect.width,
-                        "page_height": page.rect.height
-                    }
+                # 🔑 청크 오프셋 구간의 단어들로 bounding box 계산
+                start_index = chunk.metadata["start_index"]
+                first, last = (
+                    word_index.span(start_index, start_index + len(chunk.page_content))
+                    if start_index >= 0
+                    else (0, 0)
                 )
-                all_chunks.append(doc)
 
-        pdf_document.close()
-        print(f"✅ 총 {len(all_chunks)}개 청크 생성 (좌표 포함)")
-        return all_chunks
+                metadata = {
+                    "book_name": book_name,
+                    "page": page.number + 1,
+                    "chunk_index": chunk_idx,
+                    "source": source_name,
+                    # 🆕 좌표 정보 저장
+                    "bbox": word_index.bbox(first, last),
+                    "page_width": page.width,
+                    "page_height": page.height
+                }
+                if self.line_rects:
+                    metadata["line_rects"] = word_index.line_rects(first, last)
 
-    def _find_chunk_bbox(self, chunk_text: str, words: List) -> dict:
-        """청크에 해당하는 bounding box 계산"""
-        # 청크의 첫/마지막 몇 단어로 위치 찾기
-        chunk_words = chunk_text.split()[:5] + chunk_text.split()[-5:]
-
-        matching_coords = []
-        for word_info in words:
-            x1, y1, x2, y2, word = word_info[:5]
-            if any(cw in word for cw in chunk_words):
-                matching_coords.append((x1, y1, x2, y2))
-
-        if matching_coords:
-            x1 = min(c[0] for c in matching_coords)
-            y1 = min(c[1] for c in matching_coords)
-            x2 = max(c[2] for c in matching_coords)
-            y2 = max(c[3] for c in matching_coords)
-
-            return {
-                "x1": float(x1),
-                "y1": float(y1),
-                "x2": float(x2),
-                "y2": float(y2),
-                "width": float(x2 - x1),
-                "height": float(y2 - y1)
-            }
-
-        return None
+                all_chunks.append(Document(page_content=chunk.page_content, metadata=metadata))
+
+        return all_chunks
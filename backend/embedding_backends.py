@@ -0,0 +1,178 @@
+# embedding_backends.py
+"""임베딩 백엔드 등록/생성 (Config.EMBEDDING_BACKEND로 선택)
+
+- openai: OpenAI API (EMBEDDING_DIMENSIONS를 API의 dimensions로 전달)
+- ollama: 로컬 Ollama 서버 (langchain-ollama 필요, EMBEDDING_DIMENSIONS는 앞부분 절단 + 정규화)
+- hash: 네트워크 없이 프로세스 안에서 계산하는 결정적 임베딩 (오프라인 실행, CI, 벤치마크용)
+
+어느 백엔드든 VectorStoreManager에서 같은 청크/질문 임베딩 캐시로 감싸고, 수집 시 배치 구성
+(pack_batches)과 동시 요청 수도 같은 설정을 쓴다. 원격 백엔드는 공유 RateLimiter를 거친다.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import Config
+from embedding_scheduler import RateLimitedEmbeddings
+
+# hash 백엔드에서 차원을 지정하지 않았을 때 (OpenAI text-embedding-3-small과 같은 차원이라 기존 컬렉션에 그대로 적재 가능)
+HASH_DEFAULT_DIMENSIONS = 1536
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _hashed_feature(feature: str, dimensions: int) -> Tuple[int, float]:
+    """특징 문자열 → (칸 번호, 부호). PYTHONHASHSEED와 무관하게 어디서나 같은 값"""
+    digest = int.from_bytes(
+        hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+    return digest % dimensions, 1.0 if digest >> 63 else -1.0
+
+
+class HashEmbeddings(Embeddings):
+    """단어, 연속한 두 단어, 단어 안의 문자 3-gram을 feature hashing한 결정적 임베딩
+
+    특징마다 해시로 정한 칸에 ±1을 더한 뒤 L2 정규화한다. 단어/구절을 많이 공유하는 텍스트일수록
+    코사인 유사도가 높아 검색 경로를 의미 있게 시험할 수 있고 (3-gram은 "운영체제는"처럼 조사가
+    붙은 단어도 맞추기 위함), 같은 입력은 항상 같은 벡터가 된다.
+    """
+
+    def __init__(self, dimensions: int = HASH_DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _vector(self, text: str, out: np.ndarray) -> None:
+        indices: List[int] = []
+        signs: List[float] = []
+        previous = ""
+        for word in _WORD_RE.findall(text.casefold()):
+            features = [word, previous + " " + word]
+            if len(word) > 3:
+                features.extend("#" + word[i : i + 3] for i in range(len(word) - 2))
+            previous = word
+            for feature in features:
+                index, sign = _hashed_feature(feature, self.dimensions)
+                indices.append(index)
+                signs.append(sign)
+        np.add.at(out, indices, signs)
+        norm = np.linalg.norm(out)
+        if norm:
+            out /= norm
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            self._vector(text, matrix[row])
+        return matrix.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class TruncatedEmbeddings(Embeddings):
+    """앞 dimensions개 성분만 남기고 L2 정규화 (Matryoshka 방식, 차원 지정 API가 없는 백엔드용)
+
+    migrate_vectors.py의 DB 안 절단(subvector + l2_normalize)과 같은 결과가 된다.
+    """
+
+    def __init__(self, embeddings: Embeddings, dimensions: int):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def _truncate(self, vectors: List[List[float]]) -> List[List[float]]:
+        matrix = np.asarray(vectors, dtype=np.float32)[:, : self.dimensions]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._truncate(self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._truncate([self.embeddings.embed_query(text)])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._truncate(await self.embeddings.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._truncate([await self.embeddings.aembed_query(text)])[0]
+
+
+def _openai() -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        model=Config.EMBEDDING_MODEL,
+        openai_api_key=Config.OPENAI_API_KEY,
+        dimensions=Config.EMBEDDING_DIMENSIONS,
+        # 재시도는 RateLimitedEmbeddings에서 처리 (429는 모든 임베딩 스레드가 함께 대기, 일시적 오류는 백오프)
+        max_retries=0,
+    )
+
+
+def _ollama() -> Embeddings:
+    try:
+        from langchain_ollama import OllamaEmbeddings
+    except ImportError as exc:
+        raise ImportError(
+            "EMBEDDING_BACKEND=ollama 를 쓰려면 langchain-ollama 를 설치하세요 (pip install langchain-ollama)"
+        ) from exc
+
+    embeddings = OllamaEmbeddings(model=Config.EMBEDDING_MODEL, base_url=Config.OLLAMA_BASE_URL)
+    if Config.EMBEDDING_DIMENSIONS:
+        return TruncatedEmbeddings(embeddings, Config.EMBEDDING_DIMENSIONS)
+    return embeddings
+
+
+def _hash() -> Embeddings:
+    return HashEmbeddings(Config.EMBEDDING_DIMENSIONS or HASH_DEFAULT_DIMENSIONS)
+
+
+@dataclass(frozen=True)
+class EmbeddingBackend:
+    """임베딩 백엔드 (create: Config 값으로 클라이언트 생성, remote: API 호출이라 속도 제한 적용)"""
+
+    create: Callable[[], Embeddings]
+    remote: bool = True
+
+
+EMBEDDING_BACKENDS: Dict[str, EmbeddingBackend] = {
+    "openai": EmbeddingBackend(create=_openai),
+    "ollama": EmbeddingBackend(create=_ollama),
+    "hash": EmbeddingBackend(create=_hash, remote=False),
+}
+
+
+def resolve_embedding_backend(name: Optional[str]) -> str:
+    """백엔드 이름 검증 (None이면 Config.EMBEDDING_BACKEND)"""
+    name = name or Config.EMBEDDING_BACKEND
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"알 수 없는 임베딩 백엔드입니다: {name} (사용 가능: {', '.join(EMBEDDING_BACKENDS)})"
+        )
+    return name
+
+
+def create_embeddings(name: Optional[str] = None) -> Embeddings:
+    """선택한 백엔드의 임베딩 클라이언트 (원격이면 공유 RateLimiter 적용, 캐시는 호출자가 감쌈)"""
+    backend = EMBEDDING_BACKENDS[resolve_embedding_backend(name)]
+    embeddings = backend.create()
+    return RateLimitedEmbeddings(embeddings) if backend.remote else embeddings
+
+
+def embedding_model_key(name: Optional[str] = None) -> str:
+    """임베딩 캐시 키의 모델 식별자 (백엔드/모델/차원이 다르면 다른 벡터이므로 구분)"""
+    name = resolve_embedding_backend(name)
+    model = (
+        f"{Config.EMBEDDING_MODEL}@{Config.EMBEDDING_DIMENSIONS}"
+        if Config.EMBEDDING_DIMENSIONS
+        else Config.EMBEDDING_MODEL
+    )
+    # 기존 OpenAI 캐시 항목이 그대로 적중하도록 openai는 접두어 없이 유지
+    return model if name == "openai" else f"{name}:{model}"
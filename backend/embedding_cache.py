@@ -0,0 +1,305 @@
+# embedding_cache.py
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import text
+
+from config import Config
+from db import get_engine
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 질문 정규화 (유니코드 NFKC + 공백 정리 + 대소문자 무시)"""
+    return " ".join(unicodedata.normalize("NFKC", query).split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """질문 텍스트 → 임베딩 벡터 캐시 (메모리 LRU + TTL, 선택적 PostgreSQL 영속 계층)"""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = Config.QUERY_EMBEDDING_CACHE_SIZE,
+        ttl_seconds: Optional[float] = Config.QUERY_EMBEDDING_CACHE_TTL,
+        connection_string: Optional[str] = None,
+    ):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._engine = None
+        if connection_string:
+            self._engine = get_engine(connection_string)
+            self._create_table()
+
+    def _key(self, query: str) -> str:
+        normalized = normalize_query(query)
+        return hashlib.sha256(f"{self.model_name}\n{normalized}".encode("utf-8")).hexdigest()
+
+    @property
+    def persistent(self) -> bool:
+        return self._engine is not None
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """캐시된 벡터 반환 (메모리 → 영속 계층 순으로 조회, 없으면 None)"""
+        key = self._key(query)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+        vector = self._load_persistent(key)
+        if vector is not None:
+            self._store_memory(key, vector)
+            with self._lock:
+                self.persistent_hits += 1
+            return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, query: str, vector: List[float]) -> None:
+        key = self._key(query)
+        self._store_memory(key, vector)
+        self._save_persistent(key, query, vector)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.persistent_hits) / lookups if lookups else 0.0
+                ),
+                "persistent": self.persistent,
+            }
+
+    def _store_memory(self, key: str, vector: List[float]) -> None:
+        expires_at = (
+            time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        )
+        with self._lock:
+            self._entries[key] = (vector, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _create_table(self) -> None:
+        with self._engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS query_embedding_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    embedding DOUBLE PRECISION[] NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+            """))
+
+    def _load_persistent(self, key: str) -> Optional[List[float]]:
+        if self._engine is None:
+            return None
+        try:
+            with self._engine.connect() as conn:
+                row = conn.execute(
+                    text("""
+                        SELECT embedding FROM query_embedding_cache
+                        WHERE cache_key = :key
+                          AND (CAST(:ttl AS DOUBLE PRECISION) IS NULL
+                               OR created_at > now() - make_interval(secs => :ttl))
+                    """),
+                    {"key": key, "ttl": self.ttl_seconds},
+                ).first()
+        except Exception as e:
+            print(f"⚠️ 질문 임베딩 캐시 조회 실패: {e}")
+            return None
+        return list(row[0]) if row else None
+
+    def _save_persistent(self, key: str, query: str, vector: List[float]) -> None:
+        if self._engine is None:
+            return
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(
+                    text("""
+                        INSERT INTO query_embedding_cache (cache_key, model, query, embedding)
+                        VALUES (:key, :model, :query, :embedding)
+                        ON CONFLICT (cache_key) DO UPDATE
+                        SET embedding = EXCLUDED.embedding, created_at = now()
+                    """),
+                    {
+                        "key": key,
+                        "model": self.model_name,
+                        "query": normalize_query(query),
+                        "embedding": list(vector),
+                    },
+                )
+        except Exception as e:
+            print(f"⚠️ 질문 임베딩 캐시 저장 실패: {e}")
+
+
+class DocumentEmbeddingCache:
+    """(모델명 + 청크 텍스트) 해시 → 임베딩 벡터 영속 캐시 (로컬 SQLite, float32 BLOB)
+
+    청크 분할/인덱스 설정만 바꾼 재구축에서는 같은 텍스트가 다시 나오므로
+    OpenAI 호출 없이 저장된 벡터를 재사용한다.
+    """
+
+    def __init__(self, model_name: str, path: str = Config.EMBEDDING_CACHE_PATH):
+        self.model_name = model_name
+        self.path = path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_embedding_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL
+                )
+            """)
+            self._conn.commit()
+
+    def _key(self, text_value: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\n{text_value}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """texts 순서대로 캐시된 벡터(없으면 None) 반환"""
+        keys = [self._key(t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for i in range(0, len(keys), 500):
+                part = keys[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT cache_key, embedding FROM document_embedding_cache "
+                    f"WHERE cache_key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        rows = [
+            (self._key(t), array("f", v).tobytes()) for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO document_embedding_cache (cache_key, embedding) VALUES (?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """임베딩 호출 앞단 캐시 래퍼
+
+    - embed_query/aembed_query: QueryEmbeddingCache (정규화된 질문)
+    - embed_documents/aembed_documents: DocumentEmbeddingCache (청크 텍스트, 선택)
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: QueryEmbeddingCache,
+        document_cache: Optional[DocumentEmbeddingCache] = None,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.document_cache = document_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_cache is None:
+            return self.embeddings.embed_documents(texts)
+
+        vectors = self.document_cache.get_many(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.document_cache.put_many([texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_cache is None:
+            return await self.embeddings.aembed_documents(texts)
+
+        vectors = await asyncio.to_thread(self.document_cache.get_many, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            await asyncio.to_thread(
+                self.document_cache.put_many, [texts[i] for i in missing], fresh
+            )
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if not self.cache.persistent:
+            vector = self.cache.get(text)
+            if vector is None:
+                vector = await self.embeddings.aembed_query(text)
+                self.cache.put(text, vector)
+            return vector
+
+        # 영속 계층 조회는 동기 DB 호출이므로 스레드에서 수행
+        vector = await asyncio.to_thread(self.cache.get, text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self.cache.put, text, vector)
+        return vector
@@ -0,0 +1,351 @@
+# embedding_scheduler.py
+"""임베딩 API 호출 스케줄링: 토큰 수 기준 배치 구성, 토큰 버킷 속도 제한, 429 재시도
+
+- pack_batches: 청크를 문서 수가 아니라 (추정) 토큰 수 기준으로 배치에 담는다.
+- RateLimiter: 분당 요청/토큰 한도를 토큰 버킷으로 지키고, 429를 받으면 모든 호출을
+  Retry-After 동안 멈춘 뒤 속도를 낮춰(이후 성공할 때마다 조금씩 회복) 다시 보낸다.
+  연결 오류/타임아웃/408·409·5xx 같은 일시적 오류는 해당 호출만 백오프 후 재시도한다.
+  질문 임베딩(priority)은 버킷을 거치지 않고 서버가 보낸 Retry-After만 따른다.
+- RateLimitedEmbeddings: 실제 API 클라이언트를 감싸 호출마다 RateLimiter를 거치게 한다.
+  여러 스레드가 같은 인스턴스를 공유하므로 한도와 대기 상태도 공유된다.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+import openai
+from langchain_core.embeddings import Embeddings
+
+from config import Config
+
+T = TypeVar("T")
+
+
+def estimate_tokens(text: str) -> int:
+    """입력 토큰 수 추정 (토크나이저 없이 UTF-8 바이트 기준, 실제보다 크게 잡힘)
+
+    영문은 토큰당 약 4바이트, 한글은 글자(3바이트)당 약 1토큰이므로 3바이트당 1토큰으로
+    계산하면 한도를 넘지 않는 쪽으로 어긋난다.
+    """
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def pack_batches(
+    items: Sequence[T],
+    max_tokens: int = Config.EMBED_BATCH_TOKENS,
+    max_items: int = 100,
+    text_of: Callable[[T], str] = str,
+) -> List[List[T]]:
+    """순서를 유지하며 (토큰 합 ≤ max_tokens, 개수 ≤ max_items)인 배치로 나눔
+
+    토큰 한도를 혼자 넘는 항목은 단독 배치가 된다.
+    """
+    batches: List[List[T]] = []
+    current: List[T] = []
+    current_tokens = 0
+    for item in items:
+        tokens = estimate_tokens(text_of(item))
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class TokenBucket:
+    """초당 rate만큼 채워지고 최대 1초 분량까지 쌓이는 토큰 버킷 (rate None이면 제한 없음)
+
+    429로 속도를 낮춘 뒤에는 성공할 때마다 낮춘 폭의 일정 비율씩 되올려 limit(설정 한도)까지
+    회복한다. limit이 없으면 429 직전 처리량의 2배까지 회복한 뒤 제한을 해제한다.
+    """
+
+    # 429 시 (현재 속도와 최근 전송 속도 중 작은 값)에 곱하는 비율, 성공 1회당 회복 비율
+    DECREASE = 0.75
+    RECOVER_STEP = 0.02
+
+    def __init__(self, limit: Optional[float]):
+        self.limit = limit
+        self.rate = limit
+        self._tokens = limit or 0.0
+        self._updated = time.monotonic()
+        self._step = 0.0
+        self._release_above: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """amount만큼 예약하고 호출자가 기다려야 할 시간(초) 반환 (잔량이 모자라면 빚으로 기록)"""
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def decrease(self, recent: Optional[float]) -> None:
+        """429: 속도를 낮춤 (recent: 최근 전송 속도, 초당)"""
+        with self._lock:
+            candidates = [r for r in (self.rate, recent) if r]
+            if not candidates:
+                return
+            self._refill(time.monotonic())
+            if self.limit is None and recent:
+                self._release_above = recent * 2
+            self.rate = min(candidates) * self.DECREASE
+            self._tokens = min(self._tokens, self.rate)
+            self._step = self.rate * self.RECOVER_STEP
+
+    def recover(self) -> None:
+        """성공 1회: 낮춘 속도를 조금 되올림"""
+        with self._lock:
+            if self.rate is None or self.rate == self.limit:
+                return
+            self._refill(time.monotonic())
+            self.rate += self._step
+            if self.limit is not None:
+                self.rate = min(self.rate, self.limit)
+            elif self._release_above is None or self.rate >= self._release_above:
+                self.rate = None
+
+
+class RateLimitError(Exception):
+    """재시도 횟수를 넘겨도 429가 계속될 때"""
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """429(rate limit) 응답이면 서버가 요청한 대기 시간(초, 헤더가 없으면 0), 아니면 None
+
+    openai.RateLimitError(status_code), httpx.HTTPStatusError(response.status_code) 모두 처리.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                continue
+    return 0.0
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """다시 보내면 성공할 수 있는 오류인지 (연결 오류, 타임아웃, 408/409/5xx)
+
+    OpenAI 클라이언트 자체 재시도(max_retries=0으로 끔)가 재시도하던 범위와 같다.
+    """
+    if isinstance(exc, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    return isinstance(status, int) and (status in (408, 409) or status >= 500)
+
+
+class RateLimiter:
+    """분당 요청/토큰 한도 + 429 적응
+
+    - 토큰 버킷 2개(요청 수, 토큰 수)로 호출 전에 속도를 맞춘다. 한도가 0이면 제한 없이 시작.
+    - 429를 받으면 Retry-After(없으면 지수 백오프) 동안 모든 호출을 멈추고, 속도를 최근
+      전송 속도 기준으로 낮춘 뒤 성공할 때마다 조금씩 회복한다.
+    - 일시적 오류(is_transient_error)는 속도를 바꾸지 않고 해당 호출만 지수 백오프 후 재시도한다.
+    - priority 호출(검색 질문 1건)은 버킷과 대량 호출의 백오프 대기를 건너뛰고 서버가 보낸
+      Retry-After만 지킨다. 이 호출의 429는 해당 호출만 재시도하고 속도를 낮추지 않는다.
+    """
+
+    # 429 시 속도를 정할 때 보는 최근 전송 구간(초)과 최소 요청 수 (그보다 적으면 Retry-After 대기만 함)
+    WINDOW = 10.0
+    MIN_SAMPLES = 5
+
+    def __init__(
+        self,
+        requests_per_minute: float = Config.EMBED_RPM_LIMIT,
+        tokens_per_minute: float = Config.EMBED_TPM_LIMIT,
+        max_retries: int = Config.EMBED_MAX_RETRIES,
+        backoff: float = 1.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute / 60 if requests_per_minute else None)
+        self.tokens = TokenBucket(tokens_per_minute / 60 if tokens_per_minute else None)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._cooldown_until = 0.0
+        # 서버가 Retry-After로 요청한 대기 종료 시각 (priority 호출도 지킴)
+        self._retry_after_until = 0.0
+        # 마지막으로 속도를 낮춘 시각: 그 전에 보낸 요청의 429는 같은 초과로 보고 다시 낮추지 않음
+        self._decreased_at = 0.0
+        # 최근 WINDOW초 동안 보낸 요청 (시각, 토큰 수): 429 시 속도를 정하는 기준
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+        self.rate_limited = 0
+
+    def call(self, tokens: int, fn: Callable[[], T], priority: bool = False) -> T:
+        """속도 제한을 지키며 fn 실행 (429면 대기 후 재시도)"""
+        for attempt in range(self.max_retries + 1):
+            while (cooldown := self._cooldown(priority)) > 0:
+                time.sleep(cooldown)
+            time.sleep(self._reserve(tokens, priority))
+            sent_at = time.monotonic()
+            try:
+                result = fn()
+            except Exception as exc:
+                time.sleep(self._check_retry(exc, attempt, sent_at, priority))
+                continue
+            self._on_success(priority)
+            return result
+        raise AssertionError("unreachable")
+
+    async def acall(
+        self, tokens: int, fn: Callable[[], Awaitable[T]], priority: bool = False
+    ) -> T:
+        """call의 비동기 버전 (이벤트 루프를 막지 않고 대기)"""
+        for attempt in range(self.max_retries + 1):
+            while (cooldown := self._cooldown(priority)) > 0:
+                await asyncio.sleep(cooldown)
+            await asyncio.sleep(self._reserve(tokens, priority))
+            sent_at = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as exc:
+                await asyncio.sleep(self._check_retry(exc, attempt, sent_at, priority))
+                continue
+            self._on_success(priority)
+            return result
+        raise AssertionError("unreachable")
+
+    def _cooldown(self, priority: bool = False) -> float:
+        with self._lock:
+            until = self._retry_after_until if priority else self._cooldown_until
+            return until - time.monotonic()
+
+    def _reserve(self, tokens: int, priority: bool = False) -> float:
+        if priority:
+            return 0.0
+        delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        sent_at = time.monotonic() + delay
+        with self._lock:
+            self._recent.append((sent_at, tokens))
+            self._trim(sent_at)
+        return delay
+
+    def _backoff(self, attempt: int) -> float:
+        """지수 백오프 + jitter (동시에 재시도가 몰리지 않게)"""
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def _check_retry(
+        self, exc: Exception, attempt: int, sent_at: float, priority: bool = False
+    ) -> float:
+        """재시도할 오류면 이 호출이 따로 기다릴 시간(초)을 반환, 아니면 예외를 다시 던짐
+
+        429는 모든 호출의 대기 상태/속도를 갱신하고(반환값 0), 일시적 오류는 속도를 바꾸지 않고
+        해당 호출만 백오프한다. priority 호출의 429는 Retry-After만 공유하고 속도는 그대로 둔 채
+        해당 호출만 기다린다.
+        """
+        delay = retry_after(exc)
+        if delay is None:
+            if attempt == self.max_retries or not is_transient_error(exc):
+                raise exc
+            return self._backoff(attempt)
+        if attempt == self.max_retries:
+            raise RateLimitError(
+                f"임베딩 API rate limit: {self.max_retries}회 재시도 후에도 429"
+            ) from exc
+
+        now = time.monotonic()
+        pause = delay or self._backoff(attempt)
+        with self._lock:
+            self.rate_limited += 1
+            if delay:
+                self._retry_after_until = max(self._retry_after_until, now + delay)
+            if priority:
+                return pause
+            self._cooldown_until = max(self._cooldown_until, now + pause)
+            if sent_at < self._decreased_at:
+                # 동시에 나가 있던 요청들의 429: 이미 낮춘 속도로 재시도만 함
+                return 0.0
+            self._trim(now)
+            if len(self._recent) < self.MIN_SAMPLES:
+                # 요청이 드물 때의 429는 우리 전송 속도보다 다른 사용처/한도 때문일 가능성이 큼
+                return 0.0
+            self._decreased_at = now
+            window = min(max(now - self._recent[0][0], 1.0), self.WINDOW)
+            recent_rps = len(self._recent) / window
+            recent_tps = sum(t for _, t in self._recent) / window
+        self.requests.decrease(recent_rps)
+        self.tokens.decrease(recent_tps)
+        return 0.0
+
+    def _on_success(self, priority: bool = False) -> None:
+        if priority:
+            return
+        self.requests.recover()
+        self.tokens.recover()
+
+    def _trim(self, now: float) -> None:
+        while self._recent and now - self._recent[0][0] > self.WINDOW:
+            self._recent.popleft()
+
+    def stats(self) -> dict:
+        return {
+            "rate_limited": self.rate_limited,
+            "requests_per_minute": self.requests.rate * 60 if self.requests.rate else None,
+            "tokens_per_minute": self.tokens.rate * 60 if self.tokens.rate else None,
+        }
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def shared_rate_limiter() -> RateLimiter:
+    """프로세스 전역 RateLimiter (API 키 한도는 프로세스 안의 모든 클라이언트가 함께 씀)"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """임베딩 클라이언트 호출에 RateLimiter 적용 (스레드 간 공유)
+
+    감싼 클라이언트의 자체 재시도는 끄고(max_retries=0) 여기서 재시도해야 429 대기가 모든
+    스레드에 함께 적용된다. 연결 오류/5xx 등 일시적 오류도 여기서 재시도한다.
+    embed_query는 검색 요청 경로라 priority로 보내, 백그라운드 수집의 429로 낮아진 속도나
+    백오프 대기에 묶이지 않는다.
+    """
+
+    def __init__(self, embeddings: Embeddings, limiter: Optional[RateLimiter] = None):
+        self.embeddings = embeddings
+        self.limiter = limiter or shared_rate_limiter()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return self.limiter.call(tokens, lambda: self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.limiter.call(
+            estimate_tokens(text), lambda: self.embeddings.embed_query(text), priority=True
+        )
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return await self.limiter.acall(tokens, lambda: self.embeddings.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.limiter.acall(
+            estimate_tokens(text), lambda: self.embeddings.aembed_query(text), priority=True
+        )
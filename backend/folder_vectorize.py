@@ -21,12 +21,20 @@ def _list_pdfs(folder: str) -> List[Dict[str, str]]:
     return [{"path": str(path), "name": path.stem} for path in pdfs]
 
 
-def vectorize_folder(folder: str, batch_size: int, rebuild: bool) -> None:
+def vectorize_folder(folder: str, batch_size: int, rebuild: bool, prune: bool = False) -> None:
     pdf_files = _list_pdfs(folder)
-    print(f"📁 대상 폴더: {Path(folder).resolve()}")
+    target = Path(folder).expanduser().resolve()
+    print(f"📁 대상 폴더: {target}")
     print(f"📄 감지된 PDF: {len(pdf_files)}개")
 
-    assistant = StudyAssistant(pdf_files=pdf_files, batch_size=batch_size)
+    # 교재마다 이 폴더를 출처로 기록하고, prune이면 이 폴더에서 사라진 교재만 정리
+    # (다른 폴더나 관리자 API로 추가된 교재는 유지)
+    assistant = StudyAssistant(
+        pdf_files=pdf_files,
+        batch_size=batch_size,
+        prune_missing=prune,
+        ingest_origin=str(target),
+    )
     assistant.prepare(rebuild=rebuild, ingest=not rebuild)
     print("\n🎉 벡터화가 완료되었습니다.")
 
@@ -39,7 +47,12 @@ def _parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--append",
         action="store_true",
-        help="기존 벡터 스토어를 유지하고 추가로 임베딩합니다.",
+        help="기존 벡터 스토어를 유지하고 변경된 PDF만 증분 임베딩합니다.",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="이 폴더에서 수집했다가 폴더에서 삭제된 PDF의 임베딩을 제거합니다.",
     )
     parser.add_argument(
         "--batch-size",
@@ -52,7 +65,9 @@ def _parse_args() -> argparse.Namespace:
 
 def main() -> None:
     args = _parse_args()
-    vectorize_folder(folder=args.folder, batch_size=args.batch_size, rebuild=not args.append)
+    vectorize_folder(
+        folder=args.folder, batch_size=args.batch_size, rebuild=not args.append, prune=args.prune
+    )
 
 
 if __name__ == "__main__":
@@ -63,6 +78,9 @@ if __name__ == "__main__":
 Usage
 
 python backend/folder_vectorize.py <폴더경로>: 폴더(하위 폴더 포함) 안의 모든 PDF를 스캔해 벡터 DB를 새로 생성합니다. 기존 컬렉션은 초기화됩니다.
-python backend/folder_vectorize.py <폴더경로> --append: 기존 벡터 DB를 유지한 채 지정 폴더의 PDF만 추가 임베딩합니다.
+python backend/folder_vectorize.py <폴더경로> --append: 기존 벡터 DB를 유지한 채 변경분만 반영합니다.
+  파일 해시가 같은 PDF는 건너뛰고, 수정된 PDF는 내용이 바뀐 청크만 다시 임베딩합니다.
+python backend/folder_vectorize.py <폴더경로> --append --prune: 위와 같고, 이 폴더에서 수집했다가 폴더에서 삭제된 PDF의 임베딩도 제거합니다.
+  다른 폴더나 관리자 API로 추가된 교재는 제거하지 않습니다.
 공통 옵션: --batch-size <N>으로 임베딩 배치 크기를 조정할 수 있습니다 (기본 100).
 '''
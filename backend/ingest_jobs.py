@@ -0,0 +1,119 @@
+# ingest_jobs.py
+"""서비스 중 교재 추가 작업 (백그라운드 수집 + 진행 상황 조회)"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from database_setup import drop_staging_collections
+from ingest_pipeline import IngestStats
+
+
+@dataclass
+class IngestJob:
+    """교재 추가 작업 1건 (status: queued → running → switching → done / failed)"""
+
+    id: str
+    pdf_files: List[Dict[str, str]]
+    status: str = "queued"
+    error: Optional[str] = None
+    stats: IngestStats = field(default_factory=IngestStats)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = self.stats.summary() if self.started_at is not None else None
+        status = self.status
+        if status == "running" and self.stats.finished_at is not None:
+            # 적재는 끝났고 본 컬렉션으로 전환하는 트랜잭션 실행 중
+            status = "switching"
+        return {
+            "id": self.id,
+            "status": status,
+            "books": [info["name"] for info in self.pdf_files],
+            # pages: 파싱한 페이지, chunks: 파싱한 청크, embedded: 임베딩한 청크, rows: 저장한 행
+            "progress": progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobs:
+    """교재 추가 작업 큐 (작업은 한 번에 하나씩 백그라운드 스레드에서 실행)
+
+    add_books는 파싱 프로세스 풀과 임베딩 스레드를 쓰므로 작업을 동시에 돌리지 않고 순서대로
+    처리한다. 질의는 작업 중에도 계속 처리되며, 작업이 끝나는 순간 새 교재가 검색에 포함된다.
+    """
+
+    def __init__(self, assistant_provider: Callable[[], Any], max_history: int = 100):
+        self._assistant_provider = assistant_provider
+        self._max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-job")
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._cleaned_up = False
+
+    def submit(self, pdf_files: List[Dict[str, str]]) -> IngestJob:
+        job = IngestJob(id=uuid.uuid4().hex, pdf_files=pdf_files)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job)
+        return job
+
+    def is_using(self, path: str) -> bool:
+        """대기/실행 중인 작업이 이 PDF 경로를 읽을 예정이거나 읽고 있는지"""
+        target = os.path.realpath(path)
+        with self._lock:
+            return any(
+                job.status in {"queued", "running"}
+                and any(os.path.realpath(info["path"]) == target for info in job.pdf_files)
+                for job in self._jobs.values()
+            )
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self) -> None:
+        """대기 중인 작업은 취소하고 실행 중인 작업이 끝날 때까지 대기"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, job: IngestJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.stats.started_at = time.perf_counter()
+        try:
+            if not self._cleaned_up:
+                # 프로세스 재시작 등으로 중단된 이전 작업의 임시 컬렉션 정리 (작업은 한 번에 하나)
+                drop_staging_collections(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
+                self._cleaned_up = True
+            self._assistant_provider().add_books(job.pdf_files, stats=job.stats)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ 교재 추가 작업 실패 ({job.id}): {e}")
+        finally:
+            job.finished_at = time.time()
+            if job.stats.finished_at is None:
+                job.stats.finished_at = time.perf_counter()
+
+    def _trim(self) -> None:
+        # 완료된 작업 기록만 오래된 순으로 정리 (대기/실행 중인 작업은 유지)
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in {"done", "failed"}]
+        for job_id in finished[: max(len(self._jobs) - self._max_history, 0)]:
+            del self._jobs[job_id]
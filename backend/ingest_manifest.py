@@ -0,0 +1,283 @@
+# ingest_manifest.py
+import hashlib
+import json
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+from langchain_core.documents import Document
+from sqlalchemy import text
+
+from config import Config
+from db import get_engine
+
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS ingest_manifest (
+        collection_name TEXT NOT NULL,
+        source TEXT NOT NULL,
+        path TEXT NOT NULL,
+        file_hash TEXT NOT NULL,
+        chunk_count INTEGER NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (collection_name, source)
+    );
+    ALTER TABLE ingest_manifest ADD COLUMN IF NOT EXISTS origin TEXT NOT NULL DEFAULT '';
+"""
+
+# 서비스 중(add_books)에 추가된 교재의 출처. 폴더 수집의 삭제 정리 대상에서 빠진다
+SERVICE_ORIGIN = "service"
+
+# 컬렉션 안에서 특정 교재(source)의 행 중 keep_ids에 없는 행 삭제
+_DELETE_STALE_SQL = text("""
+    DELETE FROM langchain_pg_embedding
+    WHERE collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = :collection)
+      AND cmetadata @> CAST(:source_filter AS JSONB)
+      AND NOT (id = ANY(:keep_ids))
+""")
+
+
+def file_sha256(path: str) -> str:
+    """파일 내용 해시 (1MB 단위 스트리밍)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class IngestPlan:
+    """폴더 상태와 매니페스트를 비교한 수집 계획"""
+
+    changed: List[Dict[str, str]] = field(default_factory=list)
+    unchanged: List[Dict[str, str]] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.changed and not self.removed
+
+
+class IngestManifest:
+    """교재 파일/청크 해시 기반 증분 수집 관리
+
+    - 파일 해시가 같은 교재는 파싱/임베딩을 건너뛴다.
+    - 청크 id는 (컬렉션, 교재, 페이지, 청크 텍스트 해시)로부터 결정적으로 만들어지므로,
+      수정된 교재에서도 내용이 같은 청크는 기존 행을 재사용하고 메타데이터만 갱신한다.
+    - 교재별로 이번 수집에서 나오지 않은 청크 행과, 폴더에서 사라진 교재의 행은 삭제한다.
+      행마다 출처(origin, 예: 수집한 폴더 경로)를 기록해 같은 출처의 교재만 정리한다.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        connection_string: str = Config.POSTGRES_CONNECTION,
+        origin: str = "",
+    ):
+        self.collection_name = collection_name
+        self.origin = origin
+        self._engine = get_engine(connection_string)
+        self._file_hashes: Dict[str, str] = {}
+        self._unchanged: List[str] = []
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        with self._engine.begin() as conn:
+            conn.exec_driver_sql(_CREATE_TABLE_SQL)
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT source, path, origin, file_hash, chunk_count, updated_at
+                    FROM ingest_manifest WHERE collection_name = :collection
+                """),
+                {"collection": self.collection_name},
+            ).mappings()
+            return {row["source"]: dict(row) for row in rows}
+
+    def plan(
+        self, pdf_files: List[Dict[str, str]], prune_missing: bool = False, force: bool = False
+    ) -> IngestPlan:
+        """파일 해시를 계산해 변경/미변경/삭제 교재 분류 (force=True면 전부 변경으로 취급)
+
+        prune_missing이면 pdf_files에 없는 교재 중 이 매니페스트와 출처(origin)가 같은 것만
+        삭제 대상으로 잡는다. 다른 폴더나 서비스 중에 추가된 교재는 건드리지 않는다.
+        교재는 파일 이름(source)으로 구분하므로 하위 폴더 등에서 이름이 겹치면 ValueError.
+        """
+        paths_by_source: Dict[str, List[str]] = defaultdict(list)
+        for pdf_info in pdf_files:
+            paths_by_source[Path(pdf_info["path"]).name].append(pdf_info["path"])
+        duplicates = {source: paths for source, paths in paths_by_source.items() if len(paths) > 1}
+        if duplicates:
+            details = "; ".join(
+                f"{source}: {', '.join(paths)}" for source, paths in sorted(duplicates.items())
+            )
+            raise ValueError(
+                f"파일 이름이 같은 PDF가 있습니다 (교재는 파일 이름으로 구분되므로 이름을 바꿔 주세요): {details}"
+            )
+
+        entries = self.entries()
+        plan = IngestPlan()
+
+        for pdf_info in pdf_files:
+            source = Path(pdf_info["path"]).name
+            file_hash = file_sha256(pdf_info["path"])
+            self._file_hashes[source] = file_hash
+            entry = entries.get(source)
+            if not force and entry is not None and entry["file_hash"] == file_hash:
+                plan.unchanged.append(pdf_info)
+                self._unchanged.append(source)
+            else:
+                # 파싱 캐시 키로 쓰이도록 해시를 함께 넘김 (파이프라인에서 파일을 다시 읽지 않게)
+                plan.changed.append({**pdf_info, "file_hash": file_hash})
+
+        if prune_missing and self.origin:
+            current = {Path(info["path"]).name for info in pdf_files}
+            plan.removed = sorted(
+                source
+                for source, entry in entries.items()
+                if source not in current and entry["origin"] == self.origin
+            )
+
+        print(
+            f"🧾 수집 계획: 변경 {len(plan.changed)} / 유지 {len(plan.unchanged)} / "
+            f"삭제 {len(plan.removed)}"
+        )
+        return plan
+
+    def chunk_id(self, doc: Document, occurrence: int) -> str:
+        metadata = doc.metadata
+        text_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+        name = (
+            f"{self.collection_name}/{metadata.get('source')}/"
+            f"{metadata.get('page')}/{text_hash}/{occurrence}"
+        )
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, name))
+
+    def filter_documents(
+        self, pdf_info: Dict[str, str], documents: List[Document], skip_existing: bool = True
+    ) -> List[Document]:
+        """청크에 결정적 id를 부여하고, 이미 저장된 청크는 제외 (메타데이터 갱신은 commit에서)"""
+        source = Path(pdf_info["path"]).name
+        occurrences: Dict[Any, int] = defaultdict(int)
+        for doc in documents:
+            key = (doc.metadata.get("page"), doc.page_content)
+            doc.id = self.chunk_id(doc, occurrences[key])
+            occurrences[key] += 1
+
+        pending = self._pending.setdefault(
+            source, {"path": pdf_info["path"], "ids": set(), "metadata": {}}
+        )
+        pending["ids"].update(doc.id for doc in documents)
+
+        if not skip_existing or not documents:
+            return documents
+
+        existing = self._existing_ids([doc.id for doc in documents])
+        # 텍스트가 같아도 chunk_index/bbox 등은 바뀔 수 있으므로 재임베딩 없이 메타데이터만 갱신.
+        # 본 컬렉션 행이므로 바로 쓰지 않고 commit 트랜잭션에서 적용한다 (실패 시 남지 않게)
+        pending["metadata"].update(
+            (doc.id, json.dumps(doc.metadata, ensure_ascii=False))
+            for doc in documents
+            if doc.id in existing
+        )
+        return [doc for doc in documents if doc.id not in existing]
+
+    def commit(self, conn=None) -> None:
+        """수집 성공 후 기존 청크 메타데이터 갱신, 교재별 오래된 행 삭제 및 매니페스트 기록
+
+        conn을 넘기면 호출 측 트랜잭션 안에서 실행한다 (임시 컬렉션 전환과 함께 커밋).
+        """
+        if conn is None:
+            with self._engine.begin() as conn:
+                self.commit(conn)
+            return
+
+        for source, pending in self._pending.items():
+            ids: Set[str] = pending["ids"]
+            self._refresh_metadata(conn, pending["metadata"])
+            self._delete_rows(conn, source, list(ids))
+            conn.execute(
+                text("""
+                    INSERT INTO ingest_manifest
+                        (collection_name, source, path, origin, file_hash, chunk_count)
+                    VALUES (:collection, :source, :path, :origin, :file_hash, :chunk_count)
+                    ON CONFLICT (collection_name, source) DO UPDATE
+                    SET path = EXCLUDED.path, origin = EXCLUDED.origin,
+                        file_hash = EXCLUDED.file_hash,
+                        chunk_count = EXCLUDED.chunk_count, updated_at = now()
+                """),
+                {
+                    "collection": self.collection_name,
+                    "source": source,
+                    "path": pending["path"],
+                    "origin": self.origin,
+                    "file_hash": self._file_hashes.get(source) or file_sha256(pending["path"]),
+                    "chunk_count": len(ids),
+                },
+            )
+        if self.origin and self._unchanged:
+            # 출처 기록 전에 수집된 교재는 이번 수집 대상에 그대로 있으면 이 출처로 편입
+            conn.execute(
+                text("""
+                    UPDATE ingest_manifest SET origin = :origin
+                    WHERE collection_name = :collection AND origin = ''
+                      AND source = ANY(:sources)
+                """),
+                {
+                    "collection": self.collection_name,
+                    "origin": self.origin,
+                    "sources": self._unchanged,
+                },
+            )
+        self._pending.clear()
+        self._unchanged.clear()
+
+    def remove_sources(self, sources: List[str], conn=None) -> None:
+        """폴더에서 사라진 교재의 행과 매니페스트 항목 삭제 (conn을 넘기면 호출 측 트랜잭션 안에서)"""
+        if not sources:
+            return
+        if conn is None:
+            with self._engine.begin() as conn:
+                self.remove_sources(sources, conn)
+            return
+
+        for source in sources:
+            self._delete_rows(conn, source, [])
+            conn.execute(
+                text("""
+                    DELETE FROM ingest_manifest
+                    WHERE collection_name = :collection AND source = :source
+                """),
+                {"collection": self.collection_name, "source": source},
+            )
+        print(f"🗑️ 삭제된 교재 {len(sources)}권의 임베딩 제거")
+
+    def _delete_rows(self, conn, source: str, keep_ids: List[str]) -> None:
+        conn.execute(
+            _DELETE_STALE_SQL,
+            {
+                "collection": self.collection_name,
+                "source_filter": json.dumps({"source": source}),
+                "keep_ids": keep_ids,
+            },
+        )
+
+    def _existing_ids(self, ids: List[str]) -> Set[str]:
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT id FROM langchain_pg_embedding WHERE id = ANY(:ids)"),
+                {"ids": ids},
+            )
+            return {row[0] for row in rows}
+
+    def _refresh_metadata(self, conn, metadata: Dict[str, str]) -> None:
+        """기존 청크 행의 메타데이터 교체 (id → JSON 문자열)"""
+        if not metadata:
+            return
+        conn.execute(
+            text("UPDATE langchain_pg_embedding SET cmetadata = CAST(:metadata AS JSONB) WHERE id = :id"),
+            [{"id": chunk_id, "metadata": value} for chunk_id, value in metadata.items()],
+        )
@@ -0,0 +1,382 @@
+# ingest_pipeline.py
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from config import Config
+from embedding_scheduler import pack_batches
+
+# (문서 배치, 임베딩 벡터 배치)를 받아 저장하는 함수 (flush()가 있으면 종료 시 호출)
+Writer = Callable[[List[Document], List[List[float]]], None]
+# 교재 1권의 파싱 결과 중 실제로 임베딩할 청크만 남기는 함수 (증분 수집용)
+DocumentFilter = Callable[[Dict[str, str], List[Document]], List[Document]]
+
+_STOP = object()
+
+
+def _parse_pages(
+    pdf_info: Dict[str, str],
+    start: int,
+    end: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    parse_cache_dir: Optional[str] = None,
+    file_hash: Optional[str] = None,
+) -> List[Document]:
+    """프로세스 풀 워커: PDF 1권의 [start, end) 페이지 파싱 → 청크 목록"""
+    from document_processor import DocumentProcessor
+
+    processor = DocumentProcessor(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, parse_cache_dir=parse_cache_dir
+    )
+    return processor.split_pages(pdf_info["path"], pdf_info["name"], start, end, file_hash)
+
+
+@dataclass
+class _BookProgress:
+    """페이지 구간 단위로 파싱 중인 교재 1권 (완료된 구간을 페이지 순서대로 내보내기 위한 상태)"""
+
+    pdf_info: Dict[str, str]
+    ranges: int
+    # 파싱 캐시 키 (구간 작업마다 PDF 전체를 다시 해시하지 않도록 교재당 한 번 계산)
+    file_hash: Optional[str] = None
+    next_range: int = 0
+    chunks: int = 0
+    done: Dict[int, Tuple[List[Document], int]] = field(default_factory=dict)
+
+
+@dataclass
+class IngestStats:
+    """수집 진행 상황 (여러 스레드에서 갱신되므로 lock으로 보호)"""
+
+    pdfs: int = 0
+    pages: int = 0
+    chunks: int = 0
+    reused: int = 0
+    embedded: int = 0
+    rows: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.perf_counter()
+            elapsed = max(end - self.started_at, 1e-9)
+            return {
+                "pdfs": self.pdfs,
+                "pages": self.pages,
+                "chunks": self.chunks,
+                "reused": self.reused,
+                "embedded": self.embedded,
+                "rows": self.rows,
+                "elapsed_s": round(elapsed, 3),
+                "pages_per_s": round(self.pages / elapsed, 2),
+                "chunks_per_s": round(self.chunks / elapsed, 2),
+            }
+
+
+class IngestPipeline:
+    """PDF 파싱(프로세스 풀) → 임베딩(스레드 워커) → DB 쓰기(전용 스레드)를 겹쳐 실행
+
+    단계 사이는 크기가 제한된 큐로 연결되어, 임베딩/쓰기가 밀리면 파싱 결과 투입이
+    멈추는 backpressure가 걸린다. 따라서 메모리 사용량은 전체 코퍼스가 아니라
+    (진행 중인 파싱 작업 + 큐 용량 × 배치 크기)에 비례한다.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        writer: Optional[Writer] = None,
+        document_filter: Optional[DocumentFilter] = None,
+        batch_size: int = 100,
+        batch_tokens: int = Config.EMBED_BATCH_TOKENS,
+        chunk_size: int = Config.CHUNK_SIZE,
+        chunk_overlap: int = Config.CHUNK_OVERLAP,
+        parse_workers: Optional[int] = Config.INGEST_PARSE_WORKERS,
+        embed_workers: int = Config.INGEST_EMBED_WORKERS,
+        queue_size: int = Config.INGEST_QUEUE_SIZE,
+        start_method: Optional[str] = None,
+        pages_per_task: int = Config.INGEST_PAGES_PER_TASK,
+        parse_cache_dir: Optional[str] = (
+            Config.PARSE_CACHE_DIR if Config.PARSE_CACHE_ENABLED else None
+        ),
+        parse_cache_max_mb: float = Config.PARSE_CACHE_MAX_MB,
+    ):
+        self.embeddings = embeddings
+        self.writer = writer
+        self.document_filter = document_filter
+        # 임베딩 배치는 (추정) 토큰 합 batch_tokens 이하로 묶고, 문서 수는 batch_size를 넘지 않음
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.embed_workers = embed_workers
+        self.queue_size = queue_size
+        # 파싱 프로세스 시작 방식 (None이면 플랫폼 기본값). 스레드가 많은 서버 프로세스에서는
+        # fork 시 다른 스레드가 잡고 있던 lock이 자식에 복사될 수 있으므로 "spawn"을 쓴다.
+        self.start_method = start_method
+        # 한 권을 이 페이지 수 단위로 나눠 파싱 워커에 분배 (큰 교재 1권도 여러 코어 사용)
+        self.pages_per_task = pages_per_task
+        # PDF 추출 결과 캐시 위치 (None이면 매번 PDF에서 추출)
+        self.parse_cache_dir = parse_cache_dir
+        # 수집 후 파싱 캐시를 이 크기(MB) 이하로 정리 (0이면 정리하지 않음)
+        self.parse_cache_max_mb = parse_cache_max_mb
+        self._cached_hashes: Set[str] = set()
+        self.stats = IngestStats()
+
+    def run(
+        self, pdf_files: List[Dict[str, str]], stats: Optional[IngestStats] = None
+    ) -> IngestStats:
+        """pdf_files 전체를 처리하고 통계 반환 (단계 중 하나라도 실패하면 예외 전파)
+
+        stats를 넘기면 그 객체에 진행 상황을 기록한다 (실행 중 다른 스레드에서 조회용).
+        """
+        self.stats = stats or IngestStats()
+        self._next_batch = 0
+        embed_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        write_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        errors: List[BaseException] = []
+        failed = threading.Event()
+        # 임베딩은 동시에 진행되고 완료 순서가 섞이므로 writer가 배치 번호 순으로 다시 정렬한다.
+        # 임베딩 중 + 정렬 대기 중인 배치 수를 제한해 앞 배치가 429로 밀려도 버퍼가 커지지 않게 함
+        window = threading.Semaphore(self.embed_workers * 2)
+
+        def fail(exc: BaseException) -> None:
+            errors.append(exc)
+            failed.set()
+
+        def embed_worker() -> None:
+            while True:
+                while not window.acquire(timeout=0.5) and not failed.is_set():
+                    continue
+                item = embed_queue.get()
+                if item is _STOP:
+                    return
+                if failed.is_set():
+                    continue
+                number, batch = item
+                try:
+                    vectors = self.embeddings.embed_documents(
+                        [doc.page_content for doc in batch]
+                    )
+                    self.stats.add(embedded=len(batch))
+                    self._put(write_queue, (number, batch, vectors), failed)
+                except BaseException as exc:
+                    fail(exc)
+
+        # 버퍼링하는 writer(BulkLoader 등)는 넘긴 배치가 아니라 실제 적재된 행 수(rows_written)로 센다
+        buffered_writer = hasattr(self.writer, "rows_written")
+        written = self.writer.rows_written if buffered_writer else 0
+
+        def count_rows(batch_rows: int) -> None:
+            nonlocal written
+            if not buffered_writer:
+                self.stats.add(rows=batch_rows)
+                return
+            self.stats.add(rows=self.writer.rows_written - written)
+            written = self.writer.rows_written
+
+        def write_worker() -> None:
+            waiting: Dict[int, Tuple[List[Document], List[List[float]]]] = {}
+            next_number = 0
+            while True:
+                item = write_queue.get()
+                if item is _STOP:
+                    # 버퍼링하는 writer(BulkLoader 등)는 마지막 배치를 여기서 내보낸다
+                    flush = getattr(self.writer, "flush", None)
+                    if flush is not None and not failed.is_set():
+                        try:
+                            flush()
+                            count_rows(0)
+                        except BaseException as exc:
+                            fail(exc)
+                    return
+                if failed.is_set():
+                    continue
+                number, batch, vectors = item
+                waiting[number] = (batch, vectors)
+                # 파싱 순서(교재 → 페이지) 그대로 저장
+                while next_number in waiting:
+                    batch, vectors = waiting.pop(next_number)
+                    next_number += 1
+                    try:
+                        if self.writer is not None:
+                            self.writer(batch, vectors)
+                        count_rows(len(batch))
+                    except BaseException as exc:
+                        fail(exc)
+                        break
+                    window.release()
+
+        embedders = [
+            threading.Thread(target=embed_worker, name=f"embed-{i}", daemon=True)
+            for i in range(self.embed_workers)
+        ]
+        writer = threading.Thread(target=write_worker, name="db-writer", daemon=True)
+        for thread in embedders + [writer]:
+            thread.start()
+
+        print(
+            f"\n🚚 수집 파이프라인 시작: PDF {len(pdf_files)}개 "
+            f"(파싱 {self.parse_workers} / 임베딩 {self.embed_workers} 워커, "
+            f"배치 ≤{self.batch_tokens} 토큰·{self.batch_size}개)"
+        )
+
+        try:
+            self._parse_all(pdf_files, embed_queue, failed)
+        except BaseException as exc:
+            fail(exc)
+        finally:
+            for _ in embedders:
+                embed_queue.put(_STOP)
+            for thread in embedders:
+                thread.join()
+            write_queue.put(_STOP)
+            writer.join()
+            self.stats.finished_at = time.perf_counter()
+
+        if errors:
+            raise errors[0]
+
+        if self.parse_cache_dir and self.parse_cache_max_mb:
+            from parse_cache import ParseCache
+
+            removed = ParseCache(self.parse_cache_dir).prune(
+                int(self.parse_cache_max_mb * 1024 * 1024), keep=self._cached_hashes
+            )
+            if removed:
+                print(f"🧹 파싱 캐시 정리: 오래 쓰지 않은 교재 {removed}권 삭제")
+
+        summary = self.stats.summary()
+        print(
+            f"✅ 수집 완료: 페이지 {summary['pages']} / 청크 {summary['chunks']} / "
+            f"재사용 {summary['reused']} / 저장 {summary['rows']} ({summary['pages_per_s']} pages/s, "
+            f"{summary['chunks_per_s']} chunks/s)"
+        )
+        return self.stats
+
+    def _parse_all(
+        self,
+        pdf_files: List[Dict[str, str]],
+        embed_queue: "queue.Queue",
+        failed: threading.Event,
+    ) -> None:
+        from document_processor import page_ranges, pdf_page_count
+        from ingest_manifest import file_sha256
+
+        def tasks():
+            # (교재, 구간 번호, 시작 페이지, 끝 페이지): 페이지 수는 교재 차례가 왔을 때 확인
+            for pdf_info in pdf_files:
+                ranges = page_ranges(pdf_page_count(pdf_info["path"]), self.pages_per_task)
+                book = _BookProgress(
+                    pdf_info=pdf_info,
+                    ranges=len(ranges),
+                    # 수집 계획(IngestManifest.plan)에서 계산한 해시가 있으면 다시 읽지 않음
+                    file_hash=(
+                        pdf_info.get("file_hash") or file_sha256(pdf_info["path"])
+                        if self.parse_cache_dir
+                        else None
+                    ),
+                )
+                if book.file_hash:
+                    self._cached_hashes.add(book.file_hash)
+                if not ranges:
+                    self._finish_book(book)
+                for number, (start, end) in enumerate(ranges):
+                    yield book, number, start, end
+
+        pending_tasks = tasks()
+        # 파싱 결과가 부모 프로세스에 쌓이지 않도록 (진행 중 + 순서를 기다리는 완료 구간) 수를 제한
+        max_in_flight = self.parse_workers * 2
+        buffered = 0
+        mp_context = (
+            multiprocessing.get_context(self.start_method) if self.start_method else None
+        )
+        with ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=mp_context) as pool:
+            in_flight: Dict[Any, Tuple[_BookProgress, int, int]] = {}
+            while True:
+                while len(in_flight) + buffered < max_in_flight and not failed.is_set():
+                    task = next(pending_tasks, None)
+                    if task is None:
+                        break
+                    book, number, start, end = task
+                    future = pool.submit(
+                        _parse_pages,
+                        book.pdf_info,
+                        start,
+                        end,
+                        self.chunk_size,
+                        self.chunk_overlap,
+                        self.parse_cache_dir,
+                        book.file_hash,
+                    )
+                    in_flight[future] = (book, number, end - start)
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    book, number, page_count = in_flight.pop(future)
+                    book.done[number] = (future.result(), page_count)
+                    buffered += 1
+                    # 앞 구간이 모두 끝난 구간만 페이지 순서대로 다음 단계로 보낸다
+                    while book.next_range in book.done:
+                        documents, page_count = book.done.pop(book.next_range)
+                        book.next_range += 1
+                        buffered -= 1
+                        if not self._emit(book, documents, page_count, embed_queue, failed):
+                            return
+                        if book.next_range == book.ranges:
+                            self._finish_book(book)
+
+    def _emit(
+        self,
+        book: _BookProgress,
+        documents: List[Document],
+        page_count: int,
+        embed_queue: "queue.Queue",
+        failed: threading.Event,
+    ) -> bool:
+        parsed = len(documents)
+        book.chunks += parsed
+        if self.document_filter is not None:
+            documents = self.document_filter(book.pdf_info, documents)
+        self.stats.add(pages=page_count, chunks=parsed, reused=parsed - len(documents))
+        batches = pack_batches(
+            documents, self.batch_tokens, self.batch_size, text_of=lambda doc: doc.page_content
+        )
+        for batch in batches:
+            if not self._put(embed_queue, (self._next_batch, batch), failed):
+                return False
+            self._next_batch += 1
+        return True
+
+    def _finish_book(self, book: _BookProgress) -> None:
+        self.stats.add(pdfs=1)
+        print(f"✅ {book.pdf_info['name']}: 청크 {book.chunks}개 생성 (좌표 포함)")
+
+    @staticmethod
+    def _put(target: "queue.Queue", item: Any, failed: threading.Event) -> bool:
+        """큐가 가득 차면 대기 (backpressure). 다른 단계가 실패하면 False 반환"""
+        while not failed.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -2,16 +2,34 @@
 """엔드포인트 및 CLI 테스트용 진입점"""
 
 import argparse
-from typing import List, Dict, Any, Optional
-
-from langchain_core.documents import Document
+import asyncio
+import threading
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Any, Optional, Tuple
 
+from answer_cache import SemanticAnswerCache
 from config import Config
-from database_setup import setup_database
-from document_processor import DocumentProcessor
+from database_setup import (
+    bump_corpus_version,
+    create_search_indexes,
+    create_staging_collection,
+    drop_collection,
+    drop_hnsw_index,
+    promote_staging_collection,
+    setup_database,
+)
+from db import get_engine
 from qa_system import QASystem
+from singleflight import SingleFlight
+from vector_search import CollectionSearch
 from vector_store_manager import VectorStoreManager
 
+if TYPE_CHECKING:
+    # 수집(PDF 파싱/청크 분할 포함)과 메모리 인덱스(NumPy) 모듈은 실제로 쓸 때 import해
+    # API 기동과 질의 전용 프로세스가 불러오지 않도록 한다.
+    from ingest_manifest import IngestManifest
+    from ingest_pipeline import IngestStats
+    from memory_index import InMemoryIndex
+
 
 DEFAULT_PDF_FILES = [
     {"path": "CSAPP_2016.pdf", "name": "CSAPP_2016"},
@@ -26,13 +44,23 @@ class StudyAssistant:
         self,
         pdf_files: Optional[List[Dict[str, str]]] = None,
         batch_size: int = DEFAULT_BATCH_SIZE,
+        prune_missing: bool = False,
+        ingest_origin: str = "",
     ) -> None:
         self.pdf_files = pdf_files or DEFAULT_PDF_FILES
         self.batch_size = batch_size
-        self.processor = DocumentProcessor()
+        # True면 pdf_files에 없는(폴더에서 삭제된) 교재의 임베딩을 제거.
+        # 매니페스트에 ingest_origin(예: 폴더 경로)이 같게 기록된 교재만 대상이다
+        self.prune_missing = prune_missing
+        self.ingest_origin = ingest_origin
         self.vector_manager = VectorStoreManager()
         self.vector_store = None
+        self.answer_cache: Optional[SemanticAnswerCache] = None
         self.qa_system: Optional[QASystem] = None
+        # 프로세스 내 벡터 인덱스 사본 (Config.MEMORY_INDEX_ENABLED일 때만)
+        self.memory_index: Optional["InMemoryIndex"] = None
+        # 동일한 (질문, k) 동시 요청을 한 번의 검색/LLM 호출로 합침
+        self.inflight = SingleFlight()
 
     def prepare(self, rebuild: bool = False, ingest: bool = False) -> None:
         """데이터베이스/벡터 스토어/QA 시스템 초기화 및 필요 시 재임베딩"""
@@ -43,24 +71,36 @@ class StudyAssistant:
 
         setup_database(Config.POSTGRES_CONNECTION)
 
+        if Config.ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(collection_name=Config.COLLECTION_NAME)
+
         if rebuild:
-            documents = self._process_pdfs()
-            self.vector_store = self._build_vector_store(documents)
+            self.vector_store = self._build_vector_store()
         else:
             loaded = self._try_load_existing_store()
             if not loaded:
-                documents = self._process_pdfs()
-                self.vector_store = self._build_vector_store(documents)
-            elif ingest:
-                documents = self._process_pdfs()
-                self._append_documents(documents)
+                self.vector_store = self._build_vector_store()
+            else:
+                if ingest:
+                    self._append_documents()
+                # 인덱스가 없거나 이전 버전의 테이블 전체 인덱스면 컬렉션 전용 partial 인덱스로 (재)빌드
+                create_search_indexes(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
 
         if self.vector_store is None:
             raise RuntimeError("벡터 스토어 초기화에 실패했습니다.")
 
-        self.qa_system = QASystem(self.vector_store)
+        searcher = None
+        if Config.MEMORY_INDEX_ENABLED:
+            searcher = self._start_memory_index()
+        self.qa_system = QASystem(
+            self.vector_store,
+            answer_cache=self.answer_cache,
+            searcher=searcher or CollectionSearch(Config.COLLECTION_NAME),
+        )
 
-    def answer(self, question: str, k: int = 5) -> Dict[str, Any]:
+    def answer(
+        self, question: str, k: int = 5, search_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
         """질문에 대한 답변을 반환 (필요 시 자동 초기화)"""
 
         if not question:
@@ -69,53 +109,245 @@ class StudyAssistant:
         if self.qa_system is None:
             self.prepare(rebuild=False)
 
-        return self.qa_system.answer_question(question, k=k)
+        result, shared, waiters = self.inflight.do(
+            (question, k, search_profile),
+            lambda: self.qa_system.answer_question(question, k=k, search_profile=search_profile),
+        )
+        return self._with_singleflight_metadata(result, shared, waiters)
 
-    def _process_pdfs(self) -> List[Document]:
-        if not self.pdf_files:
-            raise ValueError("처리할 PDF 정보가 비어 있습니다.")
+    async def aprepare(self) -> None:
+        """비동기 답변 경로 초기화 (async 임베딩/검색/LLM 호출용 스토어 연결)"""
 
-        all_documents: List[Document] = []
-        for pdf_info in self.pdf_files:
-            docs = self.processor.load_and_split_pdf(
-                pdf_path=pdf_info["path"],
-                book_name=pdf_info["name"],
-            )
-            all_documents.extend(docs)
+        if self.qa_system is None:
+            await asyncio.to_thread(self.prepare, rebuild=False)
+
+        self.qa_system.async_vector_store = await self.vector_manager.aload_existing_store()
 
-        print(f"\n📊 총 처리된 문서: {len(all_documents)}개")
-        return all_documents
+    async def aanswer(
+        self, question: str, k: int = 5, search_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """answer()의 비동기 버전. 이벤트 루프를 막지 않고 답변을 생성"""
+
+        if not question:
+            raise ValueError("질문이 비어 있습니다.")
 
-    def _build_vector_store(self, documents: List[Document]):
-        if not documents:
-            raise ValueError("벡터 스토어를 생성할 문서가 없습니다.")
+        if self.qa_system is None:
+            await self.aprepare()
 
-        print(f"\n📦 {len(documents)}개 문서를 {self.batch_size}개씩 배치 처리")
+        result, shared, waiters = await self.inflight.ado(
+            (question, k, search_profile),
+            lambda: self.qa_system.aanswer_question(
+                question, k=k, search_profile=search_profile
+            ),
+        )
+        return self._with_singleflight_metadata(result, shared, waiters)
 
-        for i in range(0, len(documents), self.batch_size):
-            batch = documents[i : i + self.batch_size]
-            print(f"처리 중: {i + 1}~{min(i + self.batch_size, len(documents))}개")
+    async def astream_answer(
+        self, question: str, k: int = 5, search_profile: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """답변을 (이벤트, 데이터) 스트림으로 반환 (references → token... → done)"""
 
-            if i == 0:
-                self.vector_store = self.vector_manager.create_vector_store(batch)
-            else:
-                self.vector_manager.add_documents(batch)
+        if not question:
+            raise ValueError("질문이 비어 있습니다.")
+
+        if self.qa_system is None:
+            await self.aprepare()
+
+        async for event in self.qa_system.astream_answer(
+            question, k=k, search_profile=search_profile
+        ):
+            yield event
+
+    @staticmethod
+    def _with_singleflight_metadata(
+        result: Dict[str, Any], shared: bool, waiters: int
+    ) -> Dict[str, Any]:
+        # 공유된 결과를 호출자별로 얕은 복사해 요청 단위 메타데이터를 붙인다.
+        metadata = dict(result.get("metadata") or {})
+        metadata["singleflight"] = {"shared": shared, "coalesced_waiters": waiters}
+        return {**result, "metadata": metadata}
+
+    def _build_vector_store(self):
+        """벡터 스토어를 만들고 PDF 전체를 수집 파이프라인으로 임베딩"""
+        from ingest_manifest import IngestManifest
+
+        self.vector_store = self.vector_manager.load_existing_store()
+
+        # 대량 적재 중에는 HNSW 인덱스를 두지 않고 적재 후 한 번에 빌드 (행 단위 그래프 삽입 비용 회피)
+        defer_index = Config.HNSW_DEFER_BUILD
+        if defer_index:
+            drop_hnsw_index(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
+        else:
+            print("\n⚡ HNSW 인덱스 생성 중...")
+            create_search_indexes(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
 
+        try:
+            # 재구축은 매니페스트와 무관하게 전부 다시 임베딩 (청크 id는 결정적이라 중복 행은 생기지 않음)
+            manifest = IngestManifest(Config.COLLECTION_NAME, origin=self.ingest_origin)
+            plan = manifest.plan(self.pdf_files, prune_missing=self.prune_missing, force=True)
+            stats = self._run_ingest_pipeline(plan.changed, manifest, skip_existing=False)
+            if stats.chunks == 0:
+                raise ValueError("벡터 스토어를 생성할 문서가 없습니다.")
+
+            self._commit_manifest(manifest, plan.removed)
+        finally:
+            # 수집이 실패해도 검색이 인덱스 없이 남지 않도록 항상 다시 빌드
+            if defer_index:
+                print("\n⚡ HNSW 인덱스 빌드 중...")
+                create_search_indexes(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
+
+        self._purge_answer_cache()
         return self.vector_store
 
-    def _append_documents(self, documents: List[Document]) -> None:
-        if not documents:
-            print("ℹ️ 추가할 문서가 없습니다.")
+    def _append_documents(self) -> None:
+        """변경된 교재만 증분 수집 (파일 해시 → 청크 해시 순으로 비교)"""
+        if self.vector_store is None:
+            raise RuntimeError("벡터 스토어가 초기화되지 않았습니다.")
+
+        from ingest_manifest import IngestManifest
+
+        manifest = IngestManifest(Config.COLLECTION_NAME, origin=self.ingest_origin)
+        plan = manifest.plan(self.pdf_files, prune_missing=self.prune_missing)
+        if plan.is_empty:
+            # 출처가 기록되지 않은 기존 항목만 이 출처로 편입
+            manifest.commit()
+            print("ℹ️ 변경된 교재가 없어 임베딩을 건너뜁니다.")
             return
 
+        print("\n➕ 기존 스토어에 변경된 PDF 임베딩을 반영합니다.")
+        if plan.changed:
+            self._run_ingest_pipeline(plan.changed, manifest, skip_existing=True)
+        self._commit_manifest(manifest, plan.removed)
+        self._purge_answer_cache()
+
+    def add_books(
+        self, pdf_files: List[Dict[str, str]], stats: Optional["IngestStats"] = None
+    ) -> "IngestStats":
+        """서비스 중에 교재 추가/갱신 (API를 멈추지 않고 실행)
+
+        임시 컬렉션에 적재하는 동안 질의는 기존 코퍼스만 보며, 적재가 끝나면 행 이동 +
+        기존 청크 메타데이터 갱신 + 이전 버전 행 삭제 + 코퍼스 버전 갱신을 한 트랜잭션으로
+        커밋해 새 교재가 한꺼번에 검색에 포함된다. stats를 넘기면 진행 상황(페이지/임베딩/저장 행 수)을 그 객체에 기록한다.
+        """
+        from ingest_manifest import SERVICE_ORIGIN, IngestManifest
+        from ingest_pipeline import IngestStats
+
         if self.vector_store is None:
             raise RuntimeError("벡터 스토어가 초기화되지 않았습니다.")
 
-        print(f"\n➕ 기존 스토어에 {len(documents)}개 문서를 추가합니다.")
-        for i in range(0, len(documents), self.batch_size):
-            batch = documents[i : i + self.batch_size]
-            print(f"  추가 중: {i + 1}~{min(i + self.batch_size, len(documents))}개")
-            self.vector_manager.add_documents(batch)
+        stats = stats or IngestStats()
+        manifest = IngestManifest(Config.COLLECTION_NAME, origin=SERVICE_ORIGIN)
+        plan = manifest.plan(pdf_files)
+        if not plan.changed:
+            print("ℹ️ 변경된 교재가 없어 임베딩을 건너뜁니다.")
+            stats.finished_at = stats.started_at
+            return stats
+
+        staging_name = create_staging_collection(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
+        try:
+            self._run_ingest_pipeline(
+                plan.changed,
+                manifest,
+                skip_existing=True,
+                collection_name=staging_name,
+                stats=stats,
+                start_method="spawn",
+            )
+            with get_engine(Config.POSTGRES_CONNECTION).begin() as conn:
+                moved = promote_staging_collection(conn, staging_name, Config.COLLECTION_NAME)
+                manifest.commit(conn)
+                bump_corpus_version(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME, conn=conn)
+        except BaseException:
+            drop_collection(Config.POSTGRES_CONNECTION, staging_name)
+            raise
+
+        print(f"🔀 새 교재 반영 완료: {moved}행을 {Config.COLLECTION_NAME}로 전환")
+        self._purge_answer_cache()
+        return stats
+
+    def _run_ingest_pipeline(
+        self,
+        pdf_files: List[Dict[str, str]],
+        manifest: "IngestManifest",
+        skip_existing: bool,
+        collection_name: Optional[str] = None,
+        stats: Optional["IngestStats"] = None,
+        start_method: Optional[str] = None,
+    ) -> "IngestStats":
+        from ingest_pipeline import IngestPipeline
+
+        if not pdf_files:
+            raise ValueError("처리할 PDF 정보가 비어 있습니다.")
+
+        # skip_existing이면 새 id만 남으므로 충돌 처리 없이 대상 테이블로 바로 COPY.
+        # 다른 컬렉션(임시 컬렉션)에 쓸 때는 PGVector 스토어가 본 컬렉션에 묶여 있으므로 항상 COPY
+        writer = (
+            self.vector_manager.bulk_loader(
+                upsert=not skip_existing, collection_name=collection_name
+            )
+            if Config.INGEST_BULK_LOAD or collection_name is not None
+            else self.vector_manager.add_embeddings
+        )
+        pipeline = IngestPipeline(
+            embeddings=self.vector_manager.embeddings,
+            writer=writer,
+            document_filter=lambda pdf_info, documents: manifest.filter_documents(
+                pdf_info, documents, skip_existing=skip_existing
+            ),
+            batch_size=self.batch_size,
+            start_method=start_method,
+        )
+        stats = pipeline.run(pdf_files, stats=stats)
+
+        document_cache = self.vector_manager.document_cache
+        if document_cache is not None:
+            cache_stats = document_cache.stats()
+            print(
+                f"💾 청크 임베딩 캐시: 적중 {cache_stats['hits']} / 미스 {cache_stats['misses']}"
+            )
+        return stats
+
+    def _commit_manifest(self, manifest: "IngestManifest", removed: List[str]) -> None:
+        """메타데이터 갱신/오래된 행 삭제, 사라진 교재 제거, 코퍼스 버전 갱신을 한 트랜잭션으로 커밋"""
+        with get_engine(Config.POSTGRES_CONNECTION).begin() as conn:
+            manifest.commit(conn)
+            manifest.remove_sources(removed, conn)
+            bump_corpus_version(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME, conn=conn)
+
+    def _purge_answer_cache(self) -> None:
+        """코퍼스 버전이 바뀐 뒤 이전 버전 기준의 답변 캐시 삭제"""
+        if self.answer_cache is not None:
+            self.answer_cache.purge_stale()
+
+    def close(self) -> None:
+        """백그라운드 작업(메모리 인덱스 갱신 스레드)을 멈추고 준비 상태 해제 (DB 풀은 공유라 유지)"""
+        if self.memory_index is not None:
+            self.memory_index.close()
+            self.memory_index = None
+        self.qa_system = None
+
+    def _start_memory_index(self) -> Optional["InMemoryIndex"]:
+        """컬렉션을 메모리에 적재해 검색에 사용 (실패/한도 초과 시 None → DB 검색 유지)"""
+        from memory_index import InMemoryIndex
+
+        if self.memory_index is not None:
+            self.memory_index.close()
+            self.memory_index = None
+
+        index = InMemoryIndex(Config.COLLECTION_NAME)
+        try:
+            report = index.start()
+        except Exception as e:
+            print(f"⚠️ 메모리 인덱스 적재 실패, DB 검색을 사용합니다: {e}")
+            return None
+
+        print(
+            f"🧠 메모리 인덱스 적재 완료: {report['rows']}행 × {report['dimensions']}차원 "
+            f"(벡터 {report['vectors_mb']} MB + 본문/메타데이터 {report['documents_mb']} MB, "
+            f"{report['mode']}, {report['load_seconds']}s)"
+        )
+        self.memory_index = index
+        return index
 
     def _try_load_existing_store(self) -> bool:
         try:
@@ -126,6 +358,107 @@ class StudyAssistant:
             return False
 
 
+def _config_key() -> Tuple[Any, ...]:
+    """준비된 assistant를 재사용해도 되는지 판단하는 설정 값 (바뀌면 새로 준비)"""
+    return (
+        Config.POSTGRES_CONNECTION,
+        Config.COLLECTION_NAME,
+        Config.EMBEDDING_BACKEND,
+        Config.EMBEDDING_MODEL,
+        Config.EMBEDDING_DIMENSIONS,
+        Config.LLM_MODEL,
+        Config.CHUNK_SIZE,
+        Config.CHUNK_OVERLAP,
+        Config.VECTOR_STORAGE,
+        Config.SIMILARITY_THRESHOLD,
+        Config.SIMILARITY_FALLBACK_THRESHOLD,
+        Config.ANSWER_CACHE_ENABLED,
+        Config.MEMORY_INDEX_ENABLED,
+    )
+
+
+class AssistantRegistry:
+    """(교재 목록, 설정)별로 준비된 StudyAssistant를 프로세스 안에서 재사용
+
+    처음 요청된 키만 prepare()를 실행하고(키별 lock으로 동시 요청 시에도 한 번),
+    이후 호출은 이미 만들어진 임베딩/LLM 클라이언트와 공유 커넥션 풀을 그대로 쓴다.
+    """
+
+    def __init__(self) -> None:
+        self._assistants: Dict[Tuple[Any, ...], StudyAssistant] = {}
+        self._locks: Dict[Tuple[Any, ...], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(pdf_files: Optional[List[Dict[str, str]]]) -> Tuple[Any, ...]:
+        files = tuple(
+            sorted((info["path"], info["name"]) for info in (pdf_files or DEFAULT_PDF_FILES))
+        )
+        return files, _config_key()
+
+    def _key_lock(self, key: Tuple[Any, ...]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(
+        self,
+        pdf_files: Optional[List[Dict[str, str]]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> StudyAssistant:
+        """준비된 assistant 반환 (없으면 만들고 warm-up)"""
+        key = self._key(pdf_files)
+        assistant = self._assistants.get(key)
+        if assistant is not None:
+            return assistant
+
+        with self._key_lock(key):
+            assistant = self._assistants.get(key)
+            if assistant is None:
+                assistant = StudyAssistant(pdf_files=pdf_files, batch_size=batch_size)
+                assistant.prepare(rebuild=False, ingest=False)
+                self._assistants[key] = assistant
+        return assistant
+
+    warm_up = get
+
+    def reload(
+        self,
+        pdf_files: Optional[List[Dict[str, str]]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        rebuild: bool = False,
+        ingest: bool = False,
+    ) -> StudyAssistant:
+        """재구축/증분 수집 후 같은 키의 assistant를 새로 준비해 교체"""
+        key = self._key(pdf_files)
+        with self._key_lock(key):
+            assistant = StudyAssistant(pdf_files=pdf_files, batch_size=batch_size)
+            assistant.prepare(rebuild=rebuild, ingest=ingest)
+            previous = self._assistants.get(key)
+            self._assistants[key] = assistant
+        if previous is not None:
+            previous.close()
+        return assistant
+
+    def close(self, pdf_files: Optional[List[Dict[str, str]]] = None) -> None:
+        """해당 키의 assistant를 닫고 제거 (pdf_files가 None이면 기본 교재 목록)"""
+        key = self._key(pdf_files)
+        with self._key_lock(key):
+            assistant = self._assistants.pop(key, None)
+        if assistant is not None:
+            assistant.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            assistants = list(self._assistants.values())
+            self._assistants.clear()
+        for assistant in assistants:
+            assistant.close()
+
+
+# get_answer가 사용하는 프로세스 전역 레지스트리
+assistants = AssistantRegistry()
+
+
 def get_answer(
     question: str,
     *,
@@ -135,10 +468,18 @@ def get_answer(
     batch_size: int = DEFAULT_BATCH_SIZE,
     k: int = 5,
 ) -> Dict[str, Any]:
-    """다른 서비스(예: FastAPI)에서 바로 호출 가능한 헬퍼 함수"""
+    """다른 서비스(예: FastAPI)에서 바로 호출 가능한 헬퍼 함수
 
-    assistant = StudyAssistant(pdf_files=pdf_files, batch_size=batch_size)
-    assistant.prepare(rebuild=rebuild, ingest=ingest)
+    같은 교재 목록/설정이면 준비된 assistant를 재사용한다. rebuild/ingest를 주면
+    수집을 실행한 뒤 새로 준비한 assistant로 교체한다.
+    """
+
+    if rebuild or ingest:
+        assistant = assistants.reload(
+            pdf_files=pdf_files, batch_size=batch_size, rebuild=rebuild, ingest=ingest
+        )
+    else:
+        assistant = assistants.get(pdf_files=pdf_files, batch_size=batch_size)
     return assistant.answer(question, k=k)
 
 
@@ -0,0 +1,418 @@
+# memory_index.py
+import io
+import json
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from sqlalchemy import text
+
+from config import Config
+from database_setup import get_collection_uuid
+from db import get_engine, raw_connection
+from vector_search import Retrieval, resolve_search_profile
+
+
+# IVF 검색 시 검색 프로필별로 훑어볼 파티션 수 (정확 검색 모드에서는 무시)
+_IVF_PROBES = {"fast": 4, "balanced": 8, "high_recall": 32}
+
+_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_PAGE_ROWS = 20000
+# 메모리 예산 확인 시 파이썬 객체 크기를 재 볼 표본 행 수 (행 수를 곱해 전체를 추정)
+_SIZE_SAMPLE_ROWS = 256
+
+
+@dataclass
+class _Snapshot:
+    """한 코퍼스 버전의 읽기 전용 사본 (검색 중에는 통째로 교체만 한다)"""
+
+    version: int
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    # 정규화된 임베딩 (IVF면 파티션 순서로 정렬되어 offsets[i]:offsets[i+1]이 i번째 파티션)
+    matrix: np.ndarray
+    centroids: Optional[np.ndarray] = None
+    offsets: Optional[np.ndarray] = None
+    # id/본문/메타데이터 파이썬 객체 크기 (표본 행으로 추정, 객체 오버헤드 포함)
+    payload_bytes: int = 0
+    load_seconds: float = 0.0
+
+
+def _parse_copy_rows(payload: bytes):
+    """binary COPY 결과를 (id, document, cmetadata, embedding) 행 단위로 디코딩"""
+    view = memoryview(payload)
+    if bytes(view[:11]) != _COPY_SIGNATURE:
+        raise ValueError("binary COPY 시그니처가 올바르지 않습니다.")
+    extension = struct.unpack_from(">i", view, 15)[0]
+    pos = 19 + extension
+    while True:
+        (fields,) = struct.unpack_from(">h", view, pos)
+        pos += 2
+        if fields == -1:
+            return
+        values = []
+        for _ in range(fields):
+            (length,) = struct.unpack_from(">i", view, pos)
+            pos += 4
+            if length == -1:
+                values.append(None)
+                continue
+            values.append(view[pos : pos + length])
+            pos += length
+        row_id, document, metadata, embedding = values
+        # pgvector 바이너리: dim(int16) + unused(int16) + float4[dim], jsonb: 버전(1) + JSON 텍스트
+        (dim,) = struct.unpack_from(">h", embedding, 0)
+        yield (
+            str(row_id, "utf-8"),
+            str(document, "utf-8") if document is not None else "",
+            json.loads(str(metadata[1:], "utf-8")) if metadata is not None else {},
+            np.frombuffer(embedding, dtype=">f4", count=dim, offset=4),
+        )
+
+
+def _deep_sizeof(value: Any) -> int:
+    """JSON에서 온 값(dict/list/str/숫자)의 파이썬 객체 크기 합"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_sizeof(key) + _deep_sizeof(item) for key, item in value.items())
+    elif isinstance(value, list):
+        size += sum(_deep_sizeof(item) for item in value)
+    return size
+
+
+def _payload_bytes(ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> int:
+    """사본의 id/본문/메타데이터가 차지하는 메모리 추정 (고르게 뽑은 표본 행 × 행 수)
+
+    목록 3개의 슬롯(행마다 포인터 3개)도 포함한다.
+    """
+    if not ids:
+        return 0
+    step = max(1, len(ids) // _SIZE_SAMPLE_ROWS)
+    sample = range(0, len(ids), step)
+    sampled = sum(
+        sys.getsizeof(ids[i]) + sys.getsizeof(documents[i]) + _deep_sizeof(metadatas[i])
+        for i in sample
+    )
+    return sampled * len(ids) // len(sample) + 3 * 8 * len(ids)
+
+
+def _kmeans(matrix: np.ndarray, lists: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """표본 구면 k-means로 IVF 파티션 중심 학습 (코사인 유사도 기준)"""
+    rng = np.random.default_rng(seed)
+    sample = matrix[rng.choice(len(matrix), min(len(matrix), lists * 40), replace=False)]
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for i in range(lists):
+            members = sample[assignment == i]
+            if len(members):
+                centroids[i] = members.sum(axis=0)
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+    return centroids
+
+
+class InMemoryIndex:
+    """컬렉션 임베딩을 프로세스 메모리에 올려 두고 DB 왕복 없이 검색하는 읽기 사본
+
+    PostgreSQL(langchain_pg_embedding)이 원본이며, 백그라운드 스레드가 check_interval초마다
+    corpus_versions를 확인해 버전이 바뀌면 새 사본을 읽어 통째로 교체한다. 교체 전까지는
+    이전 사본으로 검색하므로 검색이 적재를 기다리지 않는다.
+
+    행 수가 exact_max_rows 이하이면 전체 행렬 곱으로 정확 검색(검색 프로필 무시)하고, 넘으면
+    sqrt(행 수)개 파티션의 IVF로 검색 프로필별 파티션 수(_IVF_PROBES)만 훑는다.
+    반환 형식과 임계값 판정은 vector_search.CollectionSearch와 같다 (점수 = cosine 거리).
+    """
+
+    def __init__(
+        self,
+        collection_name: str = Config.COLLECTION_NAME,
+        connection_string: str = Config.POSTGRES_CONNECTION,
+        check_interval: float = Config.MEMORY_INDEX_CHECK_INTERVAL,
+        exact_max_rows: int = Config.MEMORY_INDEX_EXACT_MAX_ROWS,
+        max_mb: float = Config.MEMORY_INDEX_MAX_MB,
+    ):
+        self.collection_name = collection_name
+        self.connection_string = connection_string
+        self.check_interval = check_interval
+        self.exact_max_rows = exact_max_rows
+        self.max_mb = max_mb
+        self._snapshot: Optional[_Snapshot] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> Dict[str, Any]:
+        """현재 버전을 적재하고 버전 확인 스레드 시작 (메모리 사용량 보고 반환)"""
+        self._snapshot = self._load()
+        self._thread = threading.Thread(
+            target=self._watch, name=f"memory-index-{self.collection_name}", daemon=True
+        )
+        self._thread.start()
+        return self.memory_report()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def search(
+        self, embedding: List[float], k: int = 5, profile: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.ids:
+            return []
+        rows, distances = self._top_k(snapshot, embedding, k, profile)
+        return [self._to_result(snapshot, row, distance) for row, distance in zip(rows, distances)]
+
+    async def asearch(
+        self, embedding: List[float], k: int = 5, profile: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        # 메모리 내 계산은 1ms 안팎이라 이벤트 루프에서 바로 실행
+        return self.search(embedding, k, profile)
+
+    def retrieve(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        threshold: Optional[float] = None,
+        fallback_threshold: Optional[float] = None,
+        profile: Optional[str] = None,
+    ) -> Retrieval:
+        """상위 k개에 임계값 → 보조 임계값 순으로 판정 (CollectionSearch.retrieve와 같은 규칙)"""
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.ids:
+            return Retrieval([], "none", None)
+        rows, distances = self._top_k(snapshot, embedding, k, profile)
+        if not len(rows):
+            return Retrieval([], "none", None)
+
+        if threshold is None:
+            confidence, keep = "high", np.ones(len(rows), dtype=bool)
+        elif (distances <= threshold).any():
+            confidence, keep = "high", distances <= threshold
+        elif fallback_threshold is not None and (distances <= fallback_threshold).any():
+            confidence, keep = "low", distances <= fallback_threshold
+        else:
+            confidence, keep = "none", np.zeros(len(rows), dtype=bool)
+
+        results = [
+            self._to_result(snapshot, row, distance)
+            for row, distance, kept in zip(rows, distances, keep)
+            if kept
+        ]
+        return Retrieval(results, confidence, float(distances[0]))
+
+    async def aretrieve(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        threshold: Optional[float] = None,
+        fallback_threshold: Optional[float] = None,
+        profile: Optional[str] = None,
+    ) -> Retrieval:
+        return self.retrieve(embedding, k, threshold, fallback_threshold, profile)
+
+    def memory_report(self) -> Dict[str, Any]:
+        """현재 사본의 행 수/버전/메모리 사용량 (MB)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False}
+        vectors = snapshot.matrix.nbytes + (
+            snapshot.centroids.nbytes if snapshot.centroids is not None else 0
+        )
+        texts = snapshot.payload_bytes
+        return {
+            "loaded": True,
+            "collection": self.collection_name,
+            "corpus_version": snapshot.version,
+            "rows": len(snapshot.ids),
+            "dimensions": snapshot.matrix.shape[1] if snapshot.ids else 0,
+            "mode": "ivf" if snapshot.centroids is not None else "exact",
+            "ivf_lists": len(snapshot.centroids) if snapshot.centroids is not None else 0,
+            "vectors_mb": round(vectors / 2**20, 2),
+            "documents_mb": round(texts / 2**20, 2),
+            "total_mb": round((vectors + texts) / 2**20, 2),
+            "budget_mb": self.max_mb,
+            "load_seconds": round(snapshot.load_seconds, 3),
+        }
+
+    def _top_k(
+        self, snapshot: _Snapshot, embedding: List[float], k: int, profile: Optional[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(행 번호, cosine 거리)를 거리 오름차순으로 반환"""
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        if snapshot.centroids is None:
+            rows = np.arange(len(snapshot.ids))
+            scores = snapshot.matrix @ query
+        else:
+            probes = min(_IVF_PROBES[resolve_search_profile(profile)], len(snapshot.centroids))
+            nearest = np.argpartition(-(snapshot.centroids @ query), probes - 1)[:probes]
+            rows = np.concatenate(
+                [np.arange(snapshot.offsets[i], snapshot.offsets[i + 1]) for i in nearest]
+            )
+            scores = np.concatenate(
+                [
+                    snapshot.matrix[snapshot.offsets[i] : snapshot.offsets[i + 1]] @ query
+                    for i in nearest
+                ]
+            )
+
+        k = min(k, len(scores))
+        if k == 0:
+            return rows[:0], scores[:0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], (1.0 - scores[top]).astype(np.float64)
+
+    @staticmethod
+    def _to_result(snapshot: _Snapshot, row: int, distance: float) -> Tuple[Document, float]:
+        document = Document(
+            id=snapshot.ids[row],
+            page_content=snapshot.documents[row],
+            metadata=dict(snapshot.metadatas[row]),
+        )
+        return document, float(distance)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                version = self._current_version()
+                if self._snapshot is None or version != self._snapshot.version:
+                    print(f"🔄 코퍼스 버전 변경 감지 (v{version}), 메모리 인덱스 다시 적재 중...")
+                    self._snapshot = self._load()
+                    report = self.memory_report()
+                    print(f"✅ 메모리 인덱스 교체 완료: {report['rows']}행, {report['total_mb']} MB")
+            except Exception as e:
+                # 적재에 실패해도 이전 사본으로 계속 검색
+                print(f"⚠️ 메모리 인덱스 갱신 실패: {e}")
+
+    def _current_version(self) -> int:
+        with get_engine(self.connection_string).connect() as conn:
+            version = conn.execute(
+                text("SELECT version FROM corpus_versions WHERE collection_name = :name"),
+                {"name": self.collection_name},
+            ).scalar()
+        return int(version) if version is not None else 0
+
+    def _load(self) -> _Snapshot:
+        started = time.perf_counter()
+        collection_uuid = get_collection_uuid(self.connection_string, self.collection_name)
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        vectors: List[np.ndarray] = []
+
+        with raw_connection(self.connection_string) as conn:
+            with conn.cursor() as cursor:
+                # 버전과 행을 같은 스냅샷에서 읽도록 REPEATABLE READ 트랜잭션 하나로 페이지 단위 COPY
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;"
+                    "SET LOCAL statement_timeout = 0;"
+                )
+                cursor.execute(
+                    "SELECT version FROM corpus_versions WHERE collection_name = %s",
+                    (self.collection_name,),
+                )
+                row = cursor.fetchone()
+                version = int(row[0]) if row else 0
+                if collection_uuid is not None:
+                    self._check_budget(cursor, collection_uuid)
+                    last_id = ""
+                    while True:
+                        page = self._copy_page(cursor, collection_uuid, last_id)
+                        if not page:
+                            break
+                        for row_id, document, metadata, _ in page:
+                            ids.append(row_id)
+                            documents.append(document)
+                            metadatas.append(metadata)
+                        # 페이지 단위로 복사해 COPY 버퍼를 바로 놓아줌 (행 벡터가 버퍼를 참조하지 않게)
+                        vectors.append(np.vstack([row[3] for row in page]).astype(np.float32))
+                        last_id = ids[-1]
+
+        if not ids:
+            return _Snapshot(version, [], [], [], np.zeros((0, 0), dtype=np.float32))
+
+        matrix = np.vstack(vectors).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        snapshot = _Snapshot(
+            version,
+            ids,
+            documents,
+            metadatas,
+            matrix,
+            payload_bytes=_payload_bytes(ids, documents, metadatas),
+        )
+        if len(ids) > self.exact_max_rows:
+            self._partition(snapshot)
+        snapshot.load_seconds = time.perf_counter() - started
+        return snapshot
+
+    def _check_budget(self, cursor, collection_uuid: str) -> None:
+        """적재 전에 예상 크기가 max_mb를 넘는지 확인 (넘으면 예외, 호출 측은 DB 검색 유지)
+
+        벡터 행렬(float32)에 더해, 앞쪽 표본 행을 실제로 디코딩해 잰 행당 id/본문/메타데이터
+        객체 크기를 행 수만큼 곱해 더한다 (메타데이터 dict는 JSON 텍스트보다 몇 배 크다).
+        """
+        cursor.execute(
+            """
+            SELECT count(*), COALESCE(sum(vector_dims(embedding) * 4), 0)
+            FROM langchain_pg_embedding WHERE collection_id = %s
+            """,
+            (collection_uuid,),
+        )
+        rows, vector_bytes = cursor.fetchone()
+        sample = self._copy_page(cursor, collection_uuid, "", _SIZE_SAMPLE_ROWS)
+        payload = _payload_bytes(
+            [row[0] for row in sample], [row[1] for row in sample], [row[2] for row in sample]
+        )
+        estimated = int(vector_bytes) + (payload * rows // len(sample) if sample else 0)
+        estimated_mb = estimated / 2**20
+        if self.max_mb and estimated_mb > self.max_mb:
+            raise MemoryError(
+                f"메모리 인덱스 예상 크기 {estimated_mb:.0f} MB가 한도 {self.max_mb} MB를 넘습니다 "
+                f"({rows}행). MEMORY_INDEX_MAX_MB를 늘리거나 메모리 인덱스를 끄세요."
+            )
+
+    @staticmethod
+    def _copy_page(cursor, collection_uuid: str, last_id: str, limit: int = _PAGE_ROWS) -> list:
+        query = cursor.mogrify(
+            """
+            SELECT id, document, cmetadata, embedding FROM langchain_pg_embedding
+            WHERE collection_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+            """,
+            (collection_uuid, last_id, limit),
+        ).decode("utf-8")
+        buffer = io.BytesIO()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT BINARY)", buffer)
+        return list(_parse_copy_rows(buffer.getvalue()))
+
+    @staticmethod
+    def _partition(snapshot: _Snapshot) -> None:
+        """IVF 파티션으로 나누고, 파티션별로 연속되도록 행 순서를 재배열"""
+        lists = max(int(np.sqrt(len(snapshot.ids))), 1)
+        centroids = _kmeans(snapshot.matrix, lists)
+        assignment = np.empty(len(snapshot.ids), dtype=np.int64)
+        for start in range(0, len(snapshot.ids), 10000):
+            block = snapshot.matrix[start : start + 10000]
+            assignment[start : start + 10000] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind="stable")
+        snapshot.matrix = np.ascontiguousarray(snapshot.matrix[order])
+        snapshot.ids = [snapshot.ids[i] for i in order]
+        snapshot.documents = [snapshot.documents[i] for i in order]
+        snapshot.metadatas = [snapshot.metadatas[i] for i in order]
+        snapshot.centroids = centroids
+        snapshot.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignment, minlength=lists))]
+        )
+
@@ -0,0 +1,155 @@
+"""저장된 임베딩 차원 축소(Matryoshka 방식 절단) 및/또는 HNSW 인덱스 저장 형식 변경용 단독 CLI"""
+
+import argparse
+import time
+from typing import Optional
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from config import Config
+from database_setup import (
+    bump_corpus_version,
+    create_hnsw_index,
+    drop_hnsw_index,
+    get_collection_dimensions,
+    get_collection_uuid,
+    get_pgvector_version,
+    relax_embedding_column,
+)
+from db import raw_connection
+
+
+def _parse_vector(value: str) -> np.ndarray:
+    return np.array(value.strip("[]").split(","), dtype=np.float32)
+
+
+def _vector_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(repr(float(v)) for v in vector) + "]"
+
+
+def shorten_embeddings(collection_name: str, dimensions: int, batch_size: int = 2000) -> int:
+    """컬렉션 임베딩을 앞쪽 dimensions개 성분으로 자르고 다시 정규화 (재임베딩 없이 차원 축소)
+
+    text-embedding-3 계열은 Matryoshka 방식으로 학습되어, 잘라서 정규화한 벡터가
+    API에 dimensions를 지정해 받은 벡터와 같다. 이미 줄어든 행은 건너뛰므로 중단 후 재실행해도 된다.
+    """
+    current = get_collection_dimensions(Config.POSTGRES_CONNECTION, collection_name)
+    if current is None or current == dimensions:
+        return 0
+    if dimensions > current:
+        raise ValueError(
+            f"차원을 늘릴 수는 없습니다 ({current} → {dimensions}). "
+            "EMBEDDING_DIMENSIONS를 바꾼 뒤 folder_vectorize.py로 다시 임베딩하세요."
+        )
+
+    # 컬렉션마다 차원이 다를 수 있도록 컬럼의 차원 고정 해제
+    relax_embedding_column(Config.POSTGRES_CONNECTION)
+    collection_uuid = get_collection_uuid(Config.POSTGRES_CONNECTION, collection_name)
+
+    updated = 0
+    with raw_connection(Config.POSTGRES_CONNECTION) as conn:
+        with conn.cursor() as cursor:
+            if get_pgvector_version(Config.POSTGRES_CONNECTION) >= (0, 7):
+                # pgvector 0.7+: 서버에서 바로 자르고 정규화
+                cursor.execute(
+                    """
+                    UPDATE langchain_pg_embedding
+                    SET embedding = l2_normalize(subvector(embedding, 1, %s))
+                    WHERE collection_id = %s AND vector_dims(embedding) > %s
+                    """,
+                    (dimensions, collection_uuid, dimensions),
+                )
+                updated = cursor.rowcount
+                conn.commit()
+            else:
+                while True:
+                    cursor.execute(
+                        """
+                        SELECT id, embedding::text FROM langchain_pg_embedding
+                        WHERE collection_id = %s AND vector_dims(embedding) > %s
+                        LIMIT %s
+                        """,
+                        (collection_uuid, dimensions, batch_size),
+                    )
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    values = []
+                    for row_id, embedding in rows:
+                        vector = _parse_vector(embedding)[:dimensions]
+                        vector /= np.linalg.norm(vector) or 1.0
+                        values.append((row_id, _vector_literal(vector)))
+                    execute_values(
+                        cursor,
+                        """
+                        UPDATE langchain_pg_embedding AS e SET embedding = v.embedding::vector
+                        FROM (VALUES %s) AS v(id, embedding) WHERE e.id = v.id
+                        """,
+                        values,
+                    )
+                    conn.commit()
+                    updated += len(rows)
+                    print(f"   ... {updated}행 변환")
+
+    return updated
+
+
+def migrate_collection(
+    collection_name: str, dimensions: Optional[int], storage: str
+) -> None:
+    started = time.perf_counter()
+    print(f"🚚 벡터 마이그레이션: {collection_name} (차원 {dimensions or '유지'}, 저장 형식 {storage})")
+
+    drop_hnsw_index(Config.POSTGRES_CONNECTION, collection_name)
+    if dimensions:
+        updated = shorten_embeddings(collection_name, dimensions)
+        print(f"✂️ 임베딩 차원 축소: {updated}행")
+    create_hnsw_index(Config.POSTGRES_CONNECTION, collection_name, storage=storage)
+    if collection_name in Config.BINARY_RERANK_COLLECTIONS:
+        create_hnsw_index(Config.POSTGRES_CONNECTION, collection_name, storage="bit")
+
+    # 벡터가 바뀌었으므로 답변 캐시 등 코퍼스 버전 기반 캐시 무효화
+    bump_corpus_version(Config.POSTGRES_CONNECTION, collection_name)
+    print(f"\n🎉 마이그레이션 완료 ({time.perf_counter() - started:.1f}s)")
+    print(
+        "ℹ️ 서버 환경 변수도 맞춰 주세요: "
+        f"EMBEDDING_DIMENSIONS={dimensions or get_collection_dimensions(Config.POSTGRES_CONNECTION, collection_name)} "
+        f"VECTOR_STORAGE={storage} (API 서버 재시작 필요)"
+    )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="저장된 임베딩의 차원을 줄이거나 HNSW 인덱스 저장 형식을 바꿉니다."
+    )
+    parser.add_argument("--collection", default=Config.COLLECTION_NAME)
+    parser.add_argument(
+        "--dimensions", type=int, default=None, help="줄일 임베딩 차원 (예: 512, 768)"
+    )
+    parser.add_argument(
+        "--storage",
+        choices=["vector", "halfvec"],
+        default=Config.VECTOR_STORAGE,
+        help="HNSW 인덱스 저장 형식 (halfvec은 pgvector 0.7 이상)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    migrate_collection(args.collection, args.dimensions, args.storage)
+
+
+if __name__ == "__main__":
+    main()
+
+
+'''
+Usage
+
+python backend/migrate_vectors.py --dimensions 768: 기존 컬렉션의 1536차원 임베딩을 768차원으로 줄이고(재임베딩 없음) 인덱스를 다시 만듭니다.
+python backend/migrate_vectors.py --storage halfvec: 벡터는 그대로 두고 HNSW 인덱스를 halfvec(float16)로 다시 만들어 인덱스 크기를 절반으로 줄입니다.
+  두 옵션은 함께 쓸 수 있으며, 완료 후 서버의 EMBEDDING_DIMENSIONS / VECTOR_STORAGE 를 같은 값으로 맞추고 재시작해야 합니다.
+  중간에 중단되어도 다시 실행하면 남은 행만 변환합니다.
+'''
@@ -0,0 +1,242 @@
+# parse_cache.py
+"""PDF 추출 결과(페이지 텍스트 + 단어 좌표) 영속 캐시
+
+PDF 파일 해시별 디렉터리에 페이지 구간 단위 파일로 저장한다. 각 파일은 JSON 헤더 뒤에
+열(column)별 배열을 정렬해 붙인 형식이라 np.memmap으로 복사 없이 읽을 수 있다.
+CHUNK_SIZE / CHUNK_OVERLAP만 바꿔 다시 청크로 나눌 때 PyMuPDF 추출을 건너뛴다.
+교재 디렉터리의 수정 시각을 마지막 사용 시각으로 삼아 prune이 오래 쓰지 않은 교재부터 지운다.
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+# 추출/저장 형식이 바뀌면 올려서 이전 파일을 무시
+FORMAT_VERSION = 1
+_MAGIC = b"AKPAGES1"
+_ALIGN = 64
+
+
+@dataclass
+class ParsedPage:
+    """페이지 1장의 추출 결과 (단어 열은 페이지 텍스트 순서)"""
+
+    number: int  # 0부터
+    text: str
+    width: float
+    height: float
+    word_starts: np.ndarray  # int32 [n]: 페이지 텍스트 내 단어 시작 문자 오프셋
+    word_ends: np.ndarray  # int32 [n]: 끝 오프셋 (exclusive)
+    word_boxes: np.ndarray  # float64 [n, 4]: x0, y0, x1, y1
+    word_lines: np.ndarray  # int32 [n, 2]: block_no, line_no
+
+
+class _Shard:
+    """캐시 파일 1개 ([start, end) 페이지)를 memmap으로 연 것"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(data[: len(_MAGIC)]) != _MAGIC:
+            raise ValueError(f"파싱 캐시 형식이 아닙니다: {path}")
+        (header_size,) = struct.unpack("<I", bytes(data[len(_MAGIC) : len(_MAGIC) + 4]))
+        header_start = len(_MAGIC) + 4
+        header = json.loads(bytes(data[header_start : header_start + header_size]))
+        self.start: int = header["start"]
+        self.end: int = header["end"]
+        # PDF 전체 페이지 수 (요청 구간이 책 끝을 넘을 때 잘라내기 위함)
+        self.page_count: int = header["page_count"]
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            count = int(np.prod(shape)) if shape else 1
+            self._arrays[name] = np.frombuffer(
+                data, dtype=dtype, count=count, offset=offset
+            ).reshape(shape)
+
+    def page(self, number: int) -> ParsedPage:
+        a = self._arrays
+        i = number - self.start
+        text_from, text_to = a["text_offsets"][i], a["text_offsets"][i + 1]
+        word_from, word_to = a["word_offsets"][i], a["word_offsets"][i + 1]
+        return ParsedPage(
+            number=number,
+            text=bytes(a["text"][text_from:text_to]).decode("utf-8"),
+            width=float(a["page_sizes"][i, 0]),
+            height=float(a["page_sizes"][i, 1]),
+            word_starts=a["word_spans"][word_from:word_to, 0],
+            word_ends=a["word_spans"][word_from:word_to, 1],
+            # MuPDF 좌표는 float32라 저장은 float32로, 사용은 추출 직후와 같은 float64로
+            word_boxes=a["word_boxes"][word_from:word_to].astype(np.float64),
+            word_lines=a["word_lines"][word_from:word_to],
+        )
+
+
+def _write_shard(path: Path, start: int, pages: List[ParsedPage], page_count: int) -> None:
+    texts = [page.text.encode("utf-8") for page in pages]
+    arrays = {
+        "page_sizes": np.array([[p.width, p.height] for p in pages], dtype=np.float32).reshape(-1, 2),
+        "text_offsets": np.concatenate([[0], np.cumsum([len(t) for t in texts])]).astype(np.int64),
+        "text": np.frombuffer(b"".join(texts), dtype=np.uint8),
+        "word_offsets": np.concatenate(
+            [[0], np.cumsum([len(p.word_starts) for p in pages])]
+        ).astype(np.int64),
+        "word_spans": np.concatenate(
+            [np.stack([p.word_starts, p.word_ends], axis=1) for p in pages] or [np.empty((0, 2))]
+        ).astype(np.int32).reshape(-1, 2),
+        "word_boxes": np.concatenate([p.word_boxes for p in pages] or [np.empty((0, 4))])
+        .astype(np.float32)
+        .reshape(-1, 4),
+        "word_lines": np.concatenate([p.word_lines for p in pages] or [np.empty((0, 2))])
+        .astype(np.int32)
+        .reshape(-1, 2),
+    }
+
+    # 헤더 크기가 배열 오프셋에 영향을 주므로 헤더 공간을 넉넉히 잡고 오프셋 계산
+    header_space = 1024
+    while True:
+        offset = _align(len(_MAGIC) + 4 + header_space)
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = (array.dtype.str, list(array.shape), offset)
+            offset = _align(offset + array.nbytes)
+        header = json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "start": start,
+                "end": start + len(pages),
+                "page_count": page_count,
+                "arrays": layout,
+            }
+        ).encode("utf-8")
+        if len(header) <= header_space:
+            break
+        header_space *= 2
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGIC + struct.pack("<I", len(header)) + header)
+            for name, array in arrays.items():
+                f.seek(layout[name][2])
+                f.write(array.tobytes())
+            f.truncate(offset)
+        os.chmod(tmp_path, 0o644)
+        # 다른 파싱 프로세스가 같은 구간을 동시에 써도 완성된 파일만 보이도록 교체
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class ParseCache:
+    """PDF 해시 → 페이지 구간별 추출 결과 캐시 (Config.PARSE_CACHE_DIR)"""
+
+    def __init__(self, directory: str = Config.PARSE_CACHE_DIR):
+        self.directory = Path(directory)
+
+    def _book_dir(self, file_hash: str) -> Path:
+        return self.directory / file_hash
+
+    def _shards(self, file_hash: str) -> List[Tuple[int, int, Path]]:
+        book_dir = self._book_dir(file_hash)
+        if not book_dir.is_dir():
+            return []
+        shards = []
+        prefix = f"v{FORMAT_VERSION}-"
+        for path in book_dir.glob(f"{prefix}*.pages"):
+            start, end = path.stem[len(prefix) :].split("-")
+            shards.append((int(start), int(end), path))
+        return sorted(shards)
+
+    def load(self, file_hash: str, start: int, end: int) -> Optional[List[ParsedPage]]:
+        """[start, end) 페이지가 모두 캐시에 있으면 페이지 목록, 하나라도 없으면 None
+
+        저장할 때와 다른 구간으로 나눠 읽어도 된다 (겹치거나 여러 파일에 걸친 구간 허용).
+        """
+        shards = self._shards(file_hash)
+        if not shards:
+            return None
+        pages: List[ParsedPage] = []
+        opened: Dict[Path, _Shard] = {}
+        number = start
+        while number < end:
+            found = next((s for s in shards if s[0] <= number < s[1]), None)
+            if found is None:
+                return None
+            _, shard_end, path = found
+            if path not in opened:
+                try:
+                    opened[path] = _Shard(path)
+                except (OSError, ValueError, KeyError):
+                    # 깨진 파일은 없는 것으로 보고 다시 추출 (새 파일이 덮어씀)
+                    return None
+            shard = opened[path]
+            end = min(end, shard.page_count)
+            for page_number in range(number, min(shard_end, end)):
+                pages.append(shard.page(page_number))
+            number = min(shard_end, end)
+        self._touch(file_hash)
+        return pages
+
+    def store(self, file_hash: str, start: int, pages: List[ParsedPage], page_count: int) -> None:
+        """연속된 페이지 추출 결과 저장 (page_count: PDF 전체 페이지 수)"""
+        if not pages:
+            return
+        path = self._book_dir(file_hash) / f"v{FORMAT_VERSION}-{start}-{start + len(pages)}.pages"
+        _write_shard(path, start, pages, page_count)
+
+    def book_bytes(self, file_hash: str) -> int:
+        """교재 1권의 캐시 파일 크기 합"""
+        return sum(path.stat().st_size for _, _, path in self._shards(file_hash))
+
+    def prune(self, max_bytes: int, keep: Iterable[str] = ()) -> int:
+        """전체 크기가 max_bytes 이하가 될 때까지 오래 쓰지 않은 교재부터 삭제하고 지운 권수 반환
+
+        keep의 해시(방금 수집한 교재 등)는 지우지 않는다.
+        """
+        if not self.directory.is_dir():
+            return 0
+        books = []
+        for book_dir in self.directory.iterdir():
+            if not book_dir.is_dir():
+                continue
+            try:
+                size = sum(path.stat().st_size for path in book_dir.iterdir())
+                books.append((book_dir.stat().st_mtime, size, book_dir))
+            except FileNotFoundError:
+                # 다른 프로세스가 같은 교재를 지우는 중
+                continue
+        total = sum(size for _, size, _ in books)
+        keep = set(keep)
+        removed = 0
+        for _, size, book_dir in sorted(books):
+            if total <= max_bytes:
+                break
+            if book_dir.name in keep:
+                continue
+            shutil.rmtree(book_dir, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def _touch(self, file_hash: str) -> None:
+        try:
+            os.utime(self._book_dir(file_hash))
+        except OSError:
+            pass
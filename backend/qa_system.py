@@ -1,18 +1,52 @@
 # qa_system.py
-from typing import Dict, Any
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, List, Optional, Tuple, Union
+from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 
 # from langchain_ollama import ChatOllama
 from langchain_core.prompts import PromptTemplate
 from langchain_postgres import PGVector
+from answer_cache import SemanticAnswerCache, cache_scope
 from config import Config
+from vector_search import CollectionSearch, resolve_search_profile
+
+if TYPE_CHECKING:
+    from memory_index import InMemoryIndex
+
+
+ANSWER_PROMPT_TEMPLATE = """다음 교재 내용을 바탕으로 질문에 정확하게 답변해주세요.
+
+교재 내용:
+{context}
+
+질문: {question}
+
+답변 (교재 내용을 기반으로 상세하게 설명):"""
+
+NO_DOC_MESSAGE = (
+    "죄송합니다. 충분히 유사한 교재 내용을 찾지 못했습니다. "
+    "다른 질문이나 더 구체적인 내용을 시도해주세요."
+)
 
 
 class QASystem:
     """질의응답 시스템"""
 
-    def __init__(self, vector_store: PGVector):
+    def __init__(
+        self,
+        vector_store: PGVector,
+        async_vector_store: Optional[PGVector] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        searcher: Optional[Union[CollectionSearch, "InMemoryIndex"]] = None,
+    ):
         self.vector_store = vector_store
+        # async_mode PGVector (psycopg3 async 드라이버). 없으면 비동기 경로는 스레드로 위임한다.
+        self.async_vector_store = async_vector_store
+        # 의미 기반 답변 캐시 (None이면 비활성화)
+        self.answer_cache = answer_cache
+        # 컬렉션 전용 인덱스 검색 또는 메모리 사본 검색 (None이면 PGVector 기본 검색)
+        self.searcher = searcher
         self.llm = ChatOpenAI(
             model=Config.LLM_MODEL,
             temperature=0,
@@ -21,13 +55,185 @@ class QASystem:
         # pgvector는 코사인 거리를 score로 반환하므로 값이 낮을수록 유사도가 높다.
         self.similarity_threshold = Config.SIMILARITY_THRESHOLD
         self.fallback_threshold = Config.SIMILARITY_FALLBACK_THRESHOLD
+        self.prompt = PromptTemplate(
+            template=ANSWER_PROMPT_TEMPLATE, input_variables=["context", "question"]
+        )
+
+    def answer_question(
+        self, question: str, k: int = 5, search_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """질문에 대한 답변 및 레퍼런스(좌표, 문서 원문 포함) 제공
+
+        search_profile: 검색 정확도/지연 프로필 (fast / balanced / high_recall, None이면 기본값)
+        """
+        profile = resolve_search_profile(search_profile)
 
-    def answer_question(self, question: str, k: int = 5) -> Dict[str, Any]:
-        """질문에 대한 답변 및 레퍼런스(좌표, 문서 원문 포함) 제공"""
+        # 질문 임베딩 1회 계산 후 답변 캐시 조회와 문서 검색에 함께 사용
+        embedding = self.vector_store.embeddings.embed_query(question)
+
+        if self.answer_cache is not None:
+            cached = self.answer_cache.lookup(embedding, k, self._cache_scope(profile))
+            if cached is not None:
+                return self._cached_response(question, cached)
 
         # 관련 문서 검색 (HNSW 인덱스 활용)
-        search_results = self.vector_store.similarity_search_with_score(question, k=k)
+        filtered_results, confidence, best_score = self._retrieve(embedding, k, profile)
+        if not filtered_results:
+            return self._no_document_response(question, best_score, profile)
+
+        # LLM으로 답변 생성
+        answer = self.llm.invoke(self._format_prompt(question, filtered_results))
+
+        result = self._build_response(
+            question, answer.content, filtered_results, confidence, profile
+        )
+        if self.answer_cache is not None:
+            self.answer_cache.store(embedding, k, self._cache_scope(profile), result)
+            result["metadata"]["cache"] = {"hit": False}
+        return result
+
+    async def aanswer_question(
+        self, question: str, k: int = 5, search_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """answer_question의 비동기 버전 (이벤트 루프를 막지 않음)"""
+
+        if self.async_vector_store is None:
+            return await asyncio.to_thread(self.answer_question, question, k, search_profile)
+
+        profile = resolve_search_profile(search_profile)
+
+        # 비동기 임베딩 + 비동기 pgvector 검색
+        embedding = await self.async_vector_store.embeddings.aembed_query(question)
+
+        if self.answer_cache is not None:
+            cached = await self.answer_cache.alookup(embedding, k, self._cache_scope(profile))
+            if cached is not None:
+                return self._cached_response(question, cached)
+
+        filtered_results, confidence, best_score = await self._aretrieve(embedding, k, profile)
+        if not filtered_results:
+            return self._no_document_response(question, best_score, profile)
+
+        answer = await self.llm.ainvoke(self._format_prompt(question, filtered_results))
+
+        result = self._build_response(
+            question, answer.content, filtered_results, confidence, profile
+        )
+        if self.answer_cache is not None:
+            await self.answer_cache.astore(embedding, k, self._cache_scope(profile), result)
+            result["metadata"]["cache"] = {"hit": False}
+        return result
+
+    async def astream_answer(
+        self, question: str, k: int = 5, search_profile: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """검색 직후 references를, 이후 답변 토큰과 최종 metadata를 순서대로 내보내는 스트림
+
+        ("references", {...}) → ("token", {"text": ...}) * N → ("done", {...}) 순서로 yield 한다.
+        """
+        profile = resolve_search_profile(search_profile)
+
+        if self.async_vector_store is not None:
+            embedding = await self.async_vector_store.embeddings.aembed_query(question)
+        else:
+            embedding = await asyncio.to_thread(
+                self.vector_store.embeddings.embed_query, question
+            )
+
+        if self.answer_cache is not None:
+            cached = await self.answer_cache.alookup(embedding, k, self._cache_scope(profile))
+            if cached is not None:
+                response = self._cached_response(question, cached)
+                yield "references", {"references": response["references"]}
+                yield "token", {"text": response["answer"]}
+                yield "done", {"answer": response["answer"], "metadata": response["metadata"]}
+                return
+
+        filtered_results, confidence, best_score = await self._aretrieve(embedding, k, profile)
+        if not filtered_results:
+            response = self._no_document_response(question, best_score, profile)
+            yield "references", {"references": []}
+            yield "token", {"text": response["answer"]}
+            yield "done", {"answer": response["answer"], "metadata": response["metadata"]}
+            return
+
+        # 검색이 끝나는 즉시 레퍼런스를 먼저 전달 (체감 지연 = 검색 시간)
+        result = self._build_response(question, "", filtered_results, confidence, profile)
+        yield "references", {"references": result["references"]}
+
+        parts: List[str] = []
+        async for chunk in self.llm.astream(self._format_prompt(question, filtered_results)):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield "token", {"text": chunk.content}
+
+        result["answer"] = "".join(parts)
+        if self.answer_cache is not None:
+            await self.answer_cache.astore(embedding, k, self._cache_scope(profile), result)
+            result["metadata"]["cache"] = {"hit": False}
+        yield "done", {"answer": result["answer"], "metadata": result["metadata"]}
+
+    def _cache_scope(self, profile: str) -> str:
+        """답변 캐시 키에 들어갈 검색 설정 (프로필 + 임계값)"""
+        return cache_scope(profile, self.similarity_threshold, self.fallback_threshold)
 
+    def _retrieve(
+        self, embedding: List[float], k: int, profile: Optional[str] = None
+    ) -> Tuple[List[Tuple[Document, float]], str, Optional[float]]:
+        """관련 문서 검색 + 임계값 적용 → (결과, confidence, 최고 점수)
+
+        컬렉션 검색기가 있으면 임계값 판정과 본문 로딩까지 SQL 한 번으로 처리한다.
+        """
+        if self.searcher is not None:
+            retrieval = self.searcher.retrieve(
+                embedding, k, self.similarity_threshold, self.fallback_threshold, profile
+            )
+            return retrieval.results, retrieval.confidence, retrieval.best_score
+
+        search_results = self._search(embedding, k, profile)
+        filtered_results, confidence = self._filter_results(search_results)
+        return filtered_results, confidence, self._best_score(search_results)
+
+    async def _aretrieve(
+        self, embedding: List[float], k: int, profile: Optional[str] = None
+    ) -> Tuple[List[Tuple[Document, float]], str, Optional[float]]:
+        if self.searcher is not None:
+            retrieval = await self.searcher.aretrieve(
+                embedding, k, self.similarity_threshold, self.fallback_threshold, profile
+            )
+            return retrieval.results, retrieval.confidence, retrieval.best_score
+
+        search_results = await self._asearch(embedding, k, profile)
+        filtered_results, confidence = self._filter_results(search_results)
+        return filtered_results, confidence, self._best_score(search_results)
+
+    @staticmethod
+    def _best_score(search_results: List[Tuple[Document, float]]) -> Optional[float]:
+        return search_results[0][1] if search_results else None
+
+    def _search(
+        self, embedding: List[float], k: int, profile: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        if self.searcher is not None:
+            return self.searcher.search(embedding, k, profile)
+        return self.vector_store.similarity_search_with_score_by_vector(embedding, k=k)
+
+    async def _asearch(
+        self, embedding: List[float], k: int, profile: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        """비동기 스토어가 있으면 async 드라이버로, 없으면 스레드에서 동기 검색"""
+        if self.searcher is not None:
+            return await self.searcher.asearch(embedding, k, profile)
+        if self.async_vector_store is not None:
+            return await self.async_vector_store.asimilarity_search_with_score_by_vector(
+                embedding, k=k
+            )
+        return await asyncio.to_thread(self._search, embedding, k, profile)
+
+    def _filter_results(
+        self, search_results: List[Tuple[Document, float]]
+    ) -> Tuple[List[Tuple[Document, float]], str]:
+        """임계값/보조 임계값을 적용해 (결과, confidence) 반환"""
         if self.similarity_threshold is not None:
             filtered_results = [
                 (doc, score)
@@ -37,42 +243,64 @@ class QASystem:
         else:
             filtered_results = search_results
 
-        confidence = "high"
+        if filtered_results:
+            return filtered_results, "high"
 
-        no_doc_message = (
-            "죄송합니다. 충분히 유사한 교재 내용을 찾지 못했습니다. "
-            "다른 질문이나 더 구체적인 내용을 시도해주세요."
-        )
+        if self.fallback_threshold is not None:
+            fallback_results = [
+                (doc, score)
+                for doc, score in search_results
+                if score <= self.fallback_threshold
+            ]
+            if fallback_results:
+                return fallback_results, "low"
 
-        if not filtered_results:
-            fallback_results = []
-            if self.fallback_threshold is not None:
-                fallback_results = [
-                    (doc, score)
-                    for doc, score in search_results
-                    if score <= self.fallback_threshold
-                ]
+        return [], "none"
 
-            if fallback_results:
-                filtered_results = fallback_results
-                confidence = "low"
-            else:
-                best_score = search_results[0][1] if search_results else None
-                return {
-                    "question": question,
-                    "answer": no_doc_message,
-                    "references": [],
-                    "metadata": {
-                        "reason": "no_similar_document",
-                        "threshold": self.similarity_threshold,
-                        "fallback_threshold": self.fallback_threshold,
-                        "best_score": best_score,
-                    },
-                }
-
-        relevant_docs = [doc for doc, _ in filtered_results]
-
-        # 레퍼런스 정보 추출 및 중복 제거
+    def _no_document_response(
+        self,
+        question: str,
+        best_score: Optional[float],
+        profile: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return {
+            "question": question,
+            "answer": NO_DOC_MESSAGE,
+            "references": [],
+            "metadata": {
+                "reason": "no_similar_document",
+                "threshold": self.similarity_threshold,
+                "fallback_threshold": self.fallback_threshold,
+                "best_score": best_score,
+                "search_profile": profile,
+            },
+        }
+
+    def _cached_response(self, question: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = dict(cached["metadata"])
+        metadata["cache"] = {
+            "hit": True,
+            "distance": cached["distance"],
+            "cached_question": cached["question"],
+        }
+        return {
+            "question": question,
+            "answer": cached["answer"],
+            "references": cached["references"],
+            "metadata": metadata,
+        }
+
+    def _format_prompt(
+        self, question: str, filtered_results: List[Tuple[Document, float]]
+    ) -> str:
+        # 컨텍스트 생성
+        context = "\n\n".join([doc.page_content for doc, _ in filtered_results])
+        return self.prompt.format(context=context, question=question)
+
+    def _build_references(
+        self, filtered_results: List[Tuple[Document, float]]
+    ) -> List[Dict[str, Any]]:
+        """레퍼런스 정보 추출 및 중복 제거"""
         references = []
         seen_refs = set()
 
@@ -104,43 +332,33 @@ class QASystem:
                 "y1": bbox.get("y1"),
                 "x2": bbox.get("x2"),
                 "y2": bbox.get("y2"),
+                "line_rects": metadata.get("line_rects"),
                 "score": score,
                 "metadata": metadata,
             }
 
             references.append(ref)
 
-        # 컨텍스트 생성
-        context = "\n\n".join([doc.page_content for doc in relevant_docs])
-
-        # 프롬프트 생성
-        prompt_template = """다음 교재 내용을 바탕으로 질문에 정확하게 답변해주세요.
-
-교재 내용:
-{context}
-
-질문: {question}
-
-답변 (교재 내용을 기반으로 상세하게 설명):"""
-
-        prompt = PromptTemplate(
-            template=prompt_template, input_variables=["context", "question"]
-        )
+        return references
 
-        # LLM으로 답변 생성
-        formatted_prompt = prompt.format(context=context, question=question)
-        answer = self.llm.invoke(formatted_prompt)
-        
+    def _build_response(
+        self,
+        question: str,
+        answer_text: str,
+        filtered_results: List[Tuple[Document, float]],
+        confidence: str,
+        profile: Optional[str] = None,
+    ) -> Dict[str, Any]:
         metadata = {
             "confidence": confidence,
             "threshold": self.similarity_threshold,
             "fallback_threshold": self.fallback_threshold,
+            "search_profile": profile,
         }
 
         return {
             "question": question,
-            "answer": answer.content,
-            "references": references,
+            "answer": answer_text,
+            "references": self._build_references(filtered_results),
             "metadata": metadata,
-
         }
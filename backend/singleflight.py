@@ -0,0 +1,95 @@
+# singleflight.py
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """진행 중인 동기 실행 1건"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class _AsyncCall:
+    """진행 중인 비동기 실행 1건"""
+
+    def __init__(self, task: "asyncio.Task") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 요청을 한 번의 실행으로 합치는 헬퍼 (동기/비동기 공용)
+
+    먼저 들어온 요청(leader)만 실제로 실행하고, 실행 중에 들어온 같은 키의 요청(waiter)은
+    그 결과를 함께 받는다. 반환값은 (결과, 공유 여부, 합쳐진 waiter 수) 이다.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, _AsyncCall] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool, int]:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader, call.waiters
+
+    async def ado(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool, int]:
+        # _async_calls는 이벤트 루프 스레드에서만 접근 (잠금은 공용 카운터 보호용)
+        call = self._async_calls.get(key)
+        leader = call is None
+        if leader:
+            task = asyncio.ensure_future(fn())
+            call = _AsyncCall(task)
+            self._async_calls[key] = call
+            # 완료 즉시 목록에서 제거 (이후 요청은 새로 실행)
+            task.add_done_callback(lambda _: self._async_calls.pop(key, None))
+            with self._lock:
+                self.executions += 1
+        else:
+            call.waiters += 1
+            with self._lock:
+                self.coalesced += 1
+
+        # 한 클라이언트가 끊겨도 공유 중인 실행은 취소되지 않도록 shield
+        result = await asyncio.shield(call.task)
+        return result, not leader, call.waiters
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._async_calls),
+        }
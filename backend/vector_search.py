@@ -0,0 +1,316 @@
+# vector_search.py
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from sqlalchemy import text
+
+from config import HNSW_MAX_EF_SEARCH, Config
+from database_setup import (
+    embedding_expression,
+    get_collection_dimensions,
+    get_collection_uuid,
+    get_pgvector_version,
+)
+from db import get_async_engine, get_engine
+
+
+def _vector_literal(embedding: List[float]) -> str:
+    return "[" + ",".join(repr(float(v)) for v in embedding) + "]"
+
+
+@dataclass(frozen=True)
+class SearchProfile:
+    """HNSW 검색 정확도/지연 트레이드오프 (트랜잭션 단위로 적용)
+
+    ef_search: 후보 리스트 크기 (클수록 recall↑ 지연↑, k보다 작으면 k로 올리되 HNSW_MAX_EF_SEARCH 이하)
+
+    반복 인덱스 스캔(hnsw.iterative_scan)은 설정하지 않는다. 검색 조건은 partial 인덱스 조건과
+    같은 collection_id뿐이고 임계값은 LIMIT k 이후에 적용하므로, 인덱스 스캔이 결과를 모자라게
+    반환하는 경우가 없어 효과가 없다.
+    """
+
+    ef_search: int
+
+SEARCH_PROFILES: Dict[str, SearchProfile] = {
+    "fast": SearchProfile(ef_search=20),
+    "balanced": SearchProfile(ef_search=64),
+    "high_recall": SearchProfile(ef_search=200),
+}
+
+
+def resolve_search_profile(name: Optional[str]) -> str:
+    """프로필 이름 검증 (None이면 Config.SEARCH_PROFILE)"""
+    name = name or Config.SEARCH_PROFILE
+    if name not in SEARCH_PROFILES:
+        raise ValueError(
+            f"알 수 없는 검색 프로필입니다: {name} (사용 가능: {', '.join(SEARCH_PROFILES)})"
+        )
+    return name
+
+
+@dataclass
+class Retrieval:
+    """임계값 적용 검색 결과 (results는 거리 오름차순, confidence는 high / low / none)"""
+
+    results: List[Tuple[Document, float]]
+    confidence: str
+    best_score: Optional[float]
+
+
+# 상위 k개 후보는 (id, 거리)만 구하고, 임계값(없으면 전부 통과)으로 high → low 순서로 판정한 뒤
+# 통과한 후보만 본문/메타데이터를 조인해 읽는다. 버려질 행의 document/cmetadata는 읽지 않는다.
+_RETRIEVE_SQL_TEMPLATE = """
+    WITH candidates AS MATERIALIZED (
+        SELECT id, {distance} AS distance
+        FROM {source}
+        ORDER BY distance
+        LIMIT :k
+    ),
+    verdict AS (
+        SELECT
+            CASE
+                WHEN EXISTS (
+                    SELECT 1 FROM candidates
+                    WHERE CAST(:threshold AS double precision) IS NULL
+                       OR distance <= CAST(:threshold AS double precision)
+                ) THEN 'high'
+                WHEN EXISTS (
+                    SELECT 1 FROM candidates
+                    WHERE distance <= CAST(:fallback_threshold AS double precision)
+                ) THEN 'low'
+                ELSE 'none'
+            END AS confidence,
+            (SELECT MIN(distance) FROM candidates) AS best_distance
+    )
+    SELECT v.confidence, v.best_distance, e.id, c.distance, e.document, e.cmetadata
+    FROM verdict v
+    LEFT JOIN candidates c ON
+        (v.confidence = 'high' AND (CAST(:threshold AS double precision) IS NULL
+                                    OR c.distance <= CAST(:threshold AS double precision)))
+        OR (v.confidence = 'low' AND c.distance <= CAST(:fallback_threshold AS double precision))
+    LEFT JOIN langchain_pg_embedding e ON e.id = c.id
+    ORDER BY c.distance
+"""
+
+
+# 검색 프로필을 현재 트랜잭션에만 적용 (set_config(..., true) = SET LOCAL, 한 번의 왕복)
+_SET_EF_SEARCH_SQL = text("SELECT set_config('hnsw.ef_search', :ef_search, true)")
+
+
+class CollectionSearch:
+    """컬렉션 전용 partial HNSW 인덱스를 직접 타는 유사도 검색 (동기/비동기)
+
+    PGVector 기본 검색은 collection_id를 바인드 파라미터로 넘기므로, 서버 측 prepared
+    statement가 generic plan으로 바뀌면 partial 인덱스(WHERE collection_id = '<uuid>')와
+    조건이 일치하지 않아 사용되지 않는다. 여기서는 컬렉션 uuid를 SQL 리터럴로 고정해
+    항상 해당 컬렉션의 인덱스만 스캔한다. 반환 형식은 similarity_search_with_score_by_vector와 같다.
+
+    검색마다 같은 트랜잭션에서 검색 프로필의 hnsw.* 설정을 SET LOCAL로 적용하므로
+    풀에 반환된 커넥션에는 설정이 남지 않는다. storage는 인덱스를 만들 때의 저장 형식과
+    같아야 한다 (차원은 컬렉션에 저장된 벡터에서 읽는다).
+
+    binary_rerank=True(기본: Config.BINARY_RERANK_COLLECTIONS에 포함된 컬렉션)면 2단계로 검색한다.
+    1단계는 이진 양자화 bit 인덱스에서 Hamming 거리로 candidates개를 추리고, 2단계는 그 후보만
+    원본 float32 벡터의 cosine 거리로 재정렬해 k개를 고른다. 반환 점수는 1단계와 무관하게
+    원본 벡터의 cosine 거리라 임계값 의미가 그대로다. pgvector 0.7 미만이면 1단계 검색으로 돌아간다.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = Config.COLLECTION_NAME,
+        connection_string: str = Config.POSTGRES_CONNECTION,
+        async_connection_string: str = Config.ASYNC_POSTGRES_CONNECTION,
+        storage: str = Config.VECTOR_STORAGE,
+        binary_rerank: Optional[bool] = None,
+        candidates: int = Config.BINARY_RERANK_CANDIDATES,
+    ):
+        self.collection_name = collection_name
+        self.connection_string = connection_string
+        self._engine = get_engine(connection_string)
+        self._async_engine = get_async_engine(async_connection_string)
+        self._query: Optional[Any] = None
+        self._retrieve_query: Optional[Any] = None
+        self._collection_uuid: Optional[str] = None
+        self.storage = storage
+        if binary_rerank is None:
+            binary_rerank = collection_name in Config.BINARY_RERANK_COLLECTIONS
+        self.binary_rerank = binary_rerank
+        self.candidates = candidates
+
+    def search(
+        self, embedding: List[float], k: int = 5, profile: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        query = self._get_query()
+        if query is None:
+            return []
+        with self._engine.begin() as conn:
+            conn.execute(*self._profile_statement(profile, k))
+            rows = conn.execute(query, self._params(embedding, k)).mappings().all()
+        return self._to_results(rows)
+
+    async def asearch(
+        self, embedding: List[float], k: int = 5, profile: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        # uuid/차원/버전 조회는 최초 1회뿐이라 동기 호출로 충분
+        query = self._get_query()
+        if query is None:
+            return []
+        async with self._async_engine.begin() as conn:
+            await conn.execute(*self._profile_statement(profile, k))
+            result = await conn.execute(query, self._params(embedding, k))
+            rows = result.mappings().all()
+        return self._to_results(rows)
+
+    def retrieve(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        threshold: Optional[float] = None,
+        fallback_threshold: Optional[float] = None,
+        profile: Optional[str] = None,
+    ) -> Retrieval:
+        """임계값 필터링과 신뢰도 판정을 SQL에서 끝내고, 통과한 행만 본문/메타데이터를 읽어 반환"""
+        query = self._get_retrieve_query()
+        if query is None:
+            return Retrieval([], "none", None)
+        params = self._retrieve_params(embedding, k, threshold, fallback_threshold)
+        with self._engine.begin() as conn:
+            conn.execute(*self._profile_statement(profile, k))
+            rows = conn.execute(query, params).mappings().all()
+        return self._to_retrieval(rows)
+
+    async def aretrieve(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        threshold: Optional[float] = None,
+        fallback_threshold: Optional[float] = None,
+        profile: Optional[str] = None,
+    ) -> Retrieval:
+        query = self._get_retrieve_query()
+        if query is None:
+            return Retrieval([], "none", None)
+        params = self._retrieve_params(embedding, k, threshold, fallback_threshold)
+        async with self._async_engine.begin() as conn:
+            await conn.execute(*self._profile_statement(profile, k))
+            result = await conn.execute(query, params)
+            rows = result.mappings().all()
+        return self._to_retrieval(rows)
+
+    def _profile_statement(self, profile: Optional[str], k: int) -> Tuple[Any, Dict[str, str]]:
+        settings = SEARCH_PROFILES[resolve_search_profile(profile)]
+        # HNSW는 ef_search개까지만 반환하므로 k(2단계 검색이면 후보 수)보다 작게 두지 않는다.
+        # pgvector 상한을 넘기면 검색 자체가 실패하므로 상한에서 자른다 (그때는 결과가 k개보다 적을 수 있음)
+        ef_search = min(max(settings.ef_search, self._candidate_count(k)), HNSW_MAX_EF_SEARCH)
+        return _SET_EF_SEARCH_SQL, {"ef_search": str(ef_search)}
+
+    def _candidate_count(self, k: int) -> int:
+        return max(self.candidates, k) if self.binary_rerank else k
+
+    def _get_query(self):
+        if self._query is None:
+            parts = self._query_parts()
+            if parts is None:
+                return None
+            source, distance = parts
+            self._query = text(f"""
+                SELECT id, document, cmetadata, {distance} AS distance
+                FROM {source}
+                ORDER BY distance
+                LIMIT :k
+            """)
+        return self._query
+
+    def _get_retrieve_query(self):
+        if self._retrieve_query is None:
+            parts = self._query_parts()
+            if parts is None:
+                return None
+            source, distance = parts
+            self._retrieve_query = text(
+                _RETRIEVE_SQL_TEMPLATE.format(source=source, distance=distance)
+            )
+        return self._retrieve_query
+
+    def _query_parts(self) -> Optional[Tuple[str, str]]:
+        """(검색 대상 FROM 절, 거리 표현식) 반환 (컬렉션이 없거나 비어 있으면 None)
+
+        거리 표현식은 create_hnsw_index와 같은 표현식이어야 인덱스가 사용된다.
+        """
+        collection_uuid = get_collection_uuid(self.connection_string, self.collection_name)
+        dimensions = get_collection_dimensions(self.connection_string, self.collection_name)
+        if collection_uuid is None or dimensions is None:
+            return None
+        # uuid.UUID로 검증한 값만 리터럴로 넣는다
+        self._collection_uuid = str(uuid.UUID(collection_uuid))
+        dimensions = int(dimensions)
+        where = f"collection_id = '{self._collection_uuid}'"
+
+        if self.binary_rerank and get_pgvector_version(self.connection_string) < (0, 7):
+            print("⚠️ pgvector 0.7 미만이라 2단계(이진 양자화) 검색 대신 단일 단계 검색을 사용합니다.")
+            self.binary_rerank = False
+
+        if not self.binary_rerank:
+            column = embedding_expression(self.storage, dimensions)
+            distance = f"{column} <=> CAST(:embedding AS {self.storage}({dimensions}))"
+            return f"langchain_pg_embedding WHERE {where}", distance
+
+        # 1단계: bit 인덱스로 Hamming 거리 상위 후보만 추림 (본문/메타데이터는 통과한 행만 읽힌다)
+        query_bits = (
+            f"CAST(binary_quantize(CAST(:embedding AS vector({dimensions}))) AS bit({dimensions}))"
+        )
+        source = f"""(
+            SELECT id, embedding, document, cmetadata FROM langchain_pg_embedding
+            WHERE {where}
+            ORDER BY {embedding_expression("bit", dimensions)} <~> {query_bits}
+            LIMIT :candidates
+        ) AS shortlist"""
+        # 2단계: 후보만 원본 float32 벡터로 정확한 cosine 거리 재계산
+        column = embedding_expression("vector", dimensions)
+        return source, f"{column} <=> CAST(:embedding AS vector({dimensions}))"
+
+    def _params(self, embedding: List[float], k: int) -> dict:
+        params = {"embedding": _vector_literal(embedding), "k": k}
+        if self.binary_rerank:
+            params["candidates"] = self._candidate_count(k)
+        return params
+
+    def _retrieve_params(
+        self,
+        embedding: List[float],
+        k: int,
+        threshold: Optional[float],
+        fallback_threshold: Optional[float],
+    ) -> dict:
+        return {
+            **self._params(embedding, k),
+            "threshold": threshold,
+            "fallback_threshold": fallback_threshold,
+        }
+
+    @staticmethod
+    def _to_retrieval(rows) -> Retrieval:
+        # 판정 행은 항상 1개 이상 (통과한 행이 없으면 id가 NULL인 행 1개)
+        first = rows[0]
+        best_score = float(first["best_distance"]) if first["best_distance"] is not None else None
+        results = [
+            (
+                Document(id=row["id"], page_content=row["document"], metadata=row["cmetadata"] or {}),
+                float(row["distance"]),
+            )
+            for row in rows
+            if row["id"] is not None
+        ]
+        return Retrieval(results, first["confidence"], best_score)
+
+    @staticmethod
+    def _to_results(rows) -> List[Tuple[Document, float]]:
+        return [
+            (
+                Document(id=row["id"], page_content=row["document"], metadata=row["cmetadata"] or {}),
+                float(row["distance"]),
+            )
+            for row in rows
+        ]
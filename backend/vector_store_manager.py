@@ -1,28 +1,45 @@
 # vector_store_manager.py
 from typing import List, Optional
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
-
-# from langchain_ollama import OllamaEmbeddings  # 사용하지 않으므로 주석 처리
 from langchain_postgres import PGVector
-from sqlalchemy import create_engine
 from config import Config
-from database_setup import create_hnsw_index
+from bulk_loader import BulkLoader
+from database_setup import create_search_indexes
+from db import get_async_engine, get_engine
+from embedding_backends import create_embeddings, embedding_model_key
+from embedding_cache import CachedEmbeddings, DocumentEmbeddingCache, QueryEmbeddingCache
 
 
 class VectorStoreManager:
     """pgvector 벡터 스토어 관리 (HNSW 인덱스 최적화)"""
 
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=Config.EMBEDDING_MODEL,
-            openai_api_key=Config.OPENAI_API_KEY
+        # 캐시 키의 모델 식별자 (백엔드/모델/차원이 다르면 다른 벡터이므로 구분)
+        model_key = embedding_model_key()
+        # 질문 임베딩 캐시: 같은 질문은 임베딩 호출 없이 벡터 재사용 (QA/문제 생성 공통)
+        self.query_cache = QueryEmbeddingCache(
+            model_name=model_key,
+            connection_string=(
+                Config.POSTGRES_CONNECTION
+                if Config.QUERY_EMBEDDING_CACHE_PERSIST
+                else None
+            ),
+        )
+        # 청크 임베딩 캐시: 청크 텍스트가 같으면 재구축 시에도 임베딩 호출 없이 재사용
+        self.document_cache: Optional[DocumentEmbeddingCache] = (
+            DocumentEmbeddingCache(model_name=model_key)
+            if Config.EMBEDDING_CACHE_ENABLED
+            else None
+        )
+        # Config.EMBEDDING_BACKEND로 고른 백엔드 (openai / ollama / hash). 캐시 미스만 백엔드로 나가며,
+        # 원격 백엔드의 429 재시도는 공유 RateLimiter에서 모든 임베딩 스레드가 함께 대기하도록 처리
+        self.embeddings = CachedEmbeddings(
+            create_embeddings(),
+            self.query_cache,
+            self.document_cache,
         )
-        # self.embeddings = OllamaEmbeddings(
-        #     model=Config.EMBEDDING_MODEL,
-        #     base_url=Config.OLLAMA_BASE_URL
-        # )
         self.vector_store: Optional[PGVector] = None
+        self.async_vector_store: Optional[PGVector] = None
 
     def create_vector_store(self, documents: List[Document]) -> PGVector:
         """PostgreSQL pgvector 스토어 생성 및 HNSW 인덱스 최적화"""
@@ -33,7 +50,7 @@ class VectorStoreManager:
             documents=documents,
             embedding=self.embeddings,
             collection_name=Config.COLLECTION_NAME,
-            connection=Config.POSTGRES_CONNECTION,
+            connection=get_engine(Config.POSTGRES_CONNECTION),
             use_jsonb=True,
             pre_delete_collection=False,  # 기존 데이터 유지
         )
@@ -42,7 +59,7 @@ class VectorStoreManager:
 
         # HNSW 인덱스 생성으로 성능 최적화
         print("\n⚡ HNSW 인덱스 생성 중...")
-        create_hnsw_index(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
+        create_search_indexes(Config.POSTGRES_CONNECTION, Config.COLLECTION_NAME)
 
         return self.vector_store
 
@@ -53,13 +70,34 @@ class VectorStoreManager:
         self.vector_store = PGVector(
             embeddings=self.embeddings,
             collection_name=Config.COLLECTION_NAME,
-            connection=Config.POSTGRES_CONNECTION,
+            # 검색/캐시/매니페스트와 같은 공유 커넥션 풀 사용
+            connection=get_engine(Config.POSTGRES_CONNECTION),
             use_jsonb=True,
         )
 
         print("✅ 기존 스토어 로드 완료")
         return self.vector_store
 
+    async def aload_existing_store(self) -> PGVector:
+        """비동기 검색용 PGVector 스토어 로드 (psycopg3 async 드라이버)"""
+        print("\n📂 비동기 PGVector 스토어 로드 중...")
+
+        store = PGVector(
+            embeddings=self.embeddings,
+            collection_name=Config.COLLECTION_NAME,
+            connection=get_async_engine(Config.ASYNC_POSTGRES_CONNECTION),
+            use_jsonb=True,
+            create_extension=False,
+            async_mode=True,
+        )
+        # PGVector의 비동기 초기화는 지연 실행되며 동시 호출에 안전하지 않으므로
+        # 요청을 받기 전에 한 번 미리 수행한다.
+        await store.acreate_collection()
+        self.async_vector_store = store
+
+        print("✅ 비동기 스토어 로드 완료")
+        return self.async_vector_store
+
     def add_documents(self, documents: List[Document]) -> None:
         """기존 스토어에 문서 추가"""
         if self.vector_store is None:
@@ -69,6 +107,29 @@ class VectorStoreManager:
         self.vector_store.add_documents(documents)
         print("✅ 문서 추가 완료")
 
+    def add_embeddings(
+        self, documents: List[Document], embeddings: List[List[float]]
+    ) -> None:
+        """이미 계산된 임베딩과 함께 문서 저장 (수집 파이프라인의 쓰기 단계)"""
+        if self.vector_store is None:
+            raise ValueError("벡터 스토어가 초기화되지 않았습니다.")
+
+        self.vector_store.add_embeddings(
+            texts=[doc.page_content for doc in documents],
+            embeddings=embeddings,
+            metadatas=[doc.metadata for doc in documents],
+            ids=[doc.id for doc in documents],
+        )
+
+    def bulk_loader(self, upsert: bool = True, collection_name: Optional[str] = None) -> BulkLoader:
+        """binary COPY 대량 적재기 생성 (add_embeddings 대신 수집 파이프라인 writer로 사용)
+
+        collection_name을 주면 그 컬렉션(예: 서비스 중 수집용 임시 컬렉션)에 적재한다.
+        """
+        if self.vector_store is None:
+            raise ValueError("벡터 스토어가 초기화되지 않았습니다.")
+        return BulkLoader(collection_name or Config.COLLECTION_NAME, upsert=upsert)
+
     def get_store(self) -> PGVector:
         """벡터 스토어 반환"""
         if self.vector_store is None: